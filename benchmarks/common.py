@@ -0,0 +1,143 @@
+'''
+    Shared helpers for the gateaux benchmark suites. Provides an offline subspace,
+    a small timing harness, machine-readable JSON results and a comparison mode
+    which reports throughput regressions against a stored baseline.
+'''
+
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
+from fdb.subspace_impl import Subspace
+import gateaux
+
+
+# Default allowed drop in throughput before a comparison is considered a failure
+DEFAULT_THRESHOLD: float = 0.10
+
+
+def offline_subspace(*prefix: Any) -> Subspace:
+    '''
+        Returns a FoundationDB subspace which packs and unpacks exactly like a real
+        directory or subspace but never talks to a cluster. fdb's Subspace is pure
+        Python so no client library or api_version() call is required.
+    '''
+    return Subspace(('bench',) + prefix)
+
+
+def measure(func: Callable[[], Any], min_time: float = 0.2,
+            repeat: int = 5) -> Dict[str, Any]:
+    '''
+        Times func() with no arguments. The loop count is calibrated so one run
+        takes at least min_time seconds, then the run is repeated and the best
+        result is kept as it is the least disturbed by other activity.
+    '''
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return {
+        'ops_per_sec': loops / best,
+        'ns_per_op': best / loops * 1e9,
+        'loops': loops,
+        'repeat': repeat,
+    }
+
+
+def build_report(suite: str, results: Dict[str, Dict[str, Any]],
+                 params: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+        Wraps a dict of results with enough metadata to compare runs later.
+    '''
+    return {
+        'suite': suite,
+        'gateaux_version': gateaux.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'params': params,
+        'results': results,
+    }
+
+
+def write_report(report: Dict[str, Any], path: str) -> None:
+    with open(path, 'wt') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def read_report(path: str) -> Dict[str, Any]:
+    with open(path, 'rt') as f:
+        return json.load(f)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Tuple[str, float, float]]:
+    '''
+        Compares the ops_per_sec of every result present in both reports. Returns a
+        list of (name, baseline ops/s, current ops/s) for results whose throughput
+        dropped by more than threshold (0.10 is a 10% drop).
+    '''
+    regressions = []
+    for name, base in sorted(baseline['results'].items()):
+        cur = current['results'].get(name)
+        if cur is None:
+            continue
+        base_ops = base['ops_per_sec']
+        cur_ops = cur['ops_per_sec']
+        if base_ops and cur_ops < base_ops * (1 - threshold):
+            regressions.append((name, base_ops, cur_ops))
+    return regressions
+
+
+def add_common_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('-o', '--output', default='',
+                        help='write results as JSON to this file')
+    parser.add_argument('-c', '--compare', default='',
+                        help='baseline JSON file to compare results against')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed throughput drop before failing, '
+                             f'default {DEFAULT_THRESHOLD}')
+    parser.add_argument('-f', '--filter', default='',
+                        help='only run benchmarks whose name contains this string')
+
+
+def finish(report: Dict[str, Any], args: argparse.Namespace) -> int:
+    '''
+        Writes the report if requested, runs the comparison if requested and
+        returns the process exit code. 1 means a regression was found.
+    '''
+    if args.output:
+        write_report(report, args.output)
+        print(f'wrote results to: {args.output}')
+    if not args.compare:
+        return 0
+    if not os.path.isfile(args.compare):
+        print(f'baseline not found: {args.compare}', file=sys.stderr)
+        return 2
+    regressions = compare(report, read_report(args.compare), args.threshold)
+    if not regressions:
+        print(f'no regressions beyond {args.threshold:.0%} against {args.compare}')
+        return 0
+    print(f'{len(regressions)} regression(s) beyond {args.threshold:.0%}:')
+    for name, base_ops, cur_ops in regressions:
+        print(f'  {name}: {base_ops:,.0f} -> {cur_ops:,.0f} ops/s '
+              f'({cur_ops / base_ops - 1:+.1%})')
+    return 1
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+'''
+    Micro-benchmarks for every gateaux field and Structure code path. Runs offline,
+    no FoundationDB cluster is required. Run from the repository root with:
+
+        $ python -m benchmarks.micro -o results.json
+        $ python -m benchmarks.micro -c results.json -t 0.10
+
+    The second form exits with status 1 if any benchmark lost more than 10% of its
+    throughput compared to results.json.
+'''
+
+
+import sys
+import argparse
+from functools import partial
+from uuid import UUID
+from datetime import datetime
+from ipaddress import IPv4Address, IPv6Address, IPv4Network, IPv6Network
+from typing import Any, Callable, Dict, List, Tuple
+import pytz
+import gateaux
+from benchmarks.common import (offline_subspace, measure, build_report,
+                               add_common_arguments, finish)
+
+
+NOW = pytz.utc.localize(datetime(2020, 6, 1, 12, 30, 15, 250000))
+UUID_VALUE = UUID('5f0b3ad0-6f7b-4a7b-8c1f-0d5c7f7f2e11')
+
+
+# (field, valid value) for all 12 field types
+FIELDS: Tuple[Tuple[gateaux.BaseField, Any], ...] = (
+    (gateaux.BinaryField(max_length=64), b'some binary data'),
+    (gateaux.IntegerField(min_value=0, max_value=1000000), 12345),
+    (gateaux.FloatField(min_value=-100, max_value=100), 21.5),
+    (gateaux.BooleanField(), True),
+    (gateaux.StringField(max_length=64), 'some string data'),
+    (gateaux.DateTimeField(), NOW),
+    (gateaux.IPv4AddressField(), IPv4Address('10.1.2.3')),
+    (gateaux.IPv6AddressField(), IPv6Address('2001:db8::1')),
+    (gateaux.IPv4NetworkField(), IPv4Network('10.0.0.0/8')),
+    (gateaux.IPv6NetworkField(), IPv6Network('2001:db8::/32')),
+    (gateaux.UUIDField(), UUID_VALUE),
+    (gateaux.EnumField(members=(0, 1, 2, 3)), 2),
+)
+
+
+class NarrowStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value = (gateaux.IntegerField(name='seats'),)
+
+
+class WideStructure(gateaux.Structure):
+    key = (
+        gateaux.StringField(name='tenant'),
+        gateaux.IntegerField(name='year'),
+        gateaux.IntegerField(name='day'),
+        gateaux.DateTimeField(name='at'),
+        gateaux.IPv4AddressField(name='ip'),
+        gateaux.UUIDField(name='id'),
+    )
+    value = (
+        gateaux.IntegerField(name='bytes', min_value=0),
+        gateaux.FloatField(name='ratio'),
+        gateaux.BooleanField(name='ok'),
+        gateaux.StringField(name='path', max_length=255),
+        gateaux.BinaryField(name='digest', max_length=32),
+        gateaux.EnumField(name='kind', members=(0, 1, 2)),
+        gateaux.IPv6AddressField(name='ip6'),
+        gateaux.IPv4NetworkField(name='net4'),
+        gateaux.IPv6NetworkField(name='net6'),
+        gateaux.DateTimeField(name='seen'),
+        gateaux.UUIDField(name='session'),
+        gateaux.StringField(name='note', max_length=255),
+    )
+
+
+class FixedStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value = (
+        gateaux.IntegerField(name='bytes'),
+        gateaux.FloatField(name='ratio'),
+        gateaux.BooleanField(name='ok'),
+        gateaux.IntegerField(name='count'),
+        gateaux.UUIDField(name='session'),
+    )
+
+
+class FixedStructStructure(FixedStructure):
+    value_codec = 'struct'
+
+
+NARROW_KEY = ('9:00 chem for dummies',)
+NARROW_VALUE = (100,)
+WIDE_KEY = ('tenant-a', 2020, 153, NOW, IPv4Address('10.1.2.3'), UUID_VALUE)
+WIDE_VALUE = (
+    4096, 0.5, True, '/some/path/to/a/file', b'\x01' * 32, 1,
+    IPv6Address('2001:db8::1'), IPv4Network('10.0.0.0/8'),
+    IPv6Network('2001:db8::/32'), NOW, UUID_VALUE, 'a short note',
+)
+
+
+def _raises(func: Callable, *args: Any) -> Callable[[], None]:
+    '''
+        Wraps a call which is expected to raise a ValidationError so the error path
+        itself can be timed.
+    '''
+    def run() -> None:
+        try:
+            func(*args)
+        except gateaux.errors.ValidationError:
+            return
+        raise AssertionError(f'{func} did not raise ValidationError')
+    return run
+
+
+def field_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    cases: List[Tuple[str, Callable[[], Any]]] = []
+    for field, v in FIELDS:
+        name = field.__class__.__name__
+        packed = field.pack(v)
+        cases.append((f'field.{name}.pack', partial(field.pack, v)))
+        cases.append((f'field.{name}.unpack', partial(field.unpack, packed)))
+    # Error paths, a type error and a constraint error
+    integer = gateaux.IntegerField(max_value=10)
+    cases.append(('field.IntegerField.pack.error.type', _raises(integer.pack, '1')))
+    cases.append(('field.IntegerField.pack.error.max_value',
+                  _raises(integer.pack, 11)))
+    return cases
+
+
+def structure_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    cases: List[Tuple[str, Callable[[], Any]]] = []
+    for label, cls, key, value in (
+            ('narrow', NarrowStructure, NARROW_KEY, NARROW_VALUE),
+            ('wide', WideStructure, WIDE_KEY, WIDE_VALUE)):
+        s = cls(offline_subspace(label))
+        kb = s.pack_key(key)
+        vb = s.pack_value(value)
+        kd = s.unpack_key_dict(kb)
+        vd = s.unpack_value_dict(vb)
+        cases.extend((
+            (f'structure.{label}.pack_key', partial(s.pack_key, key)),
+            (f'structure.{label}.pack_key.prefix',
+             partial(s.pack_key, key[:1])),
+            (f'structure.{label}.pack_value', partial(s.pack_value, value)),
+            (f'structure.{label}.unpack_key', partial(s.unpack_key, kb)),
+            (f'structure.{label}.unpack_value', partial(s.unpack_value, vb)),
+            (f'structure.{label}.pack_key_dict',
+             partial(s.pack_key_dict, kd)),
+            (f'structure.{label}.pack_value_dict',
+             partial(s.pack_value_dict, vd)),
+            (f'structure.{label}.unpack_key_dict',
+             partial(s.unpack_key_dict, kb)),
+            (f'structure.{label}.unpack_value_dict',
+             partial(s.unpack_value_dict, vb)),
+        ))
+    # Projections decode one field of the wide structure
+    wide = WideStructure(offline_subspace('wide'))
+    wide_vb = wide.pack_value(WIDE_VALUE)
+    wide_kb = wide.pack_key(WIDE_KEY)
+    cases.extend((
+        ('structure.wide.unpack_value.project',
+         partial(wide.unpack_value, wide_vb, fields=('session',))),
+        ('structure.wide.unpack_key.project',
+         partial(wide.unpack_key, wide_kb, fields=('id',))),
+    ))
+    # Error paths
+    bad_value = WIDE_VALUE[:5] + (9,) + WIDE_VALUE[6:]
+    cases.extend((
+        ('structure.wide.pack_key.error.too_many',
+         _raises(wide.pack_key, WIDE_KEY + (1,))),
+        ('structure.wide.pack_value.error.length',
+         _raises(wide.pack_value, WIDE_VALUE[:-1])),
+        ('structure.wide.pack_value.error.field',
+         _raises(wide.pack_value, bad_value)),
+        ('structure.wide.unpack_key.error.type',
+         _raises(wide.unpack_key, 'not bytes')),
+    ))
+    return cases
+
+
+def codec_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    cases: List[Tuple[str, Callable[[], Any]]] = []
+    value = (4096, 0.5, True, 7, UUID_VALUE)
+    for label, cls in (('tuple', FixedStructure), ('struct', FixedStructStructure)):
+        s = cls(offline_subspace('fixed', label))
+        vb = s.pack_value(value)
+        cases.extend((
+            (f'codec.{label}.pack_value', partial(s.pack_value, value)),
+            (f'codec.{label}.unpack_value', partial(s.unpack_value, vb)),
+        ))
+    return cases
+
+
+def all_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    return field_cases() + structure_cases() + codec_cases()
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_common_arguments(parser)
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='minimum seconds per timed run, default 0.2')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timed runs per benchmark, best is kept, default 5')
+    args = parser.parse_args(argv)
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, func in all_cases():
+        if args.filter and args.filter not in name:
+            continue
+        result = measure(func, min_time=args.min_time, repeat=args.repeat)
+        results[name] = result
+        print(f'{name:<52} {result["ops_per_sec"]:>14,.0f} ops/s '
+              f'{result["ns_per_op"]:>10,.0f} ns/op')
+    params = {'min_time': args.min_time, 'repeat': args.repeat}
+    return finish(build_report('micro', results, params), args)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
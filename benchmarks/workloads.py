@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+'''
+    End-to-end workload benchmarks replaying the bundled examples against the
+    in-memory transactional stand-in from gateaux.testing. Unlike the
+    micro-benchmarks these run concurrent transactions so conflicts and retries are
+    included in the results. Run from the repository root with:
+
+        $ python -m benchmarks.workloads scheduling --students 20 --ops 50
+        $ python -m benchmarks.workloads temperature --years 4 --writers 4
+        $ python -m benchmarks.workloads all -o workloads.json
+
+    Each workload reports transactions/s, p50/p99 transaction latency, retry and
+    conflict counts and how the time was split between gateaux (packing and
+    unpacking) and the store.
+'''
+
+
+import sys
+import random
+import argparse
+import itertools
+import threading
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import gateaux
+from gateaux.testing import MemoryDatabase, TransactionConflict
+from benchmarks.common import (offline_subspace, build_report, add_common_arguments,
+                               finish)
+
+
+DISTRIBUTIONS = ('uniform', 'zipfian', 'hot')
+
+
+class ChoiceError(Exception):
+    '''
+        A business rule failure inside a workload transaction, such as a class with
+        no remaining seats. The transaction is abandoned and not retried.
+    '''
+    pass
+
+
+class KeyChooser:
+    '''
+        Picks indexes in range(n) following a key distribution:
+            * uniform: every index is equally likely
+            * zipfian: index i is chosen with weight 1 / (i + 1) ** s
+            * hot: 90% of picks go to the first 1% of indexes
+    '''
+
+    def __init__(self, n: int, distribution: str, s: float = 1.1) -> None:
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f'unknown distribution: {distribution}')
+        self.n = n
+        self.weights: Optional[List[float]] = None
+        if distribution == 'zipfian':
+            self.weights = list(itertools.accumulate(
+                1 / (i + 1) ** s for i in range(n)))
+        elif distribution == 'hot':
+            hot = max(1, n // 100)
+            self.weights = list(itertools.accumulate(
+                0.9 / hot if i < hot else 0.1 / max(1, n - hot) for i in range(n)))
+
+    def choose(self, rng: random.Random) -> int:
+        if self.weights is None:
+            return rng.randrange(self.n)
+        return rng.choices(range(self.n), cum_weights=self.weights)[0]
+
+
+class TimedStructure:
+    '''
+        Wraps a Structure and adds the time spent in its pack and unpack methods to
+        a per-thread total, so gateaux time can be separated from store time.
+    '''
+
+    def __init__(self, structure: gateaux.Structure) -> None:
+        self._structure = structure
+        self._local = threading.local()
+
+    @property
+    def elapsed(self) -> float:
+        return getattr(self._local, 'elapsed', 0.0)
+
+    @elapsed.setter
+    def elapsed(self, v: float) -> None:
+        self._local.elapsed = v
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._structure, name)
+        if not name.startswith(('pack', 'unpack')):
+            return attr
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._local.elapsed = (getattr(self._local, 'elapsed', 0.0) +
+                                       time.perf_counter() - start)
+        return timed
+
+
+class Recorder:
+    '''
+        Collects per-transaction measurements from many threads.
+    '''
+
+    def __init__(self, structures: List[TimedStructure]) -> None:
+        self.structures = structures
+        self.lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.retries = 0
+        self.aborted = 0
+        self.gateaux_time = 0.0
+        self.total_time = 0.0
+
+    def run(self, db: MemoryDatabase, func: Callable, *args: Any) -> bool:
+        '''
+            Runs func(tr, *args) in a transaction, retrying on conflict exactly like
+            @fdb.transactional, and records the outcome. Returns False if func
+            aborted the transaction with a ChoiceError.
+        '''
+        for s in self.structures:
+            s.elapsed = 0.0
+        retries = 0
+        aborted = False
+        tr = db.create_transaction()
+        start = time.perf_counter()
+        while True:
+            try:
+                func(tr, *args)
+                tr.commit().wait()
+                break
+            except ChoiceError:
+                aborted = True
+                break
+            except TransactionConflict as e:
+                retries += 1
+                tr.on_error(e).wait()
+        elapsed = time.perf_counter() - start
+        gateaux_time = sum(s.elapsed for s in self.structures)
+        with self.lock:
+            self.latencies.append(elapsed)
+            self.retries += retries
+            self.aborted += int(aborted)
+            self.gateaux_time += gateaux_time
+            self.total_time += elapsed
+        return not aborted
+
+    def result(self, wall: float, db: MemoryDatabase) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(count - 1, int(count * p))] * 1000
+        store_time = max(0.0, self.total_time - self.gateaux_time)
+        return {
+            'ops_per_sec': count / wall if wall else 0.0,
+            'transactions': count,
+            'wall_seconds': wall,
+            'p50_ms': percentile(0.50),
+            'p99_ms': percentile(0.99),
+            'retries': self.retries,
+            'conflicts': db.conflicts,
+            'aborted': self.aborted,
+            'gateaux_seconds': self.gateaux_time,
+            'store_seconds': store_time,
+            'gateaux_share': (self.gateaux_time / self.total_time
+                              if self.total_time else 0.0),
+        }
+
+
+def run_threads(targets: List[Callable[[], None]]) -> float:
+    threads = [threading.Thread(target=target) for target in targets]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+####################################
+##        Class scheduling        ##
+####################################
+
+
+class ClassAvailability(gateaux.Structure):
+    '''Stores the number of available seats for a class'''
+    key = (gateaux.StringField(name='name'),)
+    value = (gateaux.IntegerField(name='seats'),)
+
+
+class Attending(gateaux.Structure):
+    '''Stores which student is attending which class'''
+    key = (gateaux.StringField(name='student'), gateaux.StringField(name='class'))
+    value = ()
+
+
+def class_names(count: int) -> List[str]:
+    levels = ['intro', 'for dummies', 'remedial', '101', '201', '301', 'mastery',
+              'lab', 'seminar']
+    types = ['chem', 'bio', 'cs', 'geometry', 'calc', 'alg', 'film', 'music',
+             'art', 'dance']
+    times = [str(h) + ':00' for h in range(2, 20)]
+    names = [' '.join(t) for t in itertools.product(times, types, levels)]
+    return names[:count]
+
+
+def scheduling(args: argparse.Namespace) -> Dict[str, Any]:
+    '''
+        The class scheduling example's indecisive_student workload: every student
+        randomly signs up for, drops and switches classes.
+    '''
+    db = MemoryDatabase(latency=args.latency_us / 1e6)
+    availability_space = offline_subspace('scheduling', 'availability')
+    attending_space = offline_subspace('scheduling', 'attending')
+    availability = TimedStructure(ClassAvailability(availability_space))
+    attending = TimedStructure(Attending(attending_space))
+    classes = class_names(args.classes)
+    chooser = KeyChooser(len(classes), args.distribution, args.zipf_s)
+
+    def init(tr: Any) -> None:
+        for c in classes:
+            tr[availability.pack_key((c,))] = availability.pack_value((args.seats,))
+
+    def signup(tr: Any, s: str, c: str) -> None:
+        key = attending.pack_key((s, c))
+        if tr[key] is not None:
+            return
+        seats_left = availability.unpack_value(tr[availability.pack_key((c,))])[0]
+        if not seats_left:
+            raise ChoiceError('No remaining seats')
+        begin = attending.pack_key((s,))
+        if len(tr.get_range(begin + b'\x00', begin + b'\xff')) == 5:
+            raise ChoiceError('Too many classes')
+        tr[availability.pack_key((c,))] = availability.pack_value((seats_left - 1,))
+        tr[key] = b''
+
+    def drop(tr: Any, s: str, c: str) -> None:
+        key = attending.pack_key((s, c))
+        if tr[key] is None:
+            return
+        seats_left = availability.unpack_value(tr[availability.pack_key((c,))])[0]
+        tr[availability.pack_key((c,))] = availability.pack_value((seats_left + 1,))
+        del tr[key]
+
+    def switch(tr: Any, s: str, old_c: str, new_c: str) -> None:
+        drop(tr, s, old_c)
+        signup(tr, s, new_c)
+
+    init_tr = db.create_transaction()
+    init(init_tr)
+    init_tr.commit().wait()
+    recorder = Recorder([availability, attending])
+
+    def indecisive_student(i: int) -> None:
+        rng = random.Random(args.seed + i)
+        student = f's{i:d}'
+        mine: List[str] = []
+        for _ in range(args.ops):
+            moods = []
+            if mine:
+                moods.extend(['drop', 'switch'])
+            if len(mine) < 5:
+                moods.append('add')
+            mood = rng.choice(moods)
+            if mood == 'add':
+                c = classes[chooser.choose(rng)]
+                if recorder.run(db, signup, student, c) and c not in mine:
+                    mine.append(c)
+            elif mood == 'drop':
+                c = rng.choice(mine)
+                if recorder.run(db, drop, student, c):
+                    mine.remove(c)
+            else:
+                old_c = rng.choice(mine)
+                new_c = classes[chooser.choose(rng)]
+                # A failed switch rolls back the drop too
+                if recorder.run(db, switch, student, old_c, new_c):
+                    mine.remove(old_c)
+                    if new_c not in mine:
+                        mine.append(new_c)
+
+    wall = run_threads([partial(indecisive_student, i)
+                        for i in range(args.students)])
+    return {'scheduling': recorder.result(wall, db)}
+
+
+####################################
+##      Temperature readings      ##
+####################################
+
+
+class TemperatureReading(gateaux.Structure):
+    key = (gateaux.IntegerField(name='year'), gateaux.IntegerField(name='day'))
+    value = (gateaux.IntegerField(name='degrees'),)
+
+
+def temperature(args: argparse.Namespace) -> Dict[str, Any]:
+    '''
+        The temperature readings example: writers store a reading for every day of
+        a range of years, then readers read random days back.
+    '''
+    db = MemoryDatabase(latency=args.latency_us / 1e6)
+    reading = TimedStructure(TemperatureReading(offline_subspace('temp_readings')))
+    years = [2000 + y for y in range(args.years)]
+    days = list(range(1, args.days + 1))
+    chooser = KeyChooser(len(years) * len(days), args.distribution, args.zipf_s)
+
+    def set_temps(tr: Any, year: int, batch: List[int], degrees: List[int]) -> None:
+        for day, degree in zip(batch, degrees):
+            tr[reading.pack_key((year, day))] = reading.pack_value((degree,))
+
+    def get_temp(tr: Any, year: int, day: int) -> int:
+        return reading.unpack_value(tr[reading.pack_key((year, day))])[0]
+
+    writes = Recorder([reading])
+
+    def writer(w: int) -> None:
+        rng = random.Random(args.seed + w)
+        for year in years[w::args.writers]:
+            for i in range(0, len(days), args.batch):
+                batch = days[i:i + args.batch]
+                degrees = [rng.randint(10, 35) for _ in batch]
+                writes.run(db, set_temps, year, batch, degrees)
+
+    write_wall = run_threads([partial(writer, w) for w in range(args.writers)])
+    write_result = writes.result(write_wall, db)
+    reads = Recorder([reading])
+
+    def reader(r: int) -> None:
+        rng = random.Random(args.seed + 1000 + r)
+        for _ in range(args.ops):
+            i = chooser.choose(rng)
+            reads.run(db, get_temp, years[i // len(days)], days[i % len(days)])
+
+    read_wall = run_threads([partial(reader, r) for r in range(args.readers)])
+    return {
+        'temperature.write': write_result,
+        'temperature.read': reads.result(read_wall, db),
+    }
+
+
+WORKLOADS: Dict[str, Callable[[argparse.Namespace], Dict[str, Any]]] = {
+    'scheduling': scheduling,
+    'temperature': temperature,
+}
+# The names of the results each workload returns, to filter before running
+WORKLOAD_RESULTS: Dict[str, Tuple[str, ...]] = {
+    'scheduling': ('scheduling',),
+    'temperature': ('temperature.write', 'temperature.read'),
+}
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('workload', nargs='?', default='all',
+                        choices=('all',) + tuple(WORKLOADS))
+    add_common_arguments(parser)
+    parser.add_argument('--distribution', default='uniform', choices=DISTRIBUTIONS,
+                        help='key distribution for class and reading choices')
+    parser.add_argument('--zipf-s', type=float, default=1.1,
+                        help='zipfian distribution skew, default 1.1')
+    parser.add_argument('--latency-us', type=float, default=50,
+                        help='simulated store round trip in microseconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ops', type=int, default=100,
+                        help='operations per student or reader')
+    scheduling_group = parser.add_argument_group('scheduling')
+    scheduling_group.add_argument('--students', type=int, default=10)
+    scheduling_group.add_argument('--classes', type=int, default=1620)
+    scheduling_group.add_argument('--seats', type=int, default=100)
+    temperature_group = parser.add_argument_group('temperature')
+    temperature_group.add_argument('--years', type=int, default=4)
+    temperature_group.add_argument('--days', type=int, default=365)
+    temperature_group.add_argument('--writers', type=int, default=4)
+    temperature_group.add_argument('--readers', type=int, default=4)
+    temperature_group.add_argument('--batch', type=int, default=30,
+                                   help='readings written per transaction')
+    args = parser.parse_args(argv)
+    names = tuple(WORKLOADS) if args.workload == 'all' else (args.workload,)
+    results: Dict[str, Dict[str, Any]] = {}
+    if args.filter:
+        names = tuple(name for name in names
+                      if any(args.filter in result_name
+                             for result_name in WORKLOAD_RESULTS[name]))
+    for name in names:
+        for result_name, result in WORKLOADS[name](args).items():
+            if args.filter and args.filter not in result_name:
+                continue
+            results[result_name] = result
+            print(f'{result_name:<20} {result["ops_per_sec"]:>10,.0f} tx/s  '
+                  f'p50 {result["p50_ms"]:.3f} ms  p99 {result["p99_ms"]:.3f} ms  '
+                  f'retries {result["retries"]}  conflicts {result["conflicts"]}  '
+                  f'aborted {result["aborted"]}  '
+                  f'gateaux {result["gateaux_share"]:.1%} of transaction time')
+    params = {k: v for k, v in vars(args).items()
+              if k not in ('output', 'compare', 'threshold', 'filter')}
+    return finish(build_report('workloads', results, params), args)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -41,6 +41,9 @@ class Attending(gateaux.Structure):
         gateaux.StringField(name='class', help_text='Class the student is attending')
     )
     value = ()
+    views = (
+        gateaux.View(name='classes', group_by=1),
+    )
 
 
 ####################################
@@ -52,8 +55,10 @@ db = fdb.open()
 db.options.set_transaction_timeout(60000)  # 60,000 ms = 1 minute
 availability_dir = fdb.directory.create_or_open(db, ('scheduling', 'availability'))
 attending_dir = fdb.directory.create_or_open(db, ('scheduling', 'attending'))
+attending_views_dir = fdb.directory.create_or_open(db, ('scheduling',
+                                                      'attending-views'))
 availability = ClassAvailability(availability_dir)
-attending = Attending(attending_dir)
+attending = Attending(attending_dir, attending_views_dir)
 
 
 @fdb.transactional
@@ -76,6 +81,7 @@ def init(tr):
     # Clear the directories
     del tr[availability_dir.range(())]
     del tr[attending_dir.range(())]
+    del tr[attending_views_dir.range(())]
     # Create classes
     for class_name in class_names:
         add_class(tr, class_name)
@@ -88,37 +94,37 @@ def init(tr):
 
 @fdb.transactional
 def available_classes(tr):
-    return [availability.unpack_key(k)[0] for k, v in tr[availability_dir.range(())]
-            if availability.unpack_value(v)[0]]
+    # Approximate, seats are checked again by signup(), so snapshot reads are used
+    return [name for (name,), (seats,) in availability.get_range(tr, snapshot=True)
+            if seats]
 
 
 @fdb.transactional
 def signup(tr, s, c):
-    key = attending.pack_key((s, c))
-    if tr[key].present():
+    if attending.get(tr, (s, c)) is not None:
         return  # already signed up
-    seats_left = tr[availability.pack_key((c,))][0]
+    seats_left, = availability.get(tr, (c,))
     if not seats_left:
         raise Exception('No remaining seats')
-    student_classes = tr[attending_dir.range((s,))]
-    if len(list(student_classes)) == 5:
+    if attending.view(tr, (s,))['classes'] == 5:
         raise Exception('Too many classes')
-    tr[availability.pack_key((c,))] = availability.pack_value((seats_left - 1,))
-    tr[key] = b''
+    availability.set(tr, (c,), (seats_left - 1,))
+    attending.set(tr, (s, c), ())
 
 
 @fdb.transactional
 def drop(tr, s, c):
-    key = attending.pack_key((s, c))
-    if not tr[key].present():
+    if attending.get(tr, (s, c)) is None:
         return  # not taking this class
-    seats_left = tr[availability.pack_key((c,))][0]
-    tr[availability.pack_key((c,))] = availability.pack_value((seats_left + 1,))
-    del tr[key]
+    seats_left, = availability.get(tr, (c,))
+    availability.set(tr, (c,), (seats_left + 1,))
+    attending.clear(tr, (s, c))
 
 
 @fdb.transactional
 def switch(tr, s, old_c, new_c):
+    # Keys read by drop() are not read or decoded again by signup()
+    gateaux.cache_reads(tr)
     drop(tr, s, old_c)
     signup(tr, s, new_c)
 
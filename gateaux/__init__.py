@@ -2,7 +2,17 @@ __version__ = 0.2
 
 
 from . import errors
+from . import metrics
 from .structure import Structure
+from .timeseries import TimeSeriesStructure
+from .view import View
+from .record import Record
+from .readcache import ReadCache, cache_reads, read_cache, uncache_reads
+from .watched import WatchedCache
+from .replica import Replica, write_replica
+from .changelog import Change, ChangeConsumer
+from .pagination import Page
+from .check import CheckError
 from .fields.base import BaseField
 from .fields.binary import BinaryField
 from .fields.integer import IntegerField
@@ -16,3 +26,8 @@ from .fields.ipv4network import IPv4NetworkField
 from .fields.ipv6network import IPv6NetworkField
 from .fields.uuid import UUIDField
 from .fields.enum import EnumField
+from .fields.atomic import (AtomicField, CounterField, MinField, MaxField, BitAndField,
+                            BitOrField, BitXorField)
+from .fields.versionstamp import VersionstampField
+from .fields.hashprefix import HashPrefix
+from .fields.array import ArrayField
@@ -0,0 +1,129 @@
+'''
+    Streaming aggregation of Structure ranges. Aggregations reduce rows a batch at a
+    time into a few running totals per group, so a range of any size is aggregated
+    without building a list of its rows. Only the value fields the metrics need are
+    decoded.
+'''
+
+
+from typing import Any, Dict, List, Optional, Tuple
+from .errors import ValidationError
+from .fields.base import BaseField
+
+
+# Metric operations, every one other than "count" takes a value field
+AGGREGATE_OPS: Tuple[str, ...] = ('count', 'sum', 'min', 'max', 'avg')
+
+# Operations which need a numeric value field
+NUMERIC_OPS: Tuple[str, ...] = ('sum', 'avg')
+
+DEFAULT_METRICS: Dict[str, Any] = {'count': 'count'}
+
+
+class Metric:
+    '''
+        One named metric, an op and the index of its value field, or None for a
+        count of rows.
+    '''
+
+    def __init__(self, name: str, op: str, field: Optional[int]) -> None:
+        self.name = name
+        self.op = op
+        self.field = field
+
+
+def parse_metrics(metrics: Optional[Dict[str, Any]], names: Dict[str, int],
+                  fields: Tuple[BaseField, ...]) -> List[Metric]:
+    '''
+        Validates a dict of metric name to "count" or an (op, value field) tuple,
+        such as ("sum", "seats"), where the field is a name or an index.
+    '''
+    if metrics is None:
+        metrics = DEFAULT_METRICS
+    if not isinstance(metrics, dict) or not metrics:
+        raise ValidationError('metrics must be a non-empty dict of name to "count" '
+                              'or an (op, value field) tuple')
+    parsed: List[Metric] = []
+    for name, spec in metrics.items():
+        if spec == 'count':
+            parsed.append(Metric(name, 'count', None))
+            continue
+        if not isinstance(spec, tuple) or len(spec) != 2 or \
+                spec[0] not in AGGREGATE_OPS:
+            raise ValidationError(f'metric {name} must be "count" or an (op, value '
+                                  f'field) tuple with an op in {AGGREGATE_OPS}, '
+                                  f'got: {spec}')
+        op, field = spec
+        if isinstance(field, str) and field in names:
+            index = names[field]
+        elif isinstance(field, int) and not isinstance(field, bool) and \
+                0 <= field < len(fields):
+            index = field
+        else:
+            raise ValidationError(f'metric {name} has an unknown value field: {field}')
+        if op in NUMERIC_OPS and fields[index].data_type not in (int, float):
+            raise ValidationError(f'metric {name} can only {op} an integer or float '
+                                  f'value field')
+        parsed.append(Metric(name, op, index))
+    return parsed
+
+
+class Aggregation:
+    '''
+        The running totals of one group. Rows are added in batches of projected
+        value tuples holding the fields at positions, in that order.
+    '''
+
+    def __init__(self, metrics: List[Metric], positions: Tuple[int, ...]) -> None:
+        self.metrics = metrics
+        self.positions = positions
+        self.rows: int = 0
+        self.counts: List[int] = [0] * len(positions)
+        self.sums: List[Any] = [0] * len(positions)
+        self.mins: List[Any] = [None] * len(positions)
+        self.maxs: List[Any] = [None] * len(positions)
+
+    def add_rows(self, rows: int) -> None:
+        self.rows += rows
+
+    def add_batch(self, batch: List[Tuple]) -> None:
+        self.rows += len(batch)
+        if not self.positions or not batch:
+            return
+        for i, column in enumerate(zip(*batch)):
+            values = [v for v in column if v is not None]
+            if not values:
+                continue
+            self.counts[i] += len(values)
+            total = sum(values) if isinstance(values[0], (int, float)) else 0
+            low, high = min(values), max(values)
+            self.sums[i] += total
+            if self.mins[i] is None or low < self.mins[i]:
+                self.mins[i] = low
+            if self.maxs[i] is None or high > self.maxs[i]:
+                self.maxs[i] = high
+
+    def result(self) -> Dict[str, Any]:
+        '''
+            Returns a dict of metric name to value. "count" with a field counts the
+            rows where the field is not None, min, max and avg are None if no row
+            has a value.
+        '''
+        results: Dict[str, Any] = {}
+        for metric in self.metrics:
+            if metric.field is None:
+                results[metric.name] = self.rows
+                continue
+            i = self.positions.index(metric.field)
+            if metric.op == 'count':
+                results[metric.name] = self.counts[i]
+            elif metric.op == 'sum':
+                results[metric.name] = self.sums[i]
+            elif metric.op == 'min':
+                results[metric.name] = self.mins[i]
+            elif metric.op == 'max':
+                results[metric.name] = self.maxs[i]
+            else:
+                results[metric.name] = (self.sums[i] / self.counts[i]
+                                        if self.counts[i] else None)
+        return results
@@ -0,0 +1,352 @@
+'''
+    Transaction budget tracking. A TransactionTracker wraps transactions so every
+    read and write is recorded and attributed to the Structure whose subspace the
+    key is in. Each tracked transaction keeps an estimate of its size against a
+    Budget, warning (or raising in strict mode) as it approaches FoundationDB's
+    limits, and the tracker aggregates the hottest key prefixes across every
+    transaction it has seen.
+'''
+
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+from functools import partial
+import threading
+import warnings
+from .errors import BudgetExceededError, BudgetWarning
+
+
+# FoundationDB's default transaction size limit in bytes
+TRANSACTION_SIZE_LIMIT: int = 10000000
+
+# Label used for keys which are not in the subspace of any tracked Structure
+UNKNOWN: str = '(unknown)'
+
+
+class Budget:
+    '''
+        Limits for a single transaction. Any limit set to None is not checked. A
+        BudgetWarning is warned once per limit when usage reaches warn_ratio of the
+        limit and again when the limit is exceeded, in strict mode exceeding a limit
+        raises a BudgetExceededError instead.
+    '''
+
+    def __init__(self, max_bytes: Optional[int] = TRANSACTION_SIZE_LIMIT,
+                 max_mutations: Optional[int] = None,
+                 max_read_ranges: Optional[int] = None,
+                 warn_ratio: float = 0.8, strict: bool = False) -> None:
+        if not 0 < warn_ratio <= 1:
+            raise ValueError('warn_ratio must be greater than 0 and at most 1')
+        self.max_bytes = max_bytes
+        self.max_mutations = max_mutations
+        self.max_read_ranges = max_read_ranges
+        self.warn_ratio = warn_ratio
+        self.strict = strict
+
+
+class TransactionTracker:
+    '''
+        Creates tracked transactions with track(tr) and aggregates their reports.
+        structures are the Structure instances to attribute keys to and
+        prefix_depth is how many leading key tuple elements make up a "prefix" in
+        the hot prefix statistics. on_report, if set, is called with every
+        transaction's report when it commits.
+    '''
+
+    def __init__(self, structures: Iterable[Any] = (), budget: Optional[Budget] = None,
+                 prefix_depth: int = 1,
+                 on_report: Optional[Callable[[Dict], Any]] = None) -> None:
+        if prefix_depth < 1:
+            raise ValueError('prefix_depth must be at least 1')
+        self.budget: Budget = budget if budget is not None else Budget()
+        self.prefix_depth = prefix_depth
+        self.on_report = on_report
+        self._lock = threading.Lock()
+        self._prefixes: List[Tuple[bytes, Any]] = []
+        for structure in structures:
+            self._prefixes.append((structure.subspace.pack(()), structure))
+        # Longest prefixes first so nested subspaces match the innermost Structure
+        self._prefixes.sort(key=lambda p: len(p[0]), reverse=True)
+        self.transactions: int = 0
+        self.totals: Dict[str, Dict[str, int]] = {}
+        self._hot_reads: Counter = Counter()
+        self._hot_writes: Counter = Counter()
+
+    def track(self, tr: Any) -> 'TrackedTransaction':
+        return TrackedTransaction(tr, self)
+
+    def structure_for(self, key: bytes) -> Tuple[str, Any]:
+        for prefix, structure in self._prefixes:
+            if key.startswith(prefix):
+                return structure.__class__.__name__, structure
+        return UNKNOWN, None
+
+    def prefix_of(self, key: bytes) -> Tuple[str, Tuple]:
+        '''
+            Returns the Structure name and the first prefix_depth elements of the
+            raw key tuple, the tuple is not passed through the fields.
+        '''
+        name, structure = self.structure_for(key)
+        if structure is None:
+            return name, (key[:8],)
+        try:
+            return name, tuple(structure.subspace.unpack(key)[:self.prefix_depth])
+        except Exception:
+            return name, ()
+
+    def _finish(self, report: Dict) -> None:
+        with self._lock:
+            self.transactions += 1
+            for name, stats in report['structures'].items():
+                totals = self.totals.setdefault(name, Counter())
+                totals.update(stats)
+            self._hot_reads.update(report['read_prefixes'])
+            self._hot_writes.update(report['write_prefixes'])
+        if self.on_report:
+            self.on_report(report)
+
+    def hot_prefixes(self, n: int = 10,
+                     kind: str = 'all') -> List[Tuple[str, Tuple, int]]:
+        '''
+            Returns up to n (structure name, key prefix, count) tuples for the most
+            accessed key prefixes across every committed tracked transaction. kind
+            is one of "reads", "writes" or "all".
+        '''
+        with self._lock:
+            if kind == 'reads':
+                counter = Counter(self._hot_reads)
+            elif kind == 'writes':
+                counter = Counter(self._hot_writes)
+            elif kind == 'all':
+                counter = self._hot_reads + self._hot_writes
+            else:
+                raise ValueError(f'unknown kind: {kind}')
+        return [(name, prefix, count)
+                for (name, prefix), count in counter.most_common(n)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.transactions = 0
+            self.totals = {}
+            self._hot_reads.clear()
+            self._hot_writes.clear()
+
+
+class TrackedRead:
+    '''
+        Records reads made through a transaction or its snapshot.
+    '''
+
+    def __init__(self, tr: Any, tracked: 'TrackedTransaction', snapshot: bool) -> None:
+        self._tr = tr
+        self._tracked = tracked
+        self._snapshot = snapshot
+
+    def get(self, key: bytes) -> Any:
+        self._tracked._record_read(key, key + b'\x00', self._snapshot)
+        value = self._tr.get(key)
+        if value is None or isinstance(value, bytes):
+            self._tracked._record_value_bytes(key, value)
+        elif hasattr(value, 'on_ready'):
+            # fdb returns a future, its value's size is known once it resolves
+            value.on_ready(partial(self._resolved, key))
+        return value
+
+    def _resolved(self, key: bytes, future: Any) -> None:
+        try:
+            value = future.wait() if future.present() else None
+        except Exception:
+            # The error is raised to the reader when it waits on the future
+            return
+        self._tracked._record_value_bytes(key, value)
+
+    def get_range(self, begin: bytes, end: bytes, *args: Any, **kwargs: Any) -> Any:
+        self._tracked._record_read(begin, end, self._snapshot)
+        result = self._tr.get_range(begin, end, *args, **kwargs)
+        if isinstance(result, list):
+            for kv in result:
+                self._tracked._record_read_bytes(kv.key, kv.value)
+            return result
+        return self._iter(result)
+
+    def _iter(self, result: Iterable) -> Iterable:
+        for kv in result:
+            self._tracked._record_read_bytes(kv.key, kv.value)
+            yield kv
+
+    def get_range_startswith(self, prefix: bytes, *args: Any, **kwargs: Any) -> Any:
+        return self.get_range(prefix, prefix + b'\xff', *args, **kwargs)
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, slice):
+            return self.get_range(key.start, key.stop, reverse=(key.step == -1))
+        return self.get(key)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._tr, name)
+
+
+class TrackedTransaction(TrackedRead):
+    '''
+        Wraps a transaction, forwarding every call to it while recording reads and
+        writes. Use report() for the transaction's report so far. The report is
+        emitted to the tracker once, either when a commit() through the wrapper
+        succeeds or when a "with" block using the wrapper exits without an error,
+        which suits @fdb.transactional functions where the decorator commits.
+        Retrying with on_error() starts a new report.
+    '''
+
+    # Atomic mutations which take a key and a param like set()
+    MUTATIONS: Tuple[str, ...] = ('add', 'bit_and', 'bit_or', 'bit_xor', 'max', 'min',
+                                  'byte_max', 'byte_min', 'append_if_fits',
+                                  'set_versionstamped_key', 'set_versionstamped_value')
+
+    def __init__(self, tr: Any, tracker: TransactionTracker) -> None:
+        super().__init__(tr, self, False)
+        self.tracker = tracker
+        self.snapshot = TrackedRead(tr.snapshot, self, True)
+        self._reset()
+
+    def _reset(self) -> None:
+        self.estimated_size: int = 0
+        self.mutations: int = 0
+        self.structures: Dict[str, Counter] = {}
+        self.read_ranges: List[Tuple[bytes, bytes]] = []
+        self.write_ranges: List[Tuple[bytes, bytes]] = []
+        self.read_prefixes: Counter = Counter()
+        self.write_prefixes: Counter = Counter()
+        self._warned: set = set()
+        self._emitted: bool = False
+
+    def _stats(self, key: bytes) -> Counter:
+        name, _ = self.tracker.structure_for(key)
+        stats = self.structures.get(name)
+        if stats is None:
+            stats = self.structures[name] = Counter()
+        return stats
+
+    def _record_read(self, begin: bytes, end: bytes, snapshot: bool) -> None:
+        self._stats(begin)['reads'] += 1
+        self.read_prefixes[self.tracker.prefix_of(begin)] += 1
+        if not snapshot:
+            self.read_ranges.append((begin, end))
+            self.estimated_size += len(begin) + len(end)
+            self._check()
+
+    def _record_read_bytes(self, key: bytes, value: bytes) -> None:
+        self._stats(key)['bytes_read'] += len(key) + len(value)
+
+    def _record_value_bytes(self, key: bytes, value: Optional[bytes]) -> None:
+        if value is not None:
+            self._stats(key)['bytes_read'] += len(value)
+
+    def _record_write(self, begin: bytes, end: bytes, size: int) -> None:
+        stats = self._stats(begin)
+        stats['mutations'] += 1
+        stats['bytes_written'] += size
+        self.mutations += 1
+        self.write_ranges.append((begin, end))
+        self.write_prefixes[self.tracker.prefix_of(begin)] += 1
+        # The mutation itself and its write conflict range
+        self.estimated_size += size + len(begin) + len(end)
+        self._check()
+
+    def _check(self) -> None:
+        budget = self.tracker.budget
+        self._check_limit('bytes', self.estimated_size, budget.max_bytes)
+        self._check_limit('mutations', self.mutations, budget.max_mutations)
+        self._check_limit('read ranges', len(self.read_ranges),
+                          budget.max_read_ranges)
+
+    def _check_limit(self, what: str, used: int, limit: Optional[int]) -> None:
+        if limit is None:
+            return
+        budget = self.tracker.budget
+        if used > limit:
+            msg = f'transaction {what} of {used} exceeds the budget of {limit}'
+            if budget.strict:
+                raise BudgetExceededError(msg)
+            if (what, 'exceeded') not in self._warned:
+                self._warned.add((what, 'exceeded'))
+                warnings.warn(msg, BudgetWarning, stacklevel=4)
+        elif used >= limit * budget.warn_ratio and (what, 'near') not in self._warned:
+            self._warned.add((what, 'near'))
+            warnings.warn(f'transaction {what} of {used} is over '
+                          f'{budget.warn_ratio:.0%} of the budget of {limit}',
+                          BudgetWarning, stacklevel=4)
+
+    def set(self, key: bytes, value: bytes) -> None:
+        self._record_write(key, key + b'\x00', len(key) + len(value))
+        self._tr.set(key, value)
+
+    def clear(self, key: bytes) -> None:
+        self._record_write(key, key + b'\x00', len(key))
+        self._tr.clear(key)
+
+    def clear_range(self, begin: bytes, end: bytes) -> None:
+        self._record_write(begin, end, len(begin) + len(end))
+        self._tr.clear_range(begin, end)
+
+    def clear_range_startswith(self, prefix: bytes) -> None:
+        self.clear_range(prefix, prefix + b'\xff')
+
+    def __setitem__(self, key: bytes, value: bytes) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        if isinstance(key, slice):
+            self.clear_range(key.start, key.stop)
+        else:
+            self.clear(key)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._tr, name)
+        if name not in self.MUTATIONS:
+            return attr
+        def mutation(key: bytes, param: bytes) -> Any:
+            self._record_write(key, key + b'\x00', len(key) + len(param))
+            return attr(key, param)
+        return mutation
+
+    def report(self) -> Dict:
+        '''
+            Returns a dict describing everything recorded in this transaction.
+        '''
+        return {
+            'estimated_size': self.estimated_size,
+            'mutations': self.mutations,
+            'structures': {name: dict(stats) for name, stats in self.structures.items()},
+            'read_ranges': list(self.read_ranges),
+            'write_ranges': list(self.write_ranges),
+            'read_prefixes': dict(self.read_prefixes),
+            'write_prefixes': dict(self.write_prefixes),
+        }
+
+    def _emit(self) -> None:
+        if not self._emitted:
+            self._emitted = True
+            self.tracker._finish(self.report())
+
+    def _committed(self, future: Any) -> None:
+        try:
+            future.wait()
+        except Exception:
+            return
+        self._emit()
+
+    def commit(self) -> Any:
+        future = self._tr.commit()
+        future.on_ready(self._committed)
+        return future
+
+    def __enter__(self) -> 'TrackedTransaction':
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is None:
+            self._emit()
+
+    def on_error(self, error: Any) -> Any:
+        future = self._tr.on_error(error)
+        self._reset()
+        return future
@@ -0,0 +1,148 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from collections import OrderedDict
+import threading
+import time
+
+
+# Supported eviction policies
+EVICTION_LRU: str = 'lru'
+EVICTION_FIFO: str = 'fifo'
+EVICTION_POLICIES = (EVICTION_LRU, EVICTION_FIFO)
+
+
+class LRUCache:
+    '''
+        A bounded, thread-safe mapping with hit, miss and eviction counters. When
+        full, adding an entry evicts the least recently used entry ("lru") or the
+        oldest added entry ("fifo"). If ttl is set entries expire ttl seconds, as
+        measured by timer, after they were added and are evicted when next looked
+        up. on_evict, if set, is called with the key and value of every evicted
+        entry after the cache's lock is released.
+    '''
+
+    def __init__(self, maxsize: int, eviction: str = EVICTION_LRU,
+                 ttl: Optional[float] = None,
+                 on_evict: Optional[Callable[[Hashable, Any], Any]] = None,
+                 timer: Callable[[], float] = time.monotonic) -> None:
+        if not isinstance(maxsize, int) or maxsize <= 0:
+            raise ValueError('maxsize must be an int greater than 0')
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f'eviction must be one of {EVICTION_POLICIES}, '
+                             f'got: {eviction}')
+        if ttl is not None and ttl <= 0:
+            raise ValueError('ttl must be greater than 0 or None')
+        self.maxsize = maxsize
+        self.eviction = eviction
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.timer = timer
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._data: OrderedDict = OrderedDict()
+        # The time each entry expires at, if there is a ttl
+        self._expires: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _expired(self, key: Hashable) -> bool:
+        return self.ttl is not None and self._expires[key] <= self.timer()
+
+    def _evicted(self, key: Hashable, v: Any) -> None:
+        if self.on_evict is not None:
+            self.on_evict(key, v)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                v = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if self._expired(key):
+                del self._data[key]
+                del self._expires[key]
+                self.misses += 1
+                self.evictions += 1
+                expired = True
+            else:
+                if self.eviction == EVICTION_LRU:
+                    self._data.move_to_end(key)
+                self.hits += 1
+                return v
+        if expired:
+            self._evicted(key, v)
+        return default
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        '''
+            Returns an entry without counting a hit or miss or changing its position.
+        '''
+        with self._lock:
+            if key not in self._data or self._expired(key):
+                return default
+            return self._data[key]
+
+    def put(self, key: Hashable, v: Any) -> None:
+        evicted: List = []
+        with self._lock:
+            if self.ttl is not None:
+                self._expires[key] = self.timer() + self.ttl
+            if key in self._data:
+                self._data[key] = v
+                if self.eviction == EVICTION_LRU:
+                    self._data.move_to_end(key)
+                return
+            self._data[key] = v
+            if len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False))
+                self._expires.pop(evicted[0][0], None)
+                self.evictions += 1
+        for evicted_key, evicted_v in evicted:
+            self._evicted(evicted_key, evicted_v)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        '''
+            Removes an entry and returns its value, or default if there is none.
+        '''
+        with self._lock:
+            self._expires.pop(key, None)
+            return self._data.pop(key, default)
+
+    def discard(self, key: Hashable) -> None:
+        self.pop(key)
+
+    def discard_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        '''
+            Discards every entry whose key the predicate returns True for, returns
+            the number of entries discarded.
+        '''
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+                self._expires.pop(key, None)
+            return len(keys)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,148 @@
+'''
+    Versionstamped change logs. Structures with changelog set append an entry for
+    every write made through them to their changelog_subspace, keyed by the
+    committing transaction's versionstamp so entries are in commit order and
+    writers never conflict. Consumers read the log from a saved cursor in bounded
+    batches, doing work in proportion to the changes rather than the keyspace.
+'''
+
+
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional, Tuple
+import functools
+import threading
+import weakref
+from .errors import ValidationError
+
+
+# Each log key is the log's prefix followed by the 10 byte transaction version,
+# filled in by FoundationDB when the transaction commits, and a 2 byte big-endian
+# sequence number of the change within the transaction
+CURSOR_LENGTH: int = 12
+INCOMPLETE_VERSION: bytes = b'\xff' * 10
+MAX_SEQUENCE: int = 0xffff
+
+# The next sequence number of each transaction writing to a change log, restarted
+# when the transaction is retried
+_sequences: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_sequences_lock = threading.Lock()
+
+
+class Change(NamedTuple):
+    '''
+        One write from a change log. cursor is the 12 byte versionstamp of the
+        change, pass it back to read the changes after it. op is the name of the
+        Structure method which wrote it, key the key tuple or, for "clear_range",
+        the prefix tuple. value is the written value if the structure logs values:
+        the value tuple of "set" and "append", a dict of changed fields for
+        "update" and the operand of atomic mutations such as "add".
+    '''
+    cursor: bytes
+    op: str
+    key: Tuple
+    value: Any
+
+
+def _restarting(tr: Any, method: Callable) -> Callable:
+    '''
+        Wraps a transaction's on_error() or reset(), which start a new attempt, to
+        restart its sequence numbers.
+    '''
+    @functools.wraps(method)
+    def restart(*args: Any, **kwargs: Any) -> Any:
+        with _sequences_lock:
+            _sequences[tr] = 0
+        return method(*args, **kwargs)
+    return restart
+
+
+def _sequence(tr: Any) -> int:
+    with _sequences_lock:
+        sequence = _sequences.get(tr)
+        if sequence is None:
+            sequence = 0
+            for name in ('on_error', 'reset'):
+                method = getattr(tr, name, None)
+                if method is not None:
+                    try:
+                        setattr(tr, name, _restarting(tr, method))
+                    except AttributeError:
+                        pass
+        if sequence > MAX_SEQUENCE:
+            raise ValidationError(f'a transaction can log at most {MAX_SEQUENCE + 1} '
+                                  f'changes')
+        _sequences[tr] = sequence + 1
+    return sequence
+
+
+def log_change(tr: Any, prefix: bytes, entry: bytes) -> None:
+    '''
+        Appends an entry to the change log at prefix with a versionstamped key.
+    '''
+    sequence = _sequence(tr).to_bytes(2, 'big')
+    offset = len(prefix).to_bytes(4, 'little')
+    tr.set_versionstamped_key(prefix + INCOMPLETE_VERSION + sequence + offset, entry)
+
+
+def check_cursor(cursor: Optional[bytes]) -> None:
+    if cursor is not None and (not isinstance(cursor, bytes) or
+                               len(cursor) != CURSOR_LENGTH):
+        raise ValidationError(f'cursor must be None or {CURSOR_LENGTH} bytes, '
+                              f'got: {cursor!r}')
+
+
+def log_range(prefix: bytes, after: Optional[bytes]) -> Tuple[bytes, bytes]:
+    '''
+        Returns the range of log keys after a cursor, or every log key. No
+        transaction version starts with 0xff so it ends every log key.
+    '''
+    check_cursor(after)
+    begin = prefix if after is None else prefix + after + b'\x00'
+    return begin, prefix + b'\xff'
+
+
+class ChangeConsumer:
+    '''
+        Reads a structure's change log from a cursor in batches of at most
+        batch_size changes, one transaction per batch. cursor is advanced past
+        each batch read, save it once the batch is processed to resume from it.
+    '''
+
+    def __init__(self, structure: Any, db: Any, cursor: Optional[bytes] = None,
+                 batch_size: int = 500) -> None:
+        check_cursor(cursor)
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValidationError(f'batch_size must be an int of 1 or more, '
+                                  f'got: {batch_size}')
+        structure._check_changelog('ChangeConsumer')
+        self.structure = structure
+        self.db = db
+        self.cursor = cursor
+        self.batch_size = batch_size
+
+    def poll(self) -> List[Change]:
+        '''
+            Returns the next batch of changes, an empty list once caught up.
+        '''
+        tr = self.db.create_transaction()
+        while True:
+            try:
+                changes = self.structure.changes(tr, self.cursor, self.batch_size,
+                                                 snapshot=True)
+                break
+            except Exception as e:
+                if not hasattr(e, 'code'):
+                    raise
+                tr.on_error(e).wait()
+        if changes:
+            self.cursor = changes[-1].cursor
+        return changes
+
+    def __iter__(self) -> Iterator[Change]:
+        '''
+            Iterates every change after the cursor until caught up.
+        '''
+        while True:
+            changes = self.poll()
+            if not changes:
+                return
+            yield from changes
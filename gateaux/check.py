@@ -0,0 +1,32 @@
+'''
+    Non-raising validation of keys and values. Structure.check_key() and its
+    relatives return a CheckError for each reason packing would fail instead of
+    raising ValidationError, so batches of untrusted rows can be validated and the
+    bad rows set aside without the cost of an exception and message per failure.
+'''
+
+
+from typing import Any, NamedTuple, Optional
+
+
+# Constraints failed by a whole key or value tuple rather than one field
+TYPE: str = 'type'
+LENGTH: str = 'length'
+VERSIONSTAMP: str = 'versionstamp'
+
+
+class CheckError(NamedTuple):
+    '''
+        One reason a key or value would not pack. row is the position in a batch,
+        None for single checks, and part is "key" or "value". field_index and
+        field are the index and name of the failing field, None and '' when the
+        whole tuple fails. constraint names what failed, such as "required", "type",
+        "min_value", "max_value", "max_length" or "members" for fields and "type",
+        "length" or "versionstamp" for tuples. value is the rejected value.
+    '''
+    row: Optional[int]
+    part: str
+    field_index: Optional[int]
+    field: str
+    constraint: str
+    value: Any
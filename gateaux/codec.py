@@ -0,0 +1,171 @@
+'''
+    Fixed layout value encoding. When every value field of a Structure has a fixed
+    width encoding the values can be packed with one precomputed struct.Struct
+    instead of the FoundationDB tuple layer, which skips type codes, null escaping
+    and variable length integers and produces smaller values. Values start with a
+    version byte followed by a bitmap of which null=True fields are None, if there
+    are any, and then each field at a fixed offset.
+'''
+
+
+from typing import Any, List, Optional, Tuple
+from struct import Struct, error as StructError
+from .errors import StructureError, ValidationError
+from .fields.base import BaseField
+from .fields.integer import IntegerField
+from .fields.float import FloatField
+from .fields.boolean import BooleanField
+from .fields.enum import EnumField
+from .fields.datetime import DateTimeField
+from .fields.uuid import UUIDField
+from .fields.ipv4address import IPv4AddressField
+from .fields.ipv6address import IPv6AddressField
+from .fields.ipv4network import IPv4NetworkField
+from .fields.ipv6network import IPv6NetworkField
+
+
+# Supported value codecs, "tuple" is the FoundationDB tuple layer
+VALUE_CODECS: Tuple[str, ...] = ('tuple', 'struct')
+
+# The first byte of every value packed by a StructCodec
+STRUCT_CODEC_VERSION: int = 1
+
+INT64_MIN: int = -2 ** 63
+INT64_MAX: int = 2 ** 63 - 1
+
+# (field class, struct format, placeholder packed for None, unpack needs field)
+FIXED_FORMATS: Tuple[Tuple[type, str, Any, bool], ...] = (
+    (BooleanField, '?', False, False),
+    (EnumField, 'q', 0, False),
+    (IntegerField, 'q', 0, False),
+    (FloatField, 'd', 0.0, False),
+    (DateTimeField, 'd', 0.0, True),
+    (UUIDField, '16s', b'', True),
+    (IPv4AddressField, '4s', b'', True),
+    (IPv6AddressField, '16s', b'', True),
+    (IPv4NetworkField, '5s', b'', True),
+    (IPv6NetworkField, '17s', b'', True),
+)
+
+
+def fixed_format(field: BaseField) -> Optional[Tuple[str, Any, bool]]:
+    for field_class, fmt, placeholder, convert in FIXED_FORMATS:
+        if isinstance(field, field_class):
+            return fmt, placeholder, convert
+    return None
+
+
+class StructCodec:
+    '''
+        Packs and unpacks value tuples for a tuple of fixed width fields with a
+        single struct.Struct. Every value is still validated by its field's pack()
+        and integers are checked to fit in 64 bits.
+    '''
+
+    def __init__(self, fields: Tuple[BaseField, ...], name: str = '') -> None:
+        self.fields = fields
+        formats: List[str] = []
+        self.placeholders: List[Any] = []
+        self.converted: List[int] = []
+        self.integers: List[int] = []
+        self.nullable: List[int] = []
+        for i, field in enumerate(fields):
+            fixed = fixed_format(field)
+            if fixed is None:
+                raise StructureError(f'{name}.value[{i}] is a '
+                                     f'{field.__class__.__name__} which has no fixed '
+                                     f'width, value_codec "struct" requires fixed '
+                                     f'width value fields')
+            fmt, placeholder, convert = fixed
+            formats.append(fmt)
+            self.placeholders.append(placeholder)
+            if convert:
+                self.converted.append(i)
+            if fmt == 'q':
+                self.integers.append(i)
+            if field.null:
+                self.nullable.append(i)
+        self.bitmap_size: int = (len(self.nullable) + 7) // 8
+        header = 'B' + (f'{self.bitmap_size}s' if self.bitmap_size else '')
+        self.header_items: int = 2 if self.bitmap_size else 1
+        self.struct: Struct = Struct('<' + header + ''.join(formats))
+        self.size: int = self.struct.size
+
+    def pack(self, value_tuple: Tuple) -> bytes:
+        '''
+            Validates each value with its field then packs the tuple with one
+            struct call.
+        '''
+        packed: List[Any] = []
+        bitmap = 0
+        fields = self.fields
+        for i, v in enumerate(value_tuple):
+            field = fields[i]
+            if v is None and field.null and not field.default:
+                bitmap |= 1 << self.nullable.index(i)
+                packed.append(self.placeholders[i])
+            else:
+                packed.append(field.pack(v))
+        for i in self.integers:
+            v = packed[i]
+            if not INT64_MIN <= v <= INT64_MAX:
+                raise ValidationError(f'value {v} does not fit in 64 bits')
+        if self.bitmap_size:
+            header: Tuple = (STRUCT_CODEC_VERSION,
+                             bitmap.to_bytes(self.bitmap_size, 'little'))
+        else:
+            header = (STRUCT_CODEC_VERSION,)
+        try:
+            return self.struct.pack(*header, *packed)
+        except StructError as e:
+            raise ValidationError(f'cannot pack value: {e}')
+
+    def check(self, value_tuple: Tuple) -> List[Tuple[int, str]]:
+        '''
+            Returns the (index, constraint) of each value pack() would reject,
+            without raising.
+        '''
+        errors: List[Tuple[int, str]] = []
+        fields = self.fields
+        for i, v in enumerate(value_tuple):
+            field = fields[i]
+            if v is None and field.null and not field.default:
+                continue
+            constraint = field.check(v)
+            if constraint is None and i in self.integers:
+                if v is None:
+                    v = field.default
+                if not INT64_MIN <= v <= INT64_MAX:
+                    constraint = 'int64'
+            if constraint is not None:
+                errors.append((i, constraint))
+        return errors
+
+    def unpack(self, data: bytes) -> Tuple:
+        '''
+            Unpacks a value with one struct call, only fields which store a different
+            type to the one they return are passed through their field's unpack().
+        '''
+        if not isinstance(data, bytes):
+            raise ValidationError(f'can only unpack bytes, got: {type(data)}')
+        if len(data) != self.size:
+            raise ValidationError(f'expected a value of {self.size} bytes, '
+                                  f'got: {len(data)}')
+        if data[0] != STRUCT_CODEC_VERSION:
+            raise ValidationError(f'unknown value codec version {data[0]}')
+        items = self.struct.unpack(data)
+        values = items[self.header_items:]
+        if not self.converted and not self.bitmap_size:
+            return values
+        unpacked = list(values)
+        nulls = set()
+        if self.bitmap_size:
+            bitmap = int.from_bytes(items[1], 'little')
+            for bit, i in enumerate(self.nullable):
+                if bitmap >> bit & 1:
+                    nulls.add(i)
+                    unpacked[i] = None
+        for i in self.converted:
+            if i not in nulls:
+                unpacked[i] = self.fields[i].unpack(unpacked[i])
+        return tuple(unpacked)
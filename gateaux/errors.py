@@ -26,3 +26,19 @@ class ValidationError(GateauxError):
         IntegerField.
     '''
     pass
+
+
+class BudgetExceededError(GateauxError):
+    '''
+        Raised by a tracked transaction in strict mode when it exceeds one of its
+        budgets, such as the estimated transaction size.
+    '''
+    pass
+
+
+class BudgetWarning(UserWarning):
+    '''
+        Warned by a tracked transaction when it approaches or exceeds one of its
+        budgets.
+    '''
+    pass
@@ -0,0 +1,179 @@
+from typing import Any, Dict, Optional, Tuple, Type, Union
+from array import array
+from math import isfinite
+import sys
+from .base import BaseField
+from ..errors import FieldError, ValidationError
+try:
+    import numpy
+except ImportError:
+    numpy = None # type: ignore
+
+
+# dtype: (array typecode, numpy dtype)
+DTYPES: Dict[str, Tuple[str, str]] = {
+    'i4': ('i', '<i4'),
+    'i8': ('q', '<i8'),
+    'f4': ('f', '<f4'),
+    'f8': ('d', '<f8'),
+}
+
+DECODERS: Tuple[str, ...] = ('auto', 'array', 'memoryview', 'numpy')
+
+FLOAT32_MAX: float = 3.4028234663852886e38
+
+# dtype: (smallest, largest) value
+RANGES: Dict[str, Tuple[float, float]] = {
+    'i4': (-2 ** 31, 2 ** 31 - 1),
+    'i8': (-2 ** 63, 2 ** 63 - 1),
+    'f4': (-FLOAT32_MAX, FLOAT32_MAX),
+    'f8': (-sys.float_info.max, sys.float_info.max),
+}
+
+
+class ArrayField(BaseField):
+    '''
+        An ArrayField() takes a list or tuple of numbers, an array.array, a
+        memoryview or a NumPy array and stores the numbers as one contiguous
+        little-endian buffer of dtype "i4", "i8", "f4" or "f8". Unpacking decodes the
+        buffer without a Python object per element: decode "array" returns an
+        array.array, "memoryview" a read-only memoryview and "numpy" a read-only NumPy
+        array made with numpy.frombuffer(). The default "auto" uses NumPy if it is
+        installed and array.array if not.
+    '''
+
+    data_type: Type = object
+
+    def __init__(self, dtype: str = 'f8', max_length: Union[None, int] = None,
+                 decode: str = 'auto', **kwargs) -> None:
+        if dtype not in DTYPES:
+            raise FieldError(f'dtype must be one of {tuple(DTYPES)}')
+        if max_length is not None and (not isinstance(max_length, int) or
+                                       max_length < 0):
+            raise FieldError('max_length must be an int of 0 or more')
+        if decode not in DECODERS:
+            raise FieldError(f'decode must be one of {DECODERS}')
+        if decode == 'numpy' and numpy is None:
+            raise FieldError('decode "numpy" requires NumPy to be installed')
+        if decode == 'memoryview' and sys.byteorder == 'big':
+            raise FieldError('decode "memoryview" requires a little-endian host')
+        if decode == 'auto':
+            decode = 'array' if numpy is None else 'numpy'
+        self.dtype: str = dtype
+        self.max_length: Union[None, int] = max_length
+        self.decode: str = decode
+        self.typecode, self.numpy_dtype = DTYPES[dtype]
+        self.itemsize: int = array(self.typecode).itemsize
+        accepted: Tuple = (list, tuple, array, memoryview)
+        if numpy is not None:
+            accepted += (numpy.ndarray,)
+        self.data_type = accepted # type: ignore
+        super().__init__(**kwargs)
+
+    @property
+    def mutable(self) -> bool:
+        '''
+            True if unpacked values can be modified, so must not be shared.
+        '''
+        return self.decode == 'array'
+
+    def pack(self, v: Any) -> Optional[bytes]:
+        '''
+            Pack a sequence of numbers into a little-endian buffer.
+        '''
+        v = self.validate_packed(v)
+        if v is None:
+            return None
+        problem = self._problem(v)
+        if problem is not None:
+            raise ValidationError(problem[1])
+        if numpy is not None and isinstance(v, numpy.ndarray):
+            return numpy.ascontiguousarray(v, dtype=self.numpy_dtype).tobytes()
+        if isinstance(v, memoryview):
+            v = array(self.typecode, v.tobytes())
+        elif not isinstance(v, array) or v.typecode != self.typecode:
+            v = array(self.typecode, v)
+        if sys.byteorder == 'big':
+            v = array(self.typecode, v)
+            v.byteswap()
+        return v.tobytes()
+
+    def check(self, v: Any) -> Optional[str]:
+        error, v = self._check_packed(v)
+        if error is not None or v is None:
+            return error
+        problem = self._problem(v)
+        return None if problem is None else problem[0]
+
+    def _problem(self, v: Any) -> Optional[Tuple[str, str]]:
+        '''
+            Returns the constraint an accepted type of value fails and its error
+            message, "max_length", "dtype" for the wrong array type or element type
+            and "range" for an element out of range of the dtype, or None.
+        '''
+        if self.max_length is not None and len(v) > self.max_length:
+            return 'max_length', (f'array length of {len(v)} exceeds max_length of '
+                                  f'{self.max_length}')
+        if numpy is not None and isinstance(v, numpy.ndarray):
+            return self._numpy_problem(v)
+        if isinstance(v, memoryview):
+            if v.ndim != 1 or v.format != self.typecode:
+                return 'dtype', (f'expected a 1 dimensional memoryview of format '
+                                 f'{self.typecode}, got: {v.format}')
+            return None
+        if isinstance(v, array) and v.typecode == self.typecode:
+            return None
+        integer = self.dtype[0] == 'i'
+        types = int if integer else (int, float)
+        low, high = RANGES[self.dtype]
+        for i, n in enumerate(v):
+            if isinstance(n, bool) or not isinstance(n, types):
+                return 'dtype', (f'array element {i} must be an '
+                                 f'{"int" if integer else "int or float"}, '
+                                 f'got: {type(n)}')
+            if not low <= n <= high and (isinstance(n, int) or isfinite(n)):
+                return 'range', (f'array element {i} of {n} is out of range for '
+                                 f'dtype {self.dtype}')
+        return None
+
+    def _numpy_problem(self, v: Any) -> Optional[Tuple[str, str]]:
+        '''
+            NumPy arrays are cast to the dtype, a cast which could wrap or overflow
+            has its values checked against the range of the dtype.
+        '''
+        kind = 'i' if self.dtype[0] == 'i' else 'if'
+        if v.ndim != 1 or v.dtype.kind not in kind:
+            return 'dtype', (f'expected a 1 dimensional array of dtype {self.dtype}, '
+                             f'got: {v.dtype} with {v.ndim} dimensions')
+        if not len(v) or numpy.can_cast(v.dtype, self.numpy_dtype, 'safe'):
+            return None
+        low, high = RANGES[self.dtype]
+        if v.dtype.kind == 'f':
+            v = v[numpy.isfinite(v)]
+            if not len(v):
+                return None
+        smallest, largest = v.min(), v.max()
+        if smallest < low or largest > high:
+            n = smallest if smallest < low else largest
+            return 'range', (f'array element of {n} is out of range for dtype '
+                             f'{self.dtype}')
+        return None
+
+    def unpack(self, v: bytes) -> Any:
+        '''
+            Decode a little-endian buffer into an array.array, memoryview or NumPy
+            array.
+        '''
+        if not isinstance(v, bytes):
+            raise ValidationError(f'unpack() expected bytes, got: {type(v)}')
+        if len(v) % self.itemsize:
+            raise ValidationError(f'unpack() expected a multiple of {self.itemsize} '
+                                  f'bytes, got: {len(v)}')
+        if self.decode == 'numpy':
+            return numpy.frombuffer(v, dtype=self.numpy_dtype)
+        if self.decode == 'memoryview':
+            return memoryview(v).cast(self.typecode) # type: ignore
+        unpacked = array(self.typecode, v)
+        if sys.byteorder == 'big':
+            unpacked.byteswap()
+        return unpacked
@@ -0,0 +1,118 @@
+from typing import Any, Optional, Tuple, Type
+from struct import Struct
+from .base import BaseField
+from ..errors import FieldError, ValidationError
+
+
+SIGNED_64: Struct = Struct('<q')
+UNSIGNED_64: Struct = Struct('<Q')
+
+
+class AtomicField(BaseField):
+    '''
+        An AtomicField() takes and returns integers and stores them as 8 little-endian
+        bytes, the format FoundationDB's atomic mutations operate on. As atomic
+        mutations apply to the whole value an AtomicField must be the only value
+        field of a Structure, which then packs values as the raw 8 bytes rather than
+        as a tuple. atomic_ops are the names of the transaction mutations which may
+        be applied to the field through the Structure.
+    '''
+
+    data_type: Type = int
+    atomic_ops: Tuple[str, ...] = ()
+    codec: Struct = UNSIGNED_64
+    min_value: int = 0
+    max_value: int = 2 ** 64 - 1
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        if self.null:
+            raise FieldError(f'{self.__class__.__name__} cannot be null')
+
+    def pack(self, v: int) -> bytes:
+        '''
+            Pack an int into 8 little-endian bytes.
+        '''
+        v = self.validate_packed(v)
+        if v < self.min_value or v > self.max_value:
+            raise ValidationError(f'value {v} out of range for '
+                                  f'{self.__class__.__name__}, must be between '
+                                  f'{self.min_value} and {self.max_value}')
+        return self.codec.pack(v)
+
+    def check(self, v: Any) -> Optional[str]:
+        error, v = self._check_packed(v)
+        if error is not None:
+            return error
+        if v < self.min_value:
+            return 'min_value'
+        if v > self.max_value:
+            return 'max_value'
+        return None
+
+    def unpack(self, v: bytes) -> int:
+        '''
+            Unpack 8 little-endian bytes into an int.
+        '''
+        if not isinstance(v, bytes):
+            raise ValidationError(f'unpack() expected bytes, got: {type(v)}')
+        if len(v) != 8:
+            raise ValidationError(f'unpack() expected exactly 8 bytes, got: {len(v)}')
+        return self.validate_unpacked(self.codec.unpack(v)[0])
+
+
+class CounterField(AtomicField):
+    '''
+        A CounterField() stores a signed 64-bit integer which is incremented or
+        decremented without reading it with Structure.add().
+    '''
+
+    atomic_ops: Tuple[str, ...] = ('add',)
+    codec: Struct = SIGNED_64
+    min_value: int = -2 ** 63
+    max_value: int = 2 ** 63 - 1
+
+
+class MinField(AtomicField):
+    '''
+        A MinField() stores an unsigned 64-bit integer which is lowered to the
+        smaller of the stored and given values with Structure.min().
+    '''
+
+    atomic_ops: Tuple[str, ...] = ('min',)
+
+
+class MaxField(AtomicField):
+    '''
+        A MaxField() stores an unsigned 64-bit integer which is raised to the larger
+        of the stored and given values with Structure.max().
+    '''
+
+    atomic_ops: Tuple[str, ...] = ('max',)
+
+
+class BitAndField(AtomicField):
+    '''
+        A BitAndField() stores an unsigned 64-bit integer which is combined with
+        given values using bitwise and with Structure.bit_and().
+    '''
+
+    atomic_ops: Tuple[str, ...] = ('bit_and',)
+
+
+class BitOrField(AtomicField):
+    '''
+        A BitOrField() stores an unsigned 64-bit integer which is combined with
+        given values using bitwise or with Structure.bit_or().
+    '''
+
+    atomic_ops: Tuple[str, ...] = ('bit_or',)
+
+
+class BitXorField(AtomicField):
+    '''
+        A BitXorField() stores an unsigned 64-bit integer which is combined with
+        given values using bitwise xor with Structure.bit_xor().
+    '''
+
+    atomic_ops: Tuple[str, ...] = ('bit_xor',)
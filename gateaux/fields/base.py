@@ -1,4 +1,4 @@
-from typing import Any, Type
+from typing import Any, Optional, Tuple, Type
 from ..errors import ValidationError
 
 
@@ -71,6 +71,42 @@ class BaseField:
                                   f'{self.data_type}, got {type(v)}')
         return v
 
+    def check(self, v: Any) -> Optional[str]:
+        '''
+            Returns None if pack() accepts v, otherwise the name of the constraint v
+            fails, such as "required", "type" or "max_length", without raising.
+            Fields without their own checks call pack() and return "invalid".
+        '''
+        try:
+            self.pack(v)
+        except Exception:
+            return 'invalid'
+        return None
+
+    def _check_packed(self, v: Any) -> Tuple[Optional[str], Any]:
+        '''
+            Returns the constraint validate_packed() fails for v, or None, and the
+            value it returns.
+        '''
+        if v is None:
+            if self.default:
+                return None, self.default
+            if not self.null:
+                return 'required', None
+            return None, None
+        if not isinstance(v, self.data_type):
+            return 'type', v
+        return None, v
+
+    def _check_converted(self, v: Any) -> Optional[str]:
+        '''
+            check() for fields whose pack() converts the value, which fails for None.
+        '''
+        error, v = self._check_packed(v)
+        if error is None and v is None:
+            return 'type'
+        return error
+
     def validate_unpacked(self, v: Any) -> Any:
         '''
             Performs validation on a value after unpack()ing.
@@ -1,4 +1,4 @@
-from typing import Type
+from typing import Any, Optional, Type
 from .base import BaseField
 from ..errors import ValidationError
 
@@ -20,6 +20,9 @@ class BooleanField(BaseField):
         '''
         return self.validate_packed(v)
 
+    def check(self, v: Any) -> Optional[str]:
+        return self._check_packed(v)[0]
+
     def unpack(self, v: bool) -> bool:
         '''
             No unpacking is required.
@@ -1,4 +1,4 @@
-from typing import Type
+from typing import Any, Optional, Type
 from datetime import datetime
 from calendar import timegm
 import pytz
@@ -27,6 +27,9 @@ class DateTimeField(BaseField):
         unixts:int = timegm(v.timetuple())
         return unixts + (v.microsecond / 1000000)
 
+    def check(self, v: Any) -> Optional[str]:
+        return self._check_converted(v)
+
     def unpack(self, v: float) -> datetime:
         '''
             Convert a UNIX timestamp to a datetime in UTC.
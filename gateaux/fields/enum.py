@@ -1,4 +1,4 @@
-from typing import Type, Tuple
+from typing import Any, Optional, Tuple, Type
 from .base import BaseField
 from ..errors import FieldError, ValidationError
 
@@ -32,6 +32,12 @@ class EnumField(BaseField):
             raise ValidationError('{v} is not a valid member int')
         return v
 
+    def check(self, v: Any) -> Optional[str]:
+        error, v = self._check_packed(v)
+        if error is not None:
+            return error
+        return None if v in self.members else 'members'
+
     def unpack(self, v: int) -> int:
         '''
             No unpacking is required.
@@ -1,4 +1,4 @@
-from typing import Type, Union
+from typing import Any, Optional, Type, Union
 from .base import BaseField
 from ..errors import FieldError, ValidationError
 
@@ -32,6 +32,19 @@ class FloatField(BaseField):
                                   f'{self.max_value}')
         return v
 
+    def check(self, v: Any) -> Optional[str]:
+        error, v = self._check_packed(v)
+        if error is not None:
+            return error
+        if v is None:
+            # pack() fails comparing None with a limit
+            return 'type' if self.min_value or self.max_value else None
+        if self.min_value and v < self.min_value:
+            return 'min_value'
+        if self.max_value and v > self.max_value:
+            return 'max_value'
+        return None
+
     def unpack(self, v: float) -> float:
         '''
             No unpacking is required.
@@ -0,0 +1,58 @@
+from typing import Any, Optional, Type
+from zlib import crc32
+import fdb.tuple
+from .base import BaseField
+from ..errors import FieldError
+
+
+class HashPrefix(BaseField):
+    '''
+        HashPrefix(field, buckets=N) wraps the first key field of a Structure to
+        spread keys which would otherwise be written in increasing order, such as
+        timestamps, across N ranges of the keyspace. The Structure prefixes each key
+        with a bucket number derived deterministically from the key field at index
+        hash_field, the wrapped field by default. The wrapped field packs and unpacks
+        values as usual, the bucket is added and removed by the Structure.
+    '''
+
+    def __init__(self, field: BaseField, buckets: int = 16, hash_field: int = 0,
+                 **kwargs) -> None:
+        if not isinstance(field, BaseField) or isinstance(field, HashPrefix):
+            raise FieldError('field must be a field other than HashPrefix')
+        if not isinstance(buckets, int) or not 1 <= buckets <= 256:
+            raise FieldError('buckets must be an int between 1 and 256')
+        if not isinstance(hash_field, int) or hash_field < 0:
+            raise FieldError('hash_field must be an int of 0 or more')
+        if kwargs:
+            raise ValueError(f'Unexpected keyword arguments passed to '
+                             f'field: {kwargs.keys()}')
+        self.field: BaseField = field
+        self.buckets: int = buckets
+        self.hash_field: int = hash_field
+        self.data_type: Type = field.data_type
+        self.name = field.name
+        self.help_text = field.help_text
+        self.null = field.null
+        self.default = field.default
+
+    @property
+    def description(self) -> dict:
+        desc = self.field.description
+        desc['hash_prefix'] = {'buckets': self.buckets, 'hash_field': self.hash_field}
+        return desc
+
+    def bucket(self, packed: Any) -> int:
+        '''
+            Returns the bucket for a packed field value. The value is hashed in its
+            tuple encoding so buckets are the same in every process.
+        '''
+        return crc32(fdb.tuple.pack((packed,))) % self.buckets
+
+    def pack(self, v: Any) -> Any:
+        return self.field.pack(v)
+
+    def check(self, v: Any) -> Optional[str]:
+        return self.field.check(v)
+
+    def unpack(self, v: Any) -> Any:
+        return self.field.unpack(v)
@@ -1,4 +1,4 @@
-from typing import Type
+from typing import Any, Optional, Type
 from ipaddress import IPv6Address
 from .base import BaseField
 from ..errors import ValidationError
@@ -22,6 +22,9 @@ class IPv6AddressField(BaseField):
         v = self.validate_packed(v)
         return v.packed
 
+    def check(self, v: Any) -> Optional[str]:
+        return self._check_converted(v)
+
     def unpack(self, v: bytes) -> IPv6Address:
         '''
             Unpack bytes into an IPv6Address.
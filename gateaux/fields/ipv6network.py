@@ -1,4 +1,4 @@
-from typing import Type
+from typing import Any, Optional, Type
 from ipaddress import IPv6Network
 from .base import BaseField
 from ..errors import ValidationError
@@ -24,6 +24,9 @@ class IPv6NetworkField(BaseField):
         v = self.validate_packed(v)
         return v.network_address.packed + bytes([v.prefixlen])
 
+    def check(self, v: Any) -> Optional[str]:
+        return self._check_converted(v)
+
     def unpack(self, v: bytes) -> IPv6Network:
         '''
             Unpack bytes into an IPv6Network.
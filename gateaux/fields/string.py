@@ -1,4 +1,4 @@
-from typing import Type, Union
+from typing import Any, Optional, Type, Union
 from .base import BaseField
 from ..errors import FieldError, ValidationError
 
@@ -25,6 +25,17 @@ class StringField(BaseField):
                                   f'of {self.max_length}')
         return v
 
+    def check(self, v: Any) -> Optional[str]:
+        error, v = self._check_packed(v)
+        if error is not None:
+            return error
+        if v is None:
+            # pack() fails taking the length of None
+            return 'type' if self.max_length else None
+        if self.max_length and len(v) > self.max_length:
+            return 'max_length'
+        return None
+
     def unpack(self, v: str) -> str:
         '''
             No unpacking is required.
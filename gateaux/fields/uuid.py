@@ -1,4 +1,4 @@
-from typing import Type
+from typing import Any, Optional, Type
 from uuid import UUID
 from .base import BaseField
 from ..errors import ValidationError
@@ -22,6 +22,9 @@ class UUIDField(BaseField):
         v = self.validate_packed(v)
         return v.bytes
 
+    def check(self, v: Any) -> Optional[str]:
+        return self._check_converted(v)
+
     def unpack(self, v: bytes) -> UUID:
         '''
             Unpack bytes into a UUID.
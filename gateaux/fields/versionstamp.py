@@ -0,0 +1,39 @@
+from typing import Any, Optional, Type
+from fdb.tuple import Versionstamp
+from .base import BaseField
+from ..errors import ValidationError
+
+
+class VersionstampField(BaseField):
+    '''
+        A VersionstampField() takes and returns fdb.tuple.Versionstamp instances,
+        which FoundationDB's tuple layer stores natively. Packing an incomplete
+        versionstamp, such as Versionstamp.incomplete(), makes the Structure return
+        bytes annotated with the versionstamp's offset for use with
+        set_versionstamped_key() or set_versionstamped_value(). FoundationDB fills in
+        the versionstamp when the transaction commits, so values read back are always
+        complete versionstamps.
+    '''
+
+    data_type: Type = Versionstamp
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+
+    def pack(self, v: Versionstamp) -> Versionstamp:
+        '''
+            No packing is required, the tuple layer packs Versionstamps.
+        '''
+        return self.validate_packed(v)
+
+    def check(self, v: Any) -> Optional[str]:
+        return self._check_packed(v)[0]
+
+    def unpack(self, v: Versionstamp) -> Versionstamp:
+        '''
+            Unpacked versionstamps must be complete.
+        '''
+        v = self.validate_unpacked(v)
+        if not v.is_complete():
+            raise ValidationError('unpack() expected a complete versionstamp')
+        return v
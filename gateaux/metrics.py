@@ -0,0 +1,313 @@
+'''
+    Opt-in runtime metrics for Structures. Metrics are off by default and cost a
+    single module attribute check per pack or unpack while off. Once enabled with
+    gateaux.metrics.enable() every Structure records call counts, encoded sizes,
+    timings per operation and per field type and ValidationError counts per field.
+    Read the data with snapshot() or push it to any registered exporters with
+    export().
+'''
+
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from time import perf_counter
+from bisect import bisect_left
+import threading
+from .errors import ValidationError
+
+
+# Checked on every pack and unpack, use enable() and disable() to change it
+enabled: bool = False
+
+# Upper bounds of histogram buckets, values above the last bound are counted in a
+# final overflow bucket
+SIZE_BUCKETS: Tuple[float, ...] = (8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384,
+                                   65536, 102400)
+LATENCY_BUCKETS: Tuple[float, ...] = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4,
+                                      2.5e-4, 5e-4, 1e-3)
+
+_lock = threading.Lock()
+_structures: Dict[str, 'StructureMetrics'] = {}
+_exporters: List[Callable[[Dict], Any]] = []
+
+
+class Histogram:
+    '''
+        A fixed bucket histogram. counts[i] is the number of observations less than
+        or equal to bounds[i] and greater than the previous bound, the last count is
+        for observations above the last bound.
+    '''
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts: List[int] = [0] * (len(bounds) + 1)
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.bounds, v)] += 1
+
+    def snapshot(self) -> Dict:
+        return {'bounds': list(self.bounds), 'counts': list(self.counts)}
+
+
+class OperationMetrics:
+
+    def __init__(self) -> None:
+        self.calls: int = 0
+        self.errors: int = 0
+        self.bytes: int = 0
+        self.seconds: float = 0.0
+        self.sizes = Histogram(SIZE_BUCKETS)
+        self.latencies = Histogram(LATENCY_BUCKETS)
+
+    def snapshot(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'seconds': self.seconds,
+            'size_histogram': self.sizes.snapshot(),
+            'latency_histogram': self.latencies.snapshot(),
+        }
+
+
+class StructureMetrics:
+    '''
+        Metrics for all instances of one Structure class. The key is the class
+        module and qualified name, the name is the short class name for display.
+    '''
+
+    def __init__(self, key: str, name: str) -> None:
+        self.key = key
+        self.name = name
+        self._lock = threading.Lock()
+        self.operations: Dict[str, OperationMetrics] = {}
+        self.field_types: Dict[str, List] = {}
+        self.validation_errors: Dict[Tuple[str, int, str], int] = {}
+
+    def observe(self, op: str, size: int, seconds: float) -> None:
+        with self._lock:
+            metrics = self.operations.get(op)
+            if metrics is None:
+                metrics = self.operations[op] = OperationMetrics()
+            metrics.calls += 1
+            metrics.bytes += size
+            metrics.seconds += seconds
+            metrics.sizes.observe(size)
+            metrics.latencies.observe(seconds)
+
+    def observe_error(self, op: str) -> None:
+        with self._lock:
+            metrics = self.operations.get(op)
+            if metrics is None:
+                metrics = self.operations[op] = OperationMetrics()
+            metrics.errors += 1
+
+    def observe_fields(self, timings: List[Tuple[str, float]]) -> None:
+        with self._lock:
+            for field_type, seconds in timings:
+                totals = self.field_types.get(field_type)
+                if totals is None:
+                    totals = self.field_types[field_type] = [0, 0.0]
+                totals[0] += 1
+                totals[1] += seconds
+
+    def observe_validation_error(self, part: str, index: int, name: str) -> None:
+        with self._lock:
+            k = (part, index, name)
+            self.validation_errors[k] = self.validation_errors.get(k, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'name': self.name,
+                'operations': {op: m.snapshot() for op, m in self.operations.items()},
+                'field_types': {t: {'calls': c, 'seconds': s}
+                                for t, (c, s) in self.field_types.items()},
+                'validation_errors': [
+                    {'part': part, 'index': index, 'name': name, 'count': count}
+                    for (part, index, name), count in self.validation_errors.items()
+                ],
+            }
+
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+
+def is_enabled() -> bool:
+    return enabled
+
+
+def reset() -> None:
+    '''
+        Discards all recorded metrics.
+    '''
+    with _lock:
+        _structures.clear()
+
+
+def for_structure(structure: Any) -> StructureMetrics:
+    cls = structure.__class__
+    key = f'{cls.__module__}.{cls.__qualname__}'
+    metrics = _structures.get(key)
+    if metrics is None:
+        with _lock:
+            metrics = _structures.setdefault(key, StructureMetrics(key, cls.__name__))
+    return metrics
+
+
+def snapshot() -> Dict:
+    '''
+        Returns a dict of plain data with metrics for every Structure, keyed by the
+        Structure class module and qualified name with the short class name under
+        'name', and field type totals across all Structures.
+    '''
+    with _lock:
+        structures = list(_structures.values())
+    snap: Dict = {'enabled': enabled, 'structures': {}, 'field_types': {}}
+    for metrics in structures:
+        s = snap['structures'][metrics.key] = metrics.snapshot()
+        for field_type, totals in s['field_types'].items():
+            total = snap['field_types'].setdefault(field_type,
+                                                   {'calls': 0, 'seconds': 0.0})
+            total['calls'] += totals['calls']
+            total['seconds'] += totals['seconds']
+    return snap
+
+
+def add_exporter(exporter: Callable[[Dict], Any]) -> None:
+    '''
+        Registers a callable which export() will call with a snapshot() dict, for
+        example to copy metrics into Prometheus collectors.
+    '''
+    with _lock:
+        if exporter not in _exporters:
+            _exporters.append(exporter)
+
+
+def remove_exporter(exporter: Callable[[Dict], Any]) -> None:
+    with _lock:
+        if exporter in _exporters:
+            _exporters.remove(exporter)
+
+
+def export() -> Dict:
+    '''
+        Takes a snapshot, passes it to every registered exporter and returns it.
+    '''
+    snap = snapshot()
+    with _lock:
+        exporters = list(_exporters)
+    for exporter in exporters:
+        exporter(snap)
+    return snap
+
+
+def pack(structure: Any, part: str, fields: Tuple, data_tuple: Tuple,
+         prefix: Tuple = ()) -> bytes:
+    '''
+        Instrumented equivalent of Structure._pack(), used while metrics are enabled.
+    '''
+    metrics = for_structure(structure)
+    op = f'pack_{part}'
+    timings = []
+    start = perf_counter()
+    try:
+        field_packed: list = []
+        for i, v in enumerate(data_tuple):
+            field = fields[i]
+            field_start = perf_counter()
+            try:
+                field_packed.append(field.pack(v))
+            except ValidationError:
+                metrics.observe_validation_error(part, i, field.name)
+                raise
+            finally:
+                timings.append((field.__class__.__name__, perf_counter() - field_start))
+        data = structure._pack_tuple(prefix + tuple(field_packed))
+    except ValidationError:
+        metrics.observe_error(op)
+        raise
+    finally:
+        metrics.observe_fields(timings)
+    metrics.observe(op, len(data), perf_counter() - start)
+    return data
+
+
+def unpack(structure: Any, part: str, fields: Tuple, data_tuple: Tuple,
+           size: int, start: float, positions: Optional[Sequence[int]] = None) -> Tuple:
+    '''
+        Instrumented field unpacking for Structure._unpack() and _project(), used
+        while metrics are enabled. data_tuple is the already unpacked fdb tuple and
+        start is when the unpack began. positions are the field indexes of a
+        projection's data_tuple.
+    '''
+    metrics = for_structure(structure)
+    op = f'unpack_{part}'
+    timings = []
+    try:
+        field_unpacked: list = []
+        for j, v in enumerate(data_tuple):
+            i = j if positions is None else positions[j]
+            field = fields[i]
+            field_start = perf_counter()
+            try:
+                field_unpacked.append(field.unpack(v))
+            except ValidationError:
+                metrics.observe_validation_error(part, i, field.name)
+                raise
+            finally:
+                timings.append((field.__class__.__name__, perf_counter() - field_start))
+    except ValidationError:
+        metrics.observe_error(op)
+        raise
+    finally:
+        metrics.observe_fields(timings)
+    metrics.observe(op, size, perf_counter() - start)
+    return tuple(field_unpacked)
+
+
+def pack_whole(structure: Any, part: str, fields: Tuple, data_tuple: Tuple,
+               pack_func: Callable[[Tuple], bytes]) -> bytes:
+    '''
+        Instrumented packing of a tuple by pack_func in one call, such as an atomic
+        or fixed layout value, used while metrics are enabled. Time is not split
+        between field types, the fields failing a ValidationError are found with
+        their check().
+    '''
+    metrics = for_structure(structure)
+    op = f'pack_{part}'
+    start = perf_counter()
+    try:
+        data = pack_func(data_tuple)
+    except ValidationError:
+        metrics.observe_error(op)
+        for i, v in enumerate(data_tuple):
+            if fields[i].check(v) is not None:
+                metrics.observe_validation_error(part, i, fields[i].name)
+        raise
+    metrics.observe(op, len(data), perf_counter() - start)
+    return data
+
+
+def unpack_whole(structure: Any, part: str, data_bytes: bytes,
+                 unpack_func: Callable[[bytes], Tuple]) -> Tuple:
+    '''
+        Instrumented unpacking of data_bytes by unpack_func in one call, such as an
+        atomic or fixed layout value, used while metrics are enabled.
+    '''
+    metrics = for_structure(structure)
+    op = f'unpack_{part}'
+    start = perf_counter()
+    try:
+        data_tuple = unpack_func(data_bytes)
+    except ValidationError:
+        metrics.observe_error(op)
+        raise
+    metrics.observe(op, len(data_bytes), perf_counter() - start)
+    return data_tuple
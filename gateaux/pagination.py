@@ -0,0 +1,62 @@
+'''
+    Opaque cursors for paging through Structure ranges. A cursor holds the packed
+    key fields after the page's prefix of the last record returned, so the next
+    page is a range read starting just past it, however deep the page. Cursors
+    are URL safe strings, checked on resume against the structure, prefix and
+    direction they were made for.
+'''
+
+
+from typing import List, NamedTuple, Optional, Tuple
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from zlib import crc32
+from .errors import ValidationError
+
+
+CURSOR_FORMAT: int = 1
+# Format, direction and a 4 byte checksum of the structure and prefix
+CURSOR_HEADER_LENGTH: int = 6
+
+
+class Page(NamedTuple):
+    '''
+        One page of a range, its (key tuple, value tuple) rows and the cursor of
+        the next page, None if this is the last page.
+    '''
+    rows: List[Tuple[Tuple, Tuple]]
+    cursor: Optional[str]
+
+
+def _checksum(scope: bytes) -> bytes:
+    return crc32(scope).to_bytes(4, 'big')
+
+
+def encode_cursor(scope: bytes, reverse: bool, suffix: bytes) -> str:
+    '''
+        Returns a cursor resuming after the key suffix, for pages of the range
+        identified by scope read in one direction.
+    '''
+    data = bytes((CURSOR_FORMAT, int(reverse))) + _checksum(scope) + suffix
+    return urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: str, scope: bytes, reverse: bool) -> bytes:
+    '''
+        Returns the key suffix of a cursor, raises ValidationError if it is not a
+        cursor for the range identified by scope read in the same direction.
+    '''
+    if not isinstance(cursor, str):
+        raise ValidationError(f'cursor must be a str, got: {type(cursor)}')
+    try:
+        data = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    except (Base64Error, ValueError):
+        raise ValidationError('cursor is not a valid page cursor')
+    if len(data) <= CURSOR_HEADER_LENGTH or data[0] != CURSOR_FORMAT:
+        raise ValidationError('cursor is not a valid page cursor')
+    if data[1] != int(reverse):
+        direction = 'reverse' if data[1] else 'forward'
+        raise ValidationError(f'cursor is for a {direction} page')
+    if data[2:CURSOR_HEADER_LENGTH] != _checksum(scope):
+        raise ValidationError('cursor is for a different structure or prefix')
+    return data[CURSOR_HEADER_LENGTH:]
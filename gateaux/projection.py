@@ -0,0 +1,129 @@
+'''
+    Projection decoding of packed FoundationDB tuples. Every tuple layer element is
+    self-delimiting, so the encoded bytes of an element can be skipped by reading
+    its type code and length framing without decoding it. This lets a Structure
+    decode only the fields it is asked for out of a wide key or value.
+'''
+
+
+from typing import Dict, Iterable, List, Tuple
+import fdb.tuple
+from .errors import ValidationError
+
+
+NULL_CODE: int = 0x00
+BYTES_CODE: int = 0x01
+STRING_CODE: int = 0x02
+NESTED_CODE: int = 0x05
+NEG_INT_START: int = 0x0b
+INT_ZERO_CODE: int = 0x14
+POS_INT_END: int = 0x1d
+FLOAT_CODE: int = 0x20
+DOUBLE_CODE: int = 0x21
+FALSE_CODE: int = 0x26
+TRUE_CODE: int = 0x27
+UUID_CODE: int = 0x30
+VERSIONSTAMP_CODE: int = 0x33
+
+# Type codes followed by a fixed number of bytes
+FIXED_LENGTHS: Dict[int, int] = {
+    NULL_CODE: 0,
+    FLOAT_CODE: 4,
+    DOUBLE_CODE: 8,
+    FALSE_CODE: 0,
+    TRUE_CODE: 0,
+    UUID_CODE: 16,
+    VERSIONSTAMP_CODE: 12,
+}
+
+
+def _find_terminator(data: bytes, pos: int) -> int:
+    '''
+        Returns the position of the 0x00 ending a bytes or string element, a 0x00
+        followed by 0xff is an escaped 0x00 inside the element.
+    '''
+    while True:
+        pos = data.find(b'\x00', pos)
+        if pos < 0:
+            raise ValidationError('unterminated bytes or string element')
+        if data[pos + 1:pos + 2] != b'\xff':
+            return pos
+        pos += 2
+
+
+def skip_element(data: bytes, pos: int) -> int:
+    '''
+        Returns the position after the tuple element starting at pos.
+    '''
+    code = data[pos]
+    fixed = FIXED_LENGTHS.get(code)
+    if fixed is not None:
+        end = pos + 1 + fixed
+    elif code == BYTES_CODE or code == STRING_CODE:
+        end = _find_terminator(data, pos + 1) + 1
+    elif NEG_INT_START < code < POS_INT_END:
+        end = pos + 1 + abs(code - INT_ZERO_CODE)
+    elif code == POS_INT_END:
+        end = pos + 2 + data[pos + 1]
+    elif code == NEG_INT_START:
+        end = pos + 2 + (data[pos + 1] ^ 0xff)
+    elif code == NESTED_CODE:
+        end = pos + 1
+        while True:
+            if end >= len(data):
+                raise ValidationError('unterminated nested tuple element')
+            if data[end] == NULL_CODE:
+                if data[end + 1:end + 2] != b'\xff':
+                    break
+                end += 2
+            else:
+                end = skip_element(data, end)
+        end += 1
+    else:
+        raise ValidationError(f'unknown tuple type code {code:#04x} at {pos}')
+    if end > len(data):
+        raise ValidationError(f'truncated tuple element at {pos}')
+    return end
+
+
+def project(data: bytes, start: int, positions: Iterable[int]) -> Dict[int, object]:
+    '''
+        Decodes only the elements at positions of the tuple encoded in data from
+        start, skipping every other element without decoding it. Returns a dict of
+        position to the decoded, but not field unpacked, value.
+    '''
+    wanted: List[int] = sorted(set(positions))
+    found: Dict[int, object] = {}
+    if not wanted:
+        return found
+    last = wanted[-1]
+    pos, index, end = start, 0, len(data)
+    while pos < end and index <= last:
+        next_pos = skip_element(data, pos)
+        if index in wanted:
+            found[index] = fdb.tuple.unpack(data[pos:next_pos])[0]
+        pos = next_pos
+        index += 1
+    return found
+
+
+def positions_of(what: str, names: Dict[str, int], count: int,
+                 fields: Tuple) -> Tuple[int, ...]:
+    '''
+        Maps a tuple of field names or indexes to field indexes.
+    '''
+    if not isinstance(fields, tuple) or not fields:
+        raise ValidationError(f'{what} fields must be a non-empty tuple of field '
+                              f'names or indexes')
+    positions = []
+    for field in fields:
+        if isinstance(field, str):
+            if field not in names:
+                raise ValidationError(f'Unknown {what} field: {field}')
+            positions.append(names[field])
+        elif isinstance(field, int) and not isinstance(field, bool) and \
+                0 <= field < count:
+            positions.append(field)
+        else:
+            raise ValidationError(f'Unknown {what} field: {field}')
+    return tuple(positions)
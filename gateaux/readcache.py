@@ -0,0 +1,92 @@
+'''
+    Transaction-scoped read caches. cache_reads(tr) attaches a bounded cache of
+    decoded values, keyed by packed key, to a transaction. Structure.get() and
+    load() with that transaction return cached values without reading or decoding
+    the key again, and Structure writes with it keep the cache up to date so reads
+    see the transaction's own writes.
+'''
+
+
+from typing import Any, Optional, Tuple
+from weakref import WeakKeyDictionary
+import threading
+from .cache import LRUCache
+
+
+# Default maximum number of keys cached per transaction
+DEFAULT_MAXSIZE: int = 1000
+
+
+# The cache attached to each transaction, dropped with the transaction
+_caches: WeakKeyDictionary = WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+class ReadCache:
+    '''
+        A bounded cache of the decoded value tuples of keys read or written in one
+        transaction. Each entry is a (value tuple, conflicted) pair, the value is
+        None for keys known not to be set and conflicted is False for values only
+        read with snapshot reads, which added no read conflict ranges.
+    '''
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE) -> None:
+        self.entries = LRUCache(maxsize)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: bytes) -> Optional[Tuple[Optional[Tuple], bool]]:
+        return self.entries.get(key)
+
+    def peek(self, key: bytes) -> Optional[Tuple[Optional[Tuple], bool]]:
+        return self.entries.peek(key)
+
+    def put(self, key: bytes, value: Optional[Tuple], conflicted: bool) -> None:
+        self.entries.put(key, (value, conflicted))
+
+    def discard(self, key: bytes) -> None:
+        self.entries.discard(key)
+
+    def discard_prefixes(self, prefixes: Tuple[bytes, ...]) -> int:
+        return self.entries.discard_matching(
+            lambda key: isinstance(key, bytes) and key.startswith(prefixes))
+
+    def stats(self) -> dict:
+        '''
+            Returns the size, hits, misses, evictions and hit rate of the cache.
+        '''
+        return self.entries.stats()
+
+
+def cache_reads(tr: Any, maxsize: int = DEFAULT_MAXSIZE) -> ReadCache:
+    '''
+        Attaches a new, empty ReadCache to a transaction and returns it, replacing
+        any cache already attached. Call it at the start of every attempt of a
+        transaction, a cache must not outlive a retry with on_error().
+    '''
+    cache = ReadCache(maxsize)
+    with _caches_lock:
+        _caches[tr] = cache
+    return cache
+
+
+def read_cache(tr: Any) -> Optional[ReadCache]:
+    '''
+        Returns the ReadCache attached to a transaction, or None.
+    '''
+    if not _caches:
+        return None
+    try:
+        return _caches.get(tr)
+    except TypeError:
+        # Objects which cannot be weakly referenced never have a cache
+        return None
+
+
+def uncache_reads(tr: Any) -> None:
+    '''
+        Detaches the ReadCache from a transaction, if it has one.
+    '''
+    with _caches_lock:
+        _caches.pop(tr, None)
@@ -0,0 +1,130 @@
+'''
+    Records are mutable views of one key and value of a Structure which remember
+    the value they were loaded with. Each assignment is validated by its field and
+    Structure.save() writes a record only if a field differs from the loaded value,
+    re-encoding the value, or with the "columns" value layout writing only the
+    changed fields.
+'''
+
+
+from copy import copy
+from typing import Any, Dict, Optional, Tuple, Union, TYPE_CHECKING
+from .errors import ValidationError
+if TYPE_CHECKING:
+    from .structure import Structure
+
+
+def _snapshot(value_tuple: Tuple) -> Tuple:
+    '''
+        Copies a value tuple to compare against later. Mutable values, such as
+        decoded arrays, are copied so changing them in place makes a record dirty,
+        copy() returns immutable values as they are.
+    '''
+    snapshot = []
+    for v in value_tuple:
+        try:
+            snapshot.append(copy(v))
+        except TypeError:
+            # Values which cannot be copied, such as memoryviews, are kept
+            snapshot.append(v)
+    return tuple(snapshot)
+
+
+def _equal(a: Any, b: Any) -> bool:
+    if hasattr(a, 'shape') or hasattr(b, 'shape'):
+        # NumPy arrays compare element-wise
+        return getattr(a, 'shape', None) == getattr(b, 'shape', None) and \
+            bool((a == b).all())
+    return bool(a == b)
+
+
+class Record:
+    '''
+        A record of a Structure. Value fields are read and assigned by name as
+        attributes, record.seats = 5, or by name or index as items, record['seats']
+        or record[0]. Fields named after a Record attribute, such as "key", can
+        only be used as items.
+    '''
+
+    def __init__(self, structure: 'Structure', key_tuple: Tuple,
+                 value_tuple: Optional[Tuple] = None, stored: bool = False) -> None:
+        if value_tuple is None:
+            value_tuple = tuple(field.default for field in structure.value)
+        if len(value_tuple) != structure.num_value_fields:
+            raise ValidationError(f'value tuple must contain '
+                                  f'{structure.num_value_fields} values to match the '
+                                  f'structure, got: {len(value_tuple)}')
+        object.__setattr__(self, '_structure', structure)
+        object.__setattr__(self, '_key', key_tuple)
+        object.__setattr__(self, '_values', list(value_tuple))
+        # The stored value, None for a record which has never been saved
+        object.__setattr__(self, '_stored', _snapshot(value_tuple) if stored else None)
+
+    def __repr__(self) -> str:
+        return (f'<{self.__class__.__name__} {self._structure.__class__.__name__} '
+                f'{self._key}: {tuple(self._values)}>')
+
+    def _position(self, field: Union[str, int]) -> int:
+        structure = self._structure
+        if isinstance(field, str) and field in structure.value_field_index:
+            return structure.value_field_index[field]
+        if isinstance(field, int) and not isinstance(field, bool) and \
+                0 <= field < structure.num_value_fields:
+            return field
+        raise KeyError(field)
+
+    def __getitem__(self, field: Union[str, int]) -> Any:
+        return self._values[self._position(field)]
+
+    def __setitem__(self, field: Union[str, int], v: Any) -> None:
+        i = self._position(field)
+        # Validate now so errors are raised where the value was assigned
+        self._structure.value[i].pack(v)
+        self._values[i] = v
+
+    def __getattr__(self, name: str) -> Any:
+        if not name.startswith('_') and name in self._structure.value_field_index:
+            return self._values[self._structure.value_field_index[name]]
+        raise AttributeError(f'{self.__class__.__name__} has no field {name}')
+
+    def __setattr__(self, name: str, v: Any) -> None:
+        if hasattr(type(self), name) or name not in \
+                self._structure.value_field_index:
+            raise AttributeError(f'cannot set {name}, only value fields can be set')
+        self[name] = v
+
+    @property
+    def key(self) -> Tuple:
+        return self._key
+
+    @property
+    def value(self) -> Tuple:
+        return tuple(self._values)
+
+    @property
+    def stored(self) -> bool:
+        '''
+            True if the record was loaded or has been saved.
+        '''
+        return self._stored is not None
+
+    @property
+    def changed(self) -> Tuple[int, ...]:
+        '''
+            The indexes of the value fields which differ from the stored value, every
+            field if the record has never been saved.
+        '''
+        if self._stored is None:
+            return tuple(range(len(self._values)))
+        return tuple(i for i, (old, new) in enumerate(zip(self._stored, self._values))
+                     if not _equal(old, new))
+
+    @property
+    def dirty(self) -> bool:
+        return self._stored is None or bool(self.changed)
+
+    def changes(self) -> Dict[int, Any]:
+        return {i: self._values[i] for i in self.changed}
+
+    def _saved(self) -> None:
+        object.__setattr__(self, '_stored', _snapshot(tuple(self._values)))
@@ -0,0 +1,424 @@
+'''
+    Memory-mapped local read replicas. write_replica() snapshots the key values of
+    a Structure into a sorted file of fixed width offsets and encoded keys and
+    values, and a Replica maps the file read-only and serves the transaction read
+    interface by bisecting it, so every Structure read helper works against it.
+    Processes mapping the same file share its pages through the OS page cache.
+    Replicas of structures with a change log are refreshed incrementally from it.
+'''
+
+
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from array import array
+from functools import partial
+from struct import Struct
+import mmap
+import os
+import tempfile
+import threading
+from .changelog import CURSOR_LENGTH, log_range
+from .errors import ValidationError
+from .structure import Structure
+
+
+# Header of a replica file: magic, format, record count, structure version, the
+# position of the offsets table, whether the file has a change log cursor and the
+# cursor of the last change it includes
+MAGIC: bytes = b'GXRP'
+FORMAT: int = 2
+HEADER = Struct('<4sIQQQ?12s')
+OFFSET = Struct('<Q')
+KEY_LENGTH = Struct('<I')
+# The cursor of a file written before any change was logged, before every cursor
+EMPTY_CURSOR: bytes = bytes(CURSOR_LENGTH)
+
+
+class KeyValue(NamedTuple):
+    key: bytes
+    value: bytes
+
+
+def _run(db: Any, func: Callable[[Any], Any]) -> Any:
+    '''
+        Calls func with a transaction, retrying it on retryable errors.
+    '''
+    tr = db.create_transaction()
+    while True:
+        try:
+            return func(tr)
+        except Exception as e:
+            if not hasattr(e, 'code'):
+                raise
+            tr.on_error(e).wait()
+
+
+def _check_batch_size(batch_size: int) -> None:
+    if not isinstance(batch_size, int) or batch_size < 1:
+        raise ValidationError(f'batch_size must be an int of 1 or more, '
+                              f'got: {batch_size}')
+
+
+def write_replica(structure: Structure, db: Any, path: str,
+                  batch_size: int = 1000) -> int:
+    '''
+        Copies every key value of a structure into a replica file at path, reading
+        in transactions of at most batch_size keys. The file is written next to
+        path and moved over it once complete, so open replicas can reload() it.
+        Keys written during the copy may or may not be included, structures with
+        changelog record the log's cursor before the copy so Replica.refresh()
+        applies them. Returns the number of key values copied.
+    '''
+    _check_batch_size(batch_size)
+    version, cursor = _run(db, partial(_position, structure))
+    return _write_file(path, _copy(structure, db, batch_size), version,
+                       structure.changelog, cursor)
+
+
+def _version(structure: Structure, tr: Any) -> int:
+    return structure.version(tr, snapshot=True) if structure.watch_version else 0
+
+
+def _position(structure: Structure, tr: Any) -> Tuple[int, bytes]:
+    '''
+        Returns the structure's version and the cursor of its last logged change.
+    '''
+    version = _version(structure, tr)
+    if not structure.changelog:
+        return version, EMPTY_CURSOR
+    begin, end = log_range(structure.changelog_prefix, None)
+    kvs = list(tr.snapshot.get_range(begin, end, limit=1, reverse=True))
+    if not kvs:
+        return version, EMPTY_CURSOR
+    return version, bytes(kvs[0].key)[len(structure.changelog_prefix):]
+
+
+def _copy(structure: Structure, db: Any, batch_size: int) -> Iterator[KeyValue]:
+    begin = structure.raw_prefix + b'\x00'
+    end = structure.raw_prefix + b'\xff'
+    while True:
+        kvs = _run(db, lambda tr: list(tr.get_range(begin, end, limit=batch_size)))
+        for kv in kvs:
+            yield KeyValue(bytes(kv.key), bytes(kv.value))
+        if len(kvs) < batch_size:
+            return
+        begin = bytes(kvs[-1].key) + b'\x00'
+
+
+def _write_file(path: str, items: Iterable[KeyValue], version: int, logged: bool,
+                cursor: bytes) -> int:
+    '''
+        Writes sorted key values to a replica file next to path and moves it over
+        path once complete. Returns the number of key values written.
+    '''
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.replica-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            count = _write(f, items, version, logged, cursor)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return count
+
+
+def _write(f: Any, items: Iterable[KeyValue], version: int, logged: bool,
+           cursor: bytes) -> int:
+    f.write(HEADER.pack(MAGIC, FORMAT, 0, 0, 0, False, EMPTY_CURSOR))
+    offsets = array('Q')
+    pos = 0
+    for key, value in items:
+        offsets.append(pos)
+        f.write(KEY_LENGTH.pack(len(key)))
+        f.write(key)
+        f.write(value)
+        pos += KEY_LENGTH.size + len(key) + len(value)
+    count = len(offsets)
+    offsets.append(pos)
+    table = HEADER.size + pos
+    f.write(b''.join(OFFSET.pack(offset) for offset in offsets))
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, FORMAT, count, version, table, logged, cursor))
+    return count
+
+
+def _changed_ranges(structure: Structure, db: Any, cursor: bytes, batch_size: int,
+                    limit: int) -> Optional[Tuple[bytes, List[Tuple[bytes, bytes]]]]:
+    '''
+        Reads the changes logged after cursor in batches. Returns the cursor of the
+        last change and the sorted, merged key ranges the changes wrote, or None if
+        they wrote more than limit ranges.
+    '''
+    ranges: List[Tuple[bytes, bytes]] = []
+    while True:
+        changes = _run(db, lambda tr: structure.changes(tr, cursor, batch_size,
+                                                        snapshot=True))
+        for change in changes:
+            if change.op == 'clear_range':
+                ranges.extend(structure._prefix_ranges('refresh', change.key))
+            else:
+                ranges.extend(structure._key_conflicts('refresh', change.key))
+        if len(ranges) > limit:
+            return None
+        if changes:
+            cursor = changes[-1].cursor
+        if len(changes) < batch_size:
+            break
+    merged: List[Tuple[bytes, bytes]] = []
+    for begin, end in sorted(ranges):
+        if merged and begin <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((begin, end))
+    return cursor, merged
+
+
+def _read_ranges(db: Any, ranges: List[Tuple[bytes, bytes]],
+                 batch_size: int) -> List[List[KeyValue]]:
+    '''
+        Reads the key values of each range, batch_size ranges per transaction.
+    '''
+    read: List[List[KeyValue]] = []
+    for i in range(0, len(ranges), batch_size):
+        batch = ranges[i:i + batch_size]
+        read.extend(_run(db, lambda tr: [
+            [KeyValue(bytes(kv.key), bytes(kv.value)) for kv in tr.get_range(b, e)]
+            for b, e in batch]))
+    return read
+
+
+def _merge(f: 'ReplicaFile', ranges: List[Tuple[bytes, bytes]],
+           read: List[List[KeyValue]]) -> Iterator[KeyValue]:
+    '''
+        Iterates the key values of a replica file with each range replaced by the
+        key values read from it, in key order.
+    '''
+    i = 0
+    for (begin, end), kvs in zip(ranges, read):
+        for j in range(i, f.bisect(begin)):
+            yield f.item(j)
+        yield from kvs
+        i = f.bisect(end)
+    for j in range(i, f.count):
+        yield f.item(j)
+
+
+class ReplicaFile:
+    '''
+        One memory-mapped replica file.
+    '''
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.identity: Tuple = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if stat.st_size < HEADER.size:
+                raise ValidationError(f'{path} is not a replica file')
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, self.count, self.version, self.table, self.logged, \
+            self.cursor = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or fmt != FORMAT:
+            self.data.close()
+            raise ValidationError(f'{path} is not a format {FORMAT} replica file')
+        self._lock = threading.Lock()
+        self._readers: int = 0
+        self._retired: bool = False
+
+    def acquire(self) -> bool:
+        '''
+            Starts a read, returns False if the file has been retired.
+        '''
+        with self._lock:
+            if self._retired:
+                return False
+            self._readers += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._readers -= 1
+            if self._retired and not self._readers:
+                self.data.close()
+
+    def retire(self) -> None:
+        '''
+            Closes the map once no reads are in progress, immediately if none are.
+        '''
+        with self._lock:
+            if self._retired:
+                return
+            self._retired = True
+            if not self._readers:
+                self.data.close()
+
+    def offset(self, i: int) -> int:
+        return HEADER.size + OFFSET.unpack_from(self.data, self.table + i * 8)[0]
+
+    def key(self, i: int) -> bytes:
+        pos = self.offset(i)
+        length = KEY_LENGTH.unpack_from(self.data, pos)[0]
+        return self.data[pos + 4:pos + 4 + length]
+
+    def item(self, i: int) -> KeyValue:
+        pos = self.offset(i)
+        length = KEY_LENGTH.unpack_from(self.data, pos)[0]
+        return KeyValue(self.data[pos + 4:pos + 4 + length],
+                        self.data[pos + 4 + length:self.offset(i + 1)])
+
+    def bisect(self, key: bytes) -> int:
+        '''
+            Returns the index of the first key which is not less than key.
+        '''
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+class Replica:
+    '''
+        A read-only, memory-mapped replica of a structure's key values written by
+        write_replica(). A Replica can be passed to any Structure read helper in
+        place of a transaction, or through its lookup() and scan() shortcuts.
+    '''
+
+    def __init__(self, structure: Structure, path: str) -> None:
+        self.structure = structure
+        self.path = path
+        self._file = ReplicaFile(path)
+
+    @property
+    def snapshot(self) -> 'Replica':
+        # Replicas never conflict, snapshot reads are the same as any other
+        return self
+
+    @property
+    def version(self) -> int:
+        '''
+            The structure's version when the replica was written, 0 for structures
+            without watch_version.
+        '''
+        return self._file.version
+
+    @property
+    def cursor(self) -> Optional[bytes]:
+        '''
+            The change log cursor of the last change included in the replica, None
+            if the structure had no change log when it was written.
+        '''
+        return self._file.cursor if self._file.logged else None
+
+    def __len__(self) -> int:
+        return self._file.count
+
+    def reload(self) -> bool:
+        '''
+            Maps the file at path again if it has been replaced, returns True if
+            it was. Reads already in progress finish against the old file, which
+            is unmapped once they have.
+        '''
+        stat = os.stat(self.path)
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._file.identity:
+            return False
+        old, self._file = self._file, ReplicaFile(self.path)
+        old.retire()
+        return True
+
+    def refresh(self, db: Any, batch_size: int = 1000) -> bool:
+        '''
+            Brings the replica up to date with db and reloads it. Replicas of
+            structures with changelog are refreshed incrementally: only the keys
+            written by the changes logged after cursor are read again, in batches of
+            batch_size, and merged with the rest of the mapped file into a new file.
+            The change log must not be trimmed past cursor. If more keys changed
+            than the replica holds, or the structure has no change log, every key
+            value is copied again with write_replica(), for structures with
+            watch_version only if their version has changed. Returns True if the
+            replica was rewritten.
+        '''
+        _check_batch_size(batch_size)
+        structure = self.structure
+        f = self._acquire()
+        try:
+            if structure.changelog and f.logged:
+                version = _run(db, partial(_version, structure))
+                changed = _changed_ranges(structure, db, f.cursor, batch_size, f.count)
+                if changed is not None:
+                    cursor, ranges = changed
+                    if not ranges:
+                        return False
+                    read = _read_ranges(db, ranges, batch_size)
+                    _write_file(self.path, _merge(f, ranges, read), version, True,
+                                cursor)
+                    self.reload()
+                    return True
+            elif structure.watch_version:
+                if _run(db, partial(_version, structure)) == f.version:
+                    return False
+        finally:
+            f.release()
+        write_replica(structure, db, self.path, batch_size)
+        self.reload()
+        return True
+
+    def lookup(self, key_tuple: Tuple,
+               fields: Optional[Tuple] = None) -> Optional[Tuple]:
+        '''
+            Returns the value tuple of a complete key as Structure.get().
+        '''
+        return self.structure.get(self, key_tuple, fields)
+
+    def scan(self, prefix: Tuple = (), limit: int = 0,
+             reverse: bool = False) -> Iterator[Tuple[Tuple, Tuple]]:
+        '''
+            Iterates (key tuple, value tuple) pairs as Structure.get_range().
+        '''
+        return self.structure.get_range(self, prefix, limit, reverse)
+
+    def _acquire(self) -> ReplicaFile:
+        '''
+            Starts a read of the current file, reads racing a reload() use the new
+            file.
+        '''
+        while True:
+            f = self._file
+            if f.acquire():
+                return f
+            if f is self._file:
+                raise ValueError('cannot read a closed replica')
+
+    # The read interface of a transaction, over packed keys and values
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        f = self._acquire()
+        try:
+            i = f.bisect(key)
+            if i < f.count and f.key(i) == key:
+                return f.item(i).value
+            return None
+        finally:
+            f.release()
+
+    def get_range(self, begin: bytes, end: bytes, limit: int = 0, reverse: bool = False,
+                  streaming_mode: Any = None) -> Iterator[KeyValue]:
+        # The file stays mapped until the range is read, or the iterator discarded
+        f = self._acquire()
+        try:
+            lo, hi = f.bisect(begin), f.bisect(end)
+            indexes = range(hi - 1, lo - 1, -1) if reverse else range(lo, hi)
+            if limit:
+                indexes = indexes[:limit]
+            for i in indexes:
+                yield f.item(i)
+        finally:
+            f.release()
+
+    def close(self) -> None:
+        '''
+            Unmaps the file, once any reads still in progress have finished.
+        '''
+        self._file.retire()
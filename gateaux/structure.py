@@ -1,14 +1,136 @@
-from typing import Any, Tuple, List, Dict
+from typing import Any, Tuple, List, Dict, Iterable, Iterator, Optional
+from time import perf_counter
+from datetime import datetime
+from math import copysign
+from zlib import crc32
+from operator import and_, or_, xor, itemgetter
+import heapq
+import random
+import threading
+import fdb.tuple
+from fdb.tuple import Versionstamp
 from .errors import StructureError, ValidationError
+from . import metrics
+from .cache import LRUCache, EVICTION_POLICIES
 from .fields.base import BaseField
+from .fields.atomic import AtomicField
+from .fields.versionstamp import VersionstampField
+from .fields.hashprefix import HashPrefix
+from .fields.array import ArrayField
+from .codec import StructCodec, VALUE_CODECS
+from .projection import project, positions_of, skip_element
+from .aggregate import Aggregation, parse_metrics
+from .view import View, VIEW_VALUE
+from .record import Record
+from .readcache import ReadCache, read_cache
+from .changelog import Change, log_change, log_range
+from .pagination import Page, encode_cursor, decode_cursor
+from .check import CheckError, TYPE, LENGTH, VERSIONSTAMP
+
+
+# How a sharded structure picks the shard to write to
+SHARD_BY: Tuple[str, ...] = ('hash', 'random')
+
+# Supported value layouts, one packed value per key or one key per value field
+VALUE_LAYOUTS: Tuple[str, ...] = ('packed', 'columns')
+
+# Atomically added to a structure's version key by every write
+VERSION_INCREMENT: bytes = (1).to_bytes(8, 'little')
+
+# How the values of each shard are combined for each atomic mutation
+SHARD_COMBINE: Dict[str, Any] = {
+    'add': sum,
+    'min': min,
+    'max': max,
+    'bit_and': lambda values: _reduce(and_, values),
+    'bit_or': lambda values: _reduce(or_, values),
+    'bit_xor': lambda values: _reduce(xor, values),
+}
+
+
+def _reduce(func: Any, values: List[int]) -> int:
+    combined = values[0]
+    for v in values[1:]:
+        combined = func(combined, v)
+    return combined
+
+
+def _present(v: Any) -> Optional[bytes]:
+    '''
+        Returns the bytes of a value returned by tr.get(), or None if the key is
+        not present.
+    '''
+    if v is None or (hasattr(v, 'present') and not v.present()):
+        return None
+    return bytes(v)
+
+
+# Types with values which are equal but pack differently
+CACHE_DISTINCT_TYPES: Tuple[type, ...] = (float, datetime)
+
+
+def _cache_distinct(v: Any) -> Any:
+    '''
+        Returns a value as part of a key cache key, with anything its packing sees
+        but equality ignores.
+    '''
+    if isinstance(v, float):
+        # 0.0 and -0.0 are equal
+        return v, copysign(1.0, v)
+    if isinstance(v, datetime):
+        # Equal times in different timezones pack their local times
+        return v, v.utcoffset()
+    return v
+
+
+def _reader(tr: Any, snapshot: bool) -> Any:
+    '''
+        Returns the transaction's snapshot view for snapshot reads, which add no
+        read conflict ranges.
+    '''
+    return tr.snapshot if snapshot else tr
+
+
+def _incomplete_versionstamps(data_tuple: Tuple) -> int:
+    return sum(1 for v in data_tuple
+               if isinstance(v, Versionstamp) and not v.is_complete())
 
 
 class Structure:
 
     key: Tuple = ()
     value: Tuple = ()
+    # Opt-in memoisation of pack_key() and unpack_value(), the maximum number of
+    # entries in each cache and the eviction policy, "lru" or "fifo"
+    cache_size: int = 0
+    cache_eviction: str = 'lru'
+    # How values are encoded, "tuple" with the FoundationDB tuple layer or "struct"
+    # with a fixed layout for structures with only fixed width value fields
+    value_codec: str = 'tuple'
+    # How values are stored, "packed" as one value per key or "columns" with each
+    # value field stored at its own key, the record's key plus the field's index
+    value_layout: str = 'packed'
+    # Opt-in write sharding for structures with an atomic value field. Each key is
+    # stored as up to "shards" physical keys prefixed with a shard number, chosen
+    # per write by "hash" or at "random", and reads combine every shard
+    shards: int = 0
+    shard_by: str = 'random'
+    # While moving data with reshard() reads cover this many shards, if larger
+    shard_reads: int = 0
+    # Materialised aggregate views maintained by set(), clear() and append(),
+    # stored in the views_subspace passed to the constructor
+    views: Tuple[View, ...] = ()
+    # Opt-in version key, the subspace's own key, incremented with an atomic add
+    # by every write made through the structure, for WatchedCache invalidation
+    watch_version: bool = False
+    # Opt-in change log with an entry for every write made through the structure,
+    # appended to the changelog_subspace passed to the constructor, including the
+    # written values if changelog_values is set
+    changelog: bool = False
+    changelog_values: bool = False
 
-    def __init__(self, subspace: Any = None) -> None:
+    def __init__(self, subspace: Any = None, views_subspace: Any = None,
+                 changelog_subspace: Any = None) -> None:
         self.key_fields_have_name: bool = True
         self.value_fields_have_name: bool = True
         self.key_field_names: List = []
@@ -25,8 +147,57 @@ class Structure:
         except AttributeError:
             raise StructureError('provided subspace must have a unpack() method')
         self.subspace: Any = subspace
+        if self.views and not callable(getattr(views_subspace, 'pack', None)):
+            raise StructureError(f'{self.__class__.__name__}.views requires a '
+                                 f'views_subspace with a pack() method')
+        self.views_subspace: Any = views_subspace
+        if self.changelog and not callable(getattr(changelog_subspace, 'pack', None)):
+            raise StructureError(f'{self.__class__.__name__}.changelog requires a '
+                                 f'changelog_subspace with a pack() method')
+        self.changelog_subspace: Any = changelog_subspace
+        self.changelog_prefix: bytes = (changelog_subspace.pack(())
+                                        if self.changelog else b'')
+        # The summed value field index of each view, None for counts
+        self.view_fields: List[Optional[int]] = [
+            view.field_index(self.value, self.__class__.__name__)
+            for view in self.views]
         self.num_key_fields = len(self.key)
         self.num_value_fields = len(self.value)
+        # Projections skip the subspace prefix and look up fields by name
+        self.raw_prefix: bytes = subspace.pack(())
+        # Sorts before every key of the structure so no range read includes it
+        self.version_key: bytes = self.raw_prefix
+        self.key_field_index: Dict[str, int] = {
+            field.name: i for i, field in enumerate(self.key) if field.name}
+        self.value_field_index: Dict[str, int] = {
+            field.name: i for i, field in enumerate(self.value) if field.name}
+        self.key_cache: Optional[LRUCache] = None
+        self.value_cache: Optional[LRUCache] = None
+        # Unpacked values which can be modified are never shared from a cache
+        self.shareable_values: bool = not any(
+            isinstance(field, ArrayField) and field.mutable for field in self.value)
+        if self.cache_size:
+            self.key_cache = LRUCache(self.cache_size, self.cache_eviction)
+            if self.shareable_values:
+                self.value_cache = LRUCache(self.cache_size, self.cache_eviction)
+        # Values of a single AtomicField are packed as raw bytes, not tuples
+        self.atomic_field: Optional[AtomicField] = None
+        if self.value and isinstance(self.value[0], AtomicField):
+            self.atomic_field = self.value[0]
+        self.columns: bool = self.value_layout == 'columns'
+        self.column_suffixes: List[bytes] = [fdb.tuple.pack((i,))
+                                             for i in range(self.num_value_fields)]
+        self.struct_codec: Optional[StructCodec] = None
+        if self.value_codec == 'struct':
+            self.struct_codec = StructCodec(self.value, self.__class__.__name__)
+        # Keys of Structures with a HashPrefix start with a bucket number
+        self.hash_prefix: Optional[HashPrefix] = None
+        if isinstance(self.key[0], HashPrefix):
+            self.hash_prefix = self.key[0]
+        # Only tuples of Structures with a VersionstampField are checked for
+        # incomplete versionstamps when packed
+        self.has_versionstamp: bool = any(isinstance(field, VersionstampField)
+                                          for field in self.key + self.value)
 
     def validate(self) -> bool:
         '''
@@ -45,6 +216,16 @@ class Structure:
             if not isinstance(field, BaseField):
                 raise StructureError(f'{me}.key[{i}] is not a field, '
                                      f'got: {type(field)}')
+            if isinstance(field, AtomicField):
+                raise StructureError(f'{me}.key[{i}] is an atomic field, atomic '
+                                     f'fields can only be used as values')
+            if isinstance(field, HashPrefix):
+                if i != 0:
+                    raise StructureError(f'{me}.key[{i}] is a HashPrefix, only the '
+                                         f'first key field can be a HashPrefix')
+                if field.hash_field >= len(self.key):
+                    raise StructureError(f'{me}.key[0].hash_field must be the index '
+                                         f'of a key field')
             if field.name:
                 self.key_field_names.append(field.name)
             else:
@@ -56,10 +237,87 @@ class Structure:
             if not isinstance(field, BaseField):
                 raise StructureError(f'{me}.value[{i}] is not a field, '
                                      f'got: {type(field)}')
+            if isinstance(field, HashPrefix):
+                raise StructureError(f'{me}.value[{i}] is a HashPrefix, HashPrefix '
+                                     f'can only be used as the first key field')
+            if isinstance(field, AtomicField) and len(self.value) != 1:
+                raise StructureError(f'{me}.value[{i}] is an atomic field, atomic '
+                                     f'fields must be the only value field')
             if field.name:
                 self.value_field_names.append(field.name)
             else:
                 self.value_fields_have_name = False
+        # Check the sharding options are valid
+        if not isinstance(self.shards, int) or self.shards < 0:
+            raise StructureError(f'{me}.shards must be an int of 0 or more')
+        if not isinstance(self.shard_reads, int) or self.shard_reads < 0:
+            raise StructureError(f'{me}.shard_reads must be an int of 0 or more')
+        if self.shards:
+            if len(self.value) != 1 or not isinstance(self.value[0], AtomicField):
+                raise StructureError(f'{me}.shards requires the value to be a single '
+                                     f'atomic field')
+            if self.shard_by not in SHARD_BY:
+                raise StructureError(f'{me}.shard_by must be one of {SHARD_BY}')
+            if isinstance(self.key[0], HashPrefix):
+                raise StructureError(f'{me}.shards cannot be used with a HashPrefix '
+                                     f'key field')
+        # Check the value codec is valid
+        if self.value_codec not in VALUE_CODECS:
+            raise StructureError(f'{me}.value_codec must be one of {VALUE_CODECS}')
+        if self.value_codec == 'struct' and not self.value:
+            raise StructureError(f'{me}.value_codec "struct" requires value fields')
+        # Check the value layout is valid
+        if self.value_layout not in VALUE_LAYOUTS:
+            raise StructureError(f'{me}.value_layout must be one of {VALUE_LAYOUTS}')
+        if self.value_layout == 'columns':
+            if not self.value:
+                raise StructureError(f'{me}.value_layout "columns" requires value '
+                                     f'fields')
+            if self.value_codec != 'tuple':
+                raise StructureError(f'{me}.value_layout "columns" requires the '
+                                     f'"tuple" value_codec')
+            if any(isinstance(field, (AtomicField, VersionstampField))
+                   for field in self.key + self.value):
+                raise StructureError(f'{me}.value_layout "columns" cannot be used '
+                                     f'with atomic or versionstamp fields')
+        # Check the views are valid
+        if not isinstance(self.views, tuple):
+            raise StructureError(f'{me}.views must be a tuple')
+        view_names = set()
+        for i, view in enumerate(self.views):
+            if not isinstance(view, View):
+                raise StructureError(f'{me}.views[{i}] is not a View, '
+                                     f'got: {type(view)}')
+            if view.name in view_names:
+                raise StructureError(f'{me}.views[{i}] has a duplicate name: '
+                                     f'{view.name}')
+            view_names.add(view.name)
+            if view.group_by > len(self.key):
+                raise StructureError(f'{me}.views[{i}].group_by must be at most the '
+                                     f'number of key fields')
+            if any(isinstance(field, VersionstampField)
+                   for field in self.key[:view.group_by]):
+                raise StructureError(f'{me}.views[{i}] cannot group by a '
+                                     f'VersionstampField')
+            view.field_index(self.value, me)
+        if self.views and (self.shards or
+                           any(isinstance(f, AtomicField) for f in self.value)):
+            raise StructureError(f'{me}.views cannot be used with atomic value '
+                                 f'fields, atomic writes do not read the old value')
+        if not isinstance(self.watch_version, bool):
+            raise StructureError(f'{me}.watch_version must be a bool')
+        if not isinstance(self.changelog, bool):
+            raise StructureError(f'{me}.changelog must be a bool')
+        if not isinstance(self.changelog_values, bool):
+            raise StructureError(f'{me}.changelog_values must be a bool')
+        if self.changelog_values and not self.changelog:
+            raise StructureError(f'{me}.changelog_values requires changelog')
+        # Check the cache options are valid
+        if not isinstance(self.cache_size, int) or self.cache_size < 0:
+            raise StructureError(f'{me}.cache_size must be an int of 0 or more')
+        if self.cache_eviction not in EVICTION_POLICIES:
+            raise StructureError(f'{me}.cache_eviction must be one of '
+                                 f'{EVICTION_POLICIES}')
         # If we reach here, all looks good
         return True
 
@@ -77,34 +335,61 @@ class Structure:
             desc['value'].append(field.description)
         return desc
 
-    def _pack(self, fields:Tuple, data_tuple: Tuple) -> bytes:
+    def _pack(self, fields:Tuple, data_tuple: Tuple, prefix: Tuple = ()) -> bytes:
         '''
             Passes each value in a data_tuple through the .pack() method of its
             matching field, then returns the resulting tuple through fdb.tuple.pack()
-            in the directory subspace as bytes.
+            in the directory subspace as bytes. Any prefix values, such as a shard
+            number, are packed as-is before the field values.
         '''
         if len(data_tuple) > len(fields):
             raise ValidationError(f'cannot _pack(), data tuple has {len(data_tuple)} '
                                   f'elements, larger than the number of fields '
                                   f'at {len(fields)}')
+        if metrics.enabled:
+            part = 'key' if fields is self.key else 'value'
+            return metrics.pack(self, part, fields, data_tuple, prefix)
         field_packed: list = []
         for i, v in enumerate(data_tuple):
             field_packed.append(fields[i].pack(v))
-        return self.subspace.pack(tuple(field_packed))
+        return self._pack_tuple(prefix + tuple(field_packed))
 
-    def _unpack(self, fields:Tuple, data_bytes: bytes) -> Tuple:
+    def _pack_tuple(self, packed_tuple: Tuple) -> bytes:
+        '''
+            Packs a tuple of already packed field values in the directory subspace. A
+            tuple containing an incomplete versionstamp is packed with
+            pack_with_versionstamp() which appends the versionstamp's offset.
+        '''
+        if self.has_versionstamp:
+            incomplete = _incomplete_versionstamps(packed_tuple)
+            if incomplete > 1:
+                raise ValidationError(f'cannot pack more than one incomplete '
+                                      f'versionstamp, got: {incomplete}')
+            if incomplete:
+                return self.subspace.pack_with_versionstamp(packed_tuple)
+        return self.subspace.pack(packed_tuple)
+
+    def _unpack(self, fields:Tuple, data_bytes: bytes, skip: int = 0) -> Tuple:
         '''
             Unpacks data_bytes with fdb.tuple.unpack() in the directory subspace then
             passes each value through the .unpack methods of its matching field. Returns
-            a tuple of data.
+            a tuple of data. skip is the number of leading prefix values, such as a
+            shard number, to discard.
         '''
         if not isinstance(data_bytes, bytes):
             raise ValidationError(f'can only _unpack() bytes, got: {type(data_bytes)}')
+        start = perf_counter() if metrics.enabled else 0.0
         data_tuple = self.subspace.unpack(data_bytes)
+        if skip:
+            data_tuple = data_tuple[skip:]
         if len(data_tuple) > len(fields):
             raise ValidationError(f'cannot _unpack(), data tuple has {len(data_tuple)} '
                                   f'elements, larger than the number of fields '
                                   f'at {len(fields)}')
+        if metrics.enabled:
+            part = 'key' if fields is self.key else 'value'
+            return metrics.unpack(self, part, fields, data_tuple, len(data_bytes),
+                                  start)
         field_unpacked: list = []
         for i, v in enumerate(data_tuple):
             field_unpacked.append(fields[i].unpack(v))
@@ -126,7 +411,43 @@ class Structure:
             raise ValidationError(f'key tuple must contain {self.num_key_fields} or '
                                   f'fewer values to match the structures key '
                                   'definitions, got: {key_len}')
-        return self._pack(self.key, key_tuple)
+        if self.key_cache is None:
+            return self._pack_key(key_tuple)
+        # Cache keys include the value types so True and 1 or 1.0 and 1 which are
+        # equal but pack differently, or fail validation, never share an entry
+        types = tuple(map(type, key_tuple))
+        if any(issubclass(t, CACHE_DISTINCT_TYPES) for t in types):
+            cache_key: Tuple = (tuple(map(_cache_distinct, key_tuple)), types)
+        else:
+            cache_key = (key_tuple, types)
+        try:
+            packed = self.key_cache.get(cache_key)
+        except TypeError:
+            # Unhashable values are never cached
+            return self._pack_key(key_tuple)
+        if packed is None:
+            packed = self._pack_key(key_tuple)
+            self.key_cache.put(cache_key, packed)
+        return packed
+
+    def _pack_key(self, key_tuple: Tuple) -> bytes:
+        if self.hash_prefix is None:
+            return self._pack(self.key, key_tuple)
+        return self._pack(self.key, key_tuple, (self.bucket(key_tuple),))
+
+    def bucket(self, key_tuple: Tuple) -> int:
+        '''
+            Returns the HashPrefix bucket of a key tuple, which must include the
+            HashPrefix's hash_field.
+        '''
+        if self.hash_prefix is None:
+            raise StructureError(f'{self.__class__.__name__} has no HashPrefix')
+        i = self.hash_prefix.hash_field
+        if len(key_tuple) <= i:
+            raise ValidationError(f'key tuple must contain at least {i + 1} values '
+                                  f'to derive its HashPrefix bucket, use get_range() '
+                                  f'for shorter prefixes, got: {len(key_tuple)}')
+        return self.hash_prefix.bucket(self.key[i].pack(key_tuple[i]))
 
     def pack_value(self, value_tuple: Tuple) -> bytes:
         '''
@@ -137,22 +458,291 @@ class Structure:
             raise ValidationError(f'value tuple must contain {self.num_value_fields} '
                                   f'values to match the structure, '
                                   f'got: {len(value_tuple)}')
+        if self.atomic_field is None and self.struct_codec is None:
+            return self._pack(self.value, value_tuple)
+        if metrics.enabled:
+            return metrics.pack_whole(self, 'value', self.value, value_tuple,
+                                      self._pack_whole_value)
+        return self._pack_whole_value(value_tuple)
+
+    def _pack_whole_value(self, value_tuple: Tuple) -> bytes:
+        '''
+            Packs an atomic or fixed layout value with a single call.
+        '''
+        if self.struct_codec is not None:
+            return self.struct_codec.pack(value_tuple)
+        if self.atomic_field is not None:
+            return self.atomic_field.pack(value_tuple[0])
         return self._pack(self.value, value_tuple)
 
-    def unpack_key(self, key_bytes: bytes) -> Tuple:
+    def check_key(self, key_tuple: Tuple,
+                  row: Optional[int] = None) -> List[CheckError]:
+        '''
+            Returns a CheckError for each reason pack_key() would reject a key
+            tuple, or an empty list if it would pack it, without raising. As with
+            pack_key() a key tuple may be a prefix of the key fields.
+        '''
+        if not isinstance(key_tuple, tuple):
+            return [CheckError(row, 'key', None, '', TYPE, key_tuple)]
+        if not 0 < len(key_tuple) <= self.num_key_fields or (
+                self.hash_prefix is not None and
+                len(key_tuple) <= self.hash_prefix.hash_field):
+            return [CheckError(row, 'key', None, '', LENGTH, key_tuple)]
+        errors = self._check_fields('key', self.key, key_tuple, row)
+        if (not errors and self.has_versionstamp and
+                _incomplete_versionstamps(key_tuple) > 1):
+            errors.append(CheckError(row, 'key', None, '', VERSIONSTAMP, key_tuple))
+        return errors
+
+    def check_value(self, value_tuple: Tuple,
+                    row: Optional[int] = None) -> List[CheckError]:
+        '''
+            Returns a CheckError for each reason pack_value() would reject a value
+            tuple, or an empty list if it would pack it, without raising.
+        '''
+        try:
+            length = len(value_tuple)
+        except TypeError:
+            return [CheckError(row, 'value', None, '', TYPE, value_tuple)]
+        if length != self.num_value_fields:
+            return [CheckError(row, 'value', None, '', LENGTH, value_tuple)]
+        if self.struct_codec is not None:
+            return [CheckError(row, 'value', i, self.value[i].name, constraint,
+                               value_tuple[i])
+                    for i, constraint in self.struct_codec.check(value_tuple)]
+        errors = self._check_fields('value', self.value, value_tuple, row)
+        if (not errors and self.has_versionstamp and self.atomic_field is None and
+                _incomplete_versionstamps(tuple(value_tuple)) > 1):
+            errors.append(CheckError(row, 'value', None, '', VERSIONSTAMP,
+                                     value_tuple))
+        return errors
+
+    def _check_fields(self, part: str, fields: Tuple, data_tuple: Tuple,
+                      row: Optional[int]) -> List[CheckError]:
+        errors = []
+        for i, v in enumerate(data_tuple):
+            constraint = fields[i].check(v)
+            if constraint is not None:
+                errors.append(CheckError(row, part, i, fields[i].name, constraint, v))
+        return errors
+
+    def check_keys(self, key_tuples: Iterable[Tuple]) -> List[CheckError]:
+        '''
+            Checks a batch of key tuples as check_key(), each CheckError's row is
+            the position of its key tuple.
+        '''
+        errors: List[CheckError] = []
+        for row, key_tuple in enumerate(key_tuples):
+            errors.extend(self.check_key(key_tuple, row))
+        return errors
+
+    def check_values(self, value_tuples: Iterable[Tuple]) -> List[CheckError]:
+        '''
+            Checks a batch of value tuples as check_value(), each CheckError's row
+            is the position of its value tuple.
+        '''
+        errors: List[CheckError] = []
+        for row, value_tuple in enumerate(value_tuples):
+            errors.extend(self.check_value(value_tuple, row))
+        return errors
+
+    def check_records(self, records: Iterable[Tuple[Tuple, Tuple]]) -> List[CheckError]:
+        '''
+            Checks a batch of (key tuple, value tuple) pairs as set() would, so
+            every key must be complete. Each CheckError's row is the position of
+            its pair.
+        '''
+        errors: List[CheckError] = []
+        for row, (key_tuple, value_tuple) in enumerate(records):
+            if isinstance(key_tuple, tuple) and len(key_tuple) != self.num_key_fields:
+                errors.append(CheckError(row, 'key', None, '', LENGTH, key_tuple))
+            else:
+                errors.extend(self.check_key(key_tuple, row))
+            errors.extend(self.check_value(value_tuple, row))
+        return errors
+
+    def unpack_key(self, key_bytes: bytes, fields: Optional[Tuple] = None) -> Tuple:
         '''
             Keys are validated when written, unpack any values providing they are known
-            by the defined key fields.
+            by the defined key fields. Keys of hash prefixed structures are expected
+            to start with their bucket number, as added by pack_key(), which is
+            discarded. If fields is a tuple of key field names or indexes only those
+            fields are decoded and returned, in the order requested. Use
+            unpack_shard_key() for the physical keys of sharded structures.
         '''
-        return self._unpack(self.key, key_bytes)
+        return self._unpack_key(key_bytes, fields,
+                                1 if self.hash_prefix is not None else 0)
 
-    def unpack_value(self, value_bytes: bytes) -> Tuple:
+    def unpack_shard_key(self, key_bytes: bytes,
+                         fields: Optional[Tuple] = None) -> Tuple:
+        '''
+            Unpacks a physical key of a sharded structure, as packed by
+            pack_shard_key() or read from a shard's range, discarding the shard
+            number. fields is as for unpack_key().
+        '''
+        if not self.shards:
+            raise StructureError(f'{self.__class__.__name__} is not sharded')
+        return self._unpack_key(key_bytes, fields, 1)
+
+    def _unpack_stored_key(self, key_bytes: bytes,
+                           fields: Optional[Tuple] = None) -> Tuple:
+        '''
+            Unpacks a key as stored in the database, read from a range.
+        '''
+        if self.shards:
+            return self._unpack_key(key_bytes, fields, 1)
+        return self.unpack_key(key_bytes, fields)
+
+    def _unpack_key(self, key_bytes: bytes, fields: Optional[Tuple],
+                    skip: int) -> Tuple:
+        if fields is not None:
+            positions = positions_of('key', self.key_field_index, self.num_key_fields,
+                                     fields)
+            return self._project(self.key, key_bytes, positions, skip)
+        return self._unpack(self.key, key_bytes, skip)
+
+    def _project(self, fields: Tuple, data_bytes: bytes, positions: Tuple[int, ...],
+                 skip: int = 0) -> Tuple:
+        '''
+            Decodes only the fields at positions out of tuple packed data_bytes. The
+            encoded elements of every other field are skipped over by their type
+            code and length without being decoded.
+        '''
+        if not isinstance(data_bytes, bytes):
+            raise ValidationError(f'can only unpack bytes, got: {type(data_bytes)}')
+        if not data_bytes.startswith(self.raw_prefix):
+            raise ValidationError('cannot unpack, data is not in the subspace')
+        start = perf_counter() if metrics.enabled else 0.0
+        found = project(data_bytes, len(self.raw_prefix),
+                        [skip + p for p in positions])
+        encoded: list = []
+        for p in positions:
+            if skip + p not in found:
+                raise ValidationError(f'cannot unpack field {p}, data tuple has '
+                                      f'too few elements')
+            encoded.append(found[skip + p])
+        if metrics.enabled:
+            part = 'key' if fields is self.key else 'value'
+            return metrics.unpack(self, part, fields, tuple(encoded), len(data_bytes),
+                                  start, positions)
+        return tuple(fields[p].unpack(v) for p, v in zip(positions, encoded))
+
+    @property
+    def read_shards(self) -> int:
+        return max(self.shards, self.shard_reads)
+
+    def choose_shard(self, hint: Any = None) -> int:
+        '''
+            Returns the shard to write to. With shard_by "hash" the shard is derived
+            from hint, or the current thread if hint is None, so each writer keeps
+            to one shard. With "random" a shard is picked for every write.
+        '''
+        if not self.shards:
+            raise StructureError(f'{self.__class__.__name__} is not sharded')
+        if self.shard_by == 'random':
+            return random.randrange(self.shards)
+        if hint is None:
+            hint = threading.get_ident()
+        if not isinstance(hint, bytes):
+            hint = str(hint).encode()
+        return crc32(hint) % self.shards
+
+    def pack_shard_key(self, key_tuple: Tuple, shard: int) -> bytes:
+        '''
+            Packs a complete key tuple prefixed with a shard number, the physical key
+            a sharded structure stores each shard of a key at.
+        '''
+        self._check_complete_key('pack_shard_key', key_tuple)
+        if not isinstance(shard, int) or shard < 0:
+            raise ValidationError(f'shard must be an int of 0 or more, got: {shard}')
+        return self._pack(self.key, key_tuple, (shard,))
+
+    def shard_range(self, shard: int) -> Tuple[bytes, bytes]:
+        '''
+            Returns the begin and end keys of every key in a shard.
+        '''
+        begin = self.subspace.pack((shard,))
+        return begin, begin + b'\xff'
+
+    def combine_shards(self, values: List[int]) -> int:
+        '''
+            Combines the present shard values of a key with the atomic field's
+            mutation, sums for a CounterField, the smallest for a MinField and so on.
+        '''
+        field = self.atomic_field
+        if field is None:
+            raise StructureError(f'{self.__class__.__name__} has no atomic field')
+        op = field.atomic_ops[0]
+        combined = SHARD_COMBINE[op](values)
+        if op == 'add':
+            # Wrap on overflow as the atomic add of a single key would
+            combined = (combined - field.min_value) % 2 ** 64 + field.min_value
+        return combined
+
+    def _check_complete_key(self, op: str, key_tuple: Tuple) -> None:
+        if not isinstance(key_tuple, tuple) or len(key_tuple) != self.num_key_fields:
+            raise ValidationError(f'{op}() requires a complete key tuple of '
+                                  f'{self.num_key_fields} values')
+
+    def _physical_keys(self, key_tuple: Tuple) -> List[bytes]:
+        if not self.shards:
+            return [self.pack_key(key_tuple)]
+        return [self.pack_shard_key(key_tuple, shard)
+                for shard in range(self.read_shards)]
+
+    def unpack_value(self, value_bytes: bytes, fields: Optional[Tuple] = None) -> Tuple:
         '''
             Values are validated when written, unpack any values providing they are
-            known by the defined value fields.
+            known by the defined value fields. If fields is a tuple of value field
+            names or indexes only those fields are decoded and returned, in the order
+            requested. Projections bypass the value cache.
         '''
+        if fields is not None:
+            positions = positions_of('value', self.value_field_index,
+                                     self.num_value_fields, fields)
+            if self.atomic_field is None and self.struct_codec is None:
+                return self._project(self.value, value_bytes, positions)
+            # Atomic and fixed layout values are decoded with a single call
+            unpacked = self._unpack_value(value_bytes)
+            return tuple(unpacked[p] for p in positions)
+        if self.value_cache is None:
+            return self._unpack_value(value_bytes)
+        try:
+            unpacked = self.value_cache.get(value_bytes)
+        except TypeError:
+            return self._unpack_value(value_bytes)
+        if unpacked is None:
+            unpacked = self._unpack_value(value_bytes)
+            self.value_cache.put(bytes(value_bytes), unpacked)
+        return unpacked
+
+    def _unpack_value(self, value_bytes: bytes) -> Tuple:
+        if self.atomic_field is None and self.struct_codec is None:
+            return self._unpack(self.value, value_bytes)
+        if metrics.enabled:
+            return metrics.unpack_whole(self, 'value', value_bytes,
+                                        self._unpack_whole_value)
+        return self._unpack_whole_value(value_bytes)
+
+    def _unpack_whole_value(self, value_bytes: bytes) -> Tuple:
+        if self.struct_codec is not None:
+            return self.struct_codec.unpack(value_bytes)
+        if self.atomic_field is not None:
+            return (self.atomic_field.unpack(value_bytes),)
         return self._unpack(self.value, value_bytes)
 
+    def cache_stats(self) -> Dict:
+        '''
+            Returns hit, miss and eviction counters for the pack_key() and
+            unpack_value() caches, or an empty dict if caching is disabled.
+        '''
+        if self.key_cache is None:
+            return {}
+        stats = {'key': self.key_cache.stats()}
+        if self.value_cache is not None:
+            stats['value'] = self.value_cache.stats()
+        return stats
+
     def pack_key_dict(self, key_dict: Dict) -> bytes:
         '''
             Pack a directory using the names set for each key field. Internally this
@@ -195,30 +785,1056 @@ class Structure:
             values.append(value_dict.get(name, None))
         return self.pack_value(tuple(values))
 
-    def unpack_key_dict(self, key_bytes: bytes) -> Dict:
+    def unpack_key_dict(self, key_bytes: bytes, fields: Optional[Tuple] = None) -> Dict:
         '''
             Unpacks bytes into a tuple, then maps the tuple to the field names into a
-            dict.
+            dict. If fields is a tuple of key field names only those are decoded.
         '''
         if not self.key_fields_have_name:
             raise StructureError('All key fields must have a "name" set to use '
                                  'unpack_key_dict()')
+        if fields is not None:
+            return dict(zip(fields, self.unpack_key(key_bytes, fields)))
         key_tuple = self.unpack_key(key_bytes)
         keys = {}
         for i, v in enumerate(key_tuple):
             keys[self.key[i].name] = v
         return keys
 
-    def unpack_value_dict(self, value_bytes: bytes) -> Dict:
+    def unpack_value_dict(self, value_bytes: bytes,
+                          fields: Optional[Tuple] = None) -> Dict:
         '''
             Unpacks bytes into a tuple, then maps the tuple to the field names into a
-            dict.
+            dict. If fields is a tuple of value field names only those are decoded.
         '''
         if not self.value_fields_have_name:
             raise StructureError('All key fields must have a "name" set to use '
                                  'unpack_value_dict()')
+        if fields is not None:
+            return dict(zip(fields, self.unpack_value(value_bytes, fields)))
         key_tuple = self.unpack_value(value_bytes)
         values = {}
         for i, v in enumerate(key_tuple):
             values[self.value[i].name] = v
         return values
+
+    def _mutate(self, tr: Any, op: str, key_tuple: Tuple, param: int,
+                shard_hint: Any = None) -> None:
+        '''
+            Applies the atomic mutation op, such as "add", to the value of a complete
+            key. The mutation is issued with the transaction's method of the same
+            name so the value is changed without being read. Sharded structures
+            apply it to one shard chosen with choose_shard(shard_hint).
+        '''
+        if self.atomic_field is None or op not in self.atomic_field.atomic_ops:
+            raise StructureError(f'{self.__class__.__name__}.{op}() requires the '
+                                 f'value to be a single atomic field supporting '
+                                 f'"{op}"')
+        self._check_complete_key(op, key_tuple)
+        if self.shards:
+            key = self.pack_shard_key(key_tuple, self.choose_shard(shard_hint))
+        else:
+            key = self.pack_key(key_tuple)
+        packed = self.atomic_field.pack(param)
+        getattr(tr, op)(key, packed)
+        self._bump_version(tr)
+        self._log_change(tr, op, key_tuple, packed)
+        cache = read_cache(tr)
+        if cache is not None:
+            # The mutated value is only known once it is read again
+            cache.discard(self.pack_key(key_tuple))
+
+    def get(self, tr: Any, key_tuple: Tuple, fields: Optional[Tuple] = None,
+            snapshot: bool = False) -> Optional[Tuple]:
+        '''
+            Reads and unpacks the value of a complete key, returns None if the key
+            is not set. Sharded structures request every shard at once and return
+            the present values combined with combine_shards(). If fields is a tuple
+            of value field names or indexes only those fields are returned, with
+            the "columns" value layout only their keys are read. Snapshot reads add
+            no read conflicts. Transactions with a ReadCache return cached values.
+        '''
+        self._check_complete_key('get', key_tuple)
+        cache = read_cache(tr)
+        if cache is not None and self.shareable_values:
+            return self._cached_get(tr, cache, key_tuple, fields, snapshot)
+        return self._get(_reader(tr, snapshot), key_tuple, fields)
+
+    def _get(self, tr: Any, key_tuple: Tuple,
+             fields: Optional[Tuple]) -> Optional[Tuple]:
+        if self.columns:
+            if fields is not None:
+                return self._get_columns(tr, key_tuple, fields)
+            return self._read_columns(tr, self.pack_key(key_tuple))
+        if not self.shards:
+            v = _present(tr.get(self.pack_key(key_tuple)))
+            if v is None:
+                return None
+            return self.unpack_value(v, fields)
+        futures = [tr.get(key) for key in self._physical_keys(key_tuple)]
+        values = [self.unpack_value(v)[0] for v in map(_present, futures)
+                  if v is not None]
+        if not values:
+            return None
+        combined = (self.combine_shards(values),)
+        if fields is not None:
+            positions = positions_of('value', self.value_field_index, 1, fields)
+            return tuple(combined[p] for p in positions)
+        return combined
+
+    def _cached_get(self, tr: Any, cache: ReadCache, key_tuple: Tuple,
+                    fields: Optional[Tuple], snapshot: bool) -> Optional[Tuple]:
+        '''
+            Returns the value of a key from the transaction's cache, or reads the
+            whole value and caches it. A value cached by a snapshot read adds the
+            key's read conflicts the first time it is returned to a read which is
+            not a snapshot read.
+        '''
+        key = self.pack_key(key_tuple)
+        entry = cache.get(key)
+        if entry is None:
+            if self.columns and fields is not None:
+                # Reads of some of the columns are not cached
+                return self._get_columns(_reader(tr, snapshot), key_tuple, fields)
+            value = self._get(_reader(tr, snapshot), key_tuple, None)
+            cache.put(key, value, not snapshot)
+        else:
+            value, conflicted = entry
+            if not snapshot and not conflicted:
+                for begin, end in self._key_conflicts('get', key_tuple):
+                    tr.add_read_conflict_range(begin, end)
+                cache.put(key, value, True)
+        return self._select(value, fields)
+
+    def _select(self, value: Optional[Tuple],
+                fields: Optional[Tuple]) -> Optional[Tuple]:
+        '''
+            Picks the fields, a tuple of value field names or indexes, out of a
+            whole value tuple.
+        '''
+        if value is None or fields is None:
+            return value
+        positions = positions_of('value', self.value_field_index,
+                                 self.num_value_fields, fields)
+        return tuple(value[p] for p in positions)
+
+    def _write_cache(self, tr: Any) -> Optional[ReadCache]:
+        '''
+            Returns the transaction's cache if values written with it are cached.
+        '''
+        if not self.shareable_values:
+            return None
+        return read_cache(tr)
+
+    def _get_columns(self, tr: Any, key_tuple: Tuple, fields: Tuple) -> Optional[Tuple]:
+        positions = positions_of('value', self.value_field_index,
+                                 self.num_value_fields, fields)
+        key = self.pack_key(key_tuple)
+        futures = [tr.get(key + self.column_suffixes[p]) for p in positions]
+        values = [_present(f) for f in futures]
+        if all(v is None for v in values):
+            return None
+        return tuple(None if v is None else self._unpack_column(p, v)
+                     for p, v in zip(positions, values))
+
+    def _read_columns(self, tr: Any, key: bytes) -> Optional[Tuple]:
+        '''
+            Reads every column of the record at the packed key with one range read.
+        '''
+        kvs = list(tr.get_range(key + b'\x00', key + b'\xff'))
+        if not kvs:
+            return None
+        return self._unpack_columns([(kv.key[len(key):], kv.value) for kv in kvs])
+
+    def _unpack_columns(self, columns: List) -> Tuple:
+        '''
+            Unpacks the (column suffix, value) pairs of one record into a value
+            tuple, fields without a column are None.
+        '''
+        value: List = [None] * self.num_value_fields
+        for suffix, data in columns:
+            (i,) = fdb.tuple.unpack(suffix)
+            if not isinstance(i, int) or not 0 <= i < self.num_value_fields:
+                raise ValidationError(f'unknown value column: {i}')
+            value[i] = self._unpack_column(i, bytes(data))
+        return tuple(value)
+
+    def _pack_column(self, i: int, v: Any) -> bytes:
+        return fdb.tuple.pack((self.value[i].pack(v),))
+
+    def _unpack_column(self, i: int, data: bytes) -> Any:
+        return self.value[i].unpack(fdb.tuple.unpack(data)[0])
+
+    def _split_column_key(self, key: bytes) -> Tuple[bytes, bytes]:
+        '''
+            Splits the key of a column into the record's packed key and the column
+            suffix by skipping over the record's key elements.
+        '''
+        pos = len(self.raw_prefix)
+        skip = 1 if self.hash_prefix is not None else 0
+        for _ in range(skip + self.num_key_fields):
+            pos = skip_element(key, pos)
+        return key[:pos], key[pos:]
+
+    def _column_records(self, kvs: Any) -> Iterator[Tuple[bytes, List]]:
+        '''
+            Groups an ordered iterator of column key values by record, yielding the
+            record's packed key and its (column suffix, value) pairs.
+        '''
+        record: Optional[bytes] = None
+        columns: List = []
+        for kv in kvs:
+            key, suffix = self._split_column_key(kv.key)
+            if key != record:
+                if record is not None:
+                    yield record, columns
+                record, columns = key, []
+            columns.append((suffix, kv.value))
+        if record is not None:
+            yield record, columns
+
+    def pack_columns(self, key_tuple: Tuple,
+                     value_tuple: Tuple) -> List[Tuple[bytes, bytes]]:
+        '''
+            Packs a complete key and a value into a (key, value) pair for each value
+            field, as stored by the "columns" value layout.
+        '''
+        self._check_complete_key('pack_columns', key_tuple)
+        if len(value_tuple) != self.num_value_fields:
+            raise ValidationError(f'value tuple must contain {self.num_value_fields} '
+                                  f'values to match the structure, '
+                                  f'got: {len(value_tuple)}')
+        key = self.pack_key(key_tuple)
+        return [(key + self.column_suffixes[i], self._pack_column(i, v))
+                for i, v in enumerate(value_tuple)]
+
+    def set(self, tr: Any, key_tuple: Tuple, value_tuple: Tuple) -> None:
+        '''
+            Packs and sets the value of a complete key. Sharded structures clear
+            every shard and store the value in shard 0.
+        '''
+        self._check_complete_key('set', key_tuple)
+        if self.columns:
+            columns = self.pack_columns(key_tuple, value_tuple)
+            if self.views:
+                self._update_views(tr, key_tuple, self.get(tr, key_tuple),
+                                   value_tuple)
+            for key, data in columns:
+                tr.set(key, data)
+            self._bump_version(tr)
+            self._log_change(tr, 'set', key_tuple, self.pack_value(value_tuple)
+                             if self.changelog_values else None)
+            cache = self._write_cache(tr)
+            if cache is not None:
+                cache.put(self.pack_key(key_tuple),
+                          tuple(self._unpack_column(i, data)
+                                for i, (_, data) in enumerate(columns)), True)
+            return
+        value = self.pack_value(value_tuple)
+        keys = self._physical_keys(key_tuple)
+        if self.views:
+            self._update_views(tr, key_tuple, self.get(tr, key_tuple), value_tuple)
+        for key in keys[1:]:
+            tr.clear(key)
+        tr.set(keys[0], value)
+        self._bump_version(tr)
+        self._log_change(tr, 'set', key_tuple, value)
+        cache = self._write_cache(tr)
+        if cache is not None:
+            # Cache the value as it will be read back, which fields may normalise
+            cache.put(self.pack_key(key_tuple), self.unpack_value(value), True)
+
+    def update(self, tr: Any, key_tuple: Tuple, changes: Dict) -> None:
+        '''
+            Sets the value fields in the changes dict, keyed by field name or index,
+            of a complete key, which must be set. With the "columns" value layout
+            only the changed fields are written, after a cache lookup or snapshot
+            read of one column checks the record exists, or a read of the whole
+            record if the structure has views. A read conflict on the start of the
+            record's range makes the update conflict with a concurrent clear, but
+            not with updates of other columns. Otherwise the value is read, changed
+            and set.
+        '''
+        self._check_complete_key('update', key_tuple)
+        if not isinstance(changes, dict) or not changes:
+            raise ValidationError('update() must be passed a non-empty dict of value '
+                                  'field names or indexes to values')
+        positions = positions_of('value', self.value_field_index,
+                                 self.num_value_fields, tuple(changes))
+        if not self.columns:
+            current = self.get(tr, key_tuple)
+            if current is None:
+                raise ValidationError(f'cannot update() {key_tuple}, it is not set')
+            value = list(current)
+            for p, v in zip(positions, changes.values()):
+                value[p] = v
+            self.set(tr, key_tuple, tuple(value))
+            return
+        key = self.pack_key(key_tuple)
+        cache = self._write_cache(tr)
+        entry = None if cache is None else cache.peek(key)
+        old: Optional[Tuple] = None
+        if self.views:
+            old = self.get(tr, key_tuple)
+            exists = old is not None
+        elif entry is not None:
+            exists = entry[0] is not None
+        else:
+            # A snapshot read so updates to different columns do not conflict
+            exists = bool(list(_reader(tr, True).get_range(key + b'\x00',
+                                                           key + b'\xff', limit=1)))
+        if not exists:
+            raise ValidationError(f'cannot update() {key_tuple}, it is not set')
+        if not self.views:
+            # No column is stored at the start of the record's range, so only clears
+            # of the record conflict with this key
+            tr.add_read_conflict_key(key + b'\x00')
+        columns = [(p, self._pack_column(p, v))
+                   for p, v in zip(positions, changes.values())]
+        if old is not None:
+            new = list(old)
+            for p, v in zip(positions, changes.values()):
+                new[p] = v
+            self._update_views(tr, key_tuple, old, tuple(new))
+        for p, data in columns:
+            tr.set(key + self.column_suffixes[p], data)
+        self._bump_version(tr)
+        self._log_change(tr, 'update', key_tuple, tuple(columns))
+        # Only a cached value can be updated
+        entry = None if cache is None else cache.peek(key)
+        if cache is not None and entry is not None and entry[0] is not None:
+            value = list(entry[0])
+            for p, data in columns:
+                value[p] = self._unpack_column(p, data)
+            cache.put(key, tuple(value), entry[1])
+
+    def new_record(self, key_tuple: Tuple,
+                   value_tuple: Optional[Tuple] = None) -> Record:
+        '''
+            Returns a new Record for a complete key which save() will write, the
+            value defaults to each value field's default.
+        '''
+        self._check_complete_key('new_record', key_tuple)
+        return Record(self, key_tuple, value_tuple)
+
+    def load(self, tr: Any, key_tuple: Tuple,
+             snapshot: bool = False) -> Optional[Record]:
+        '''
+            Reads a complete key into a Record, returns None if the key is not set.
+        '''
+        value_tuple = self.get(tr, key_tuple, snapshot=snapshot)
+        if value_tuple is None:
+            return None
+        return Record(self, key_tuple, value_tuple, stored=True)
+
+    def records(self, tr: Any, prefix: Tuple = (), limit: int = 0,
+                reverse: bool = False, snapshot: bool = False) -> Iterator[Record]:
+        '''
+            Iterates a Record for every key starting with the prefix tuple, as
+            get_range().
+        '''
+        for key_tuple, value_tuple in self.get_range(tr, prefix, limit, reverse,
+                                                     snapshot):
+            yield Record(self, key_tuple, value_tuple, stored=True)
+
+    def save(self, tr: Any, record: Record) -> bool:
+        '''
+            Writes a Record if any field differs from its stored value. New records
+            are set, changed records are set with their value re-encoded, or with
+            the "columns" value layout only the changed fields are written. Returns
+            True if anything was written.
+        '''
+        if not isinstance(record, Record) or record._structure is not self:
+            raise ValidationError('save() must be passed a Record of this structure')
+        if not record.dirty:
+            return False
+        if record.stored and self.columns:
+            self.update(tr, record.key, record.changes())
+        else:
+            self.set(tr, record.key, record.value)
+        record._saved()
+        return True
+
+    def clear(self, tr: Any, key_tuple: Tuple) -> None:
+        '''
+            Clears a complete key, or every shard of it for sharded structures.
+        '''
+        self._check_complete_key('clear', key_tuple)
+        if self.views:
+            self._update_views(tr, key_tuple, self.get(tr, key_tuple), None)
+        key = self.pack_key(key_tuple)
+        if self.columns:
+            tr.clear_range(key + b'\x00', key + b'\xff')
+        else:
+            for physical_key in self._physical_keys(key_tuple):
+                tr.clear(physical_key)
+        self._bump_version(tr)
+        self._log_change(tr, 'clear', key_tuple)
+        cache = self._write_cache(tr)
+        if cache is not None:
+            cache.put(key, None, True)
+
+    def clear_range(self, tr: Any, prefix: Tuple = ()) -> None:
+        '''
+            Clears every key starting with the prefix tuple, in every shard or
+            HashPrefix bucket. Structures with views read the keys first to remove
+            them from the views.
+        '''
+        ranges = self._prefix_ranges('clear_range', prefix)
+        if self.views:
+            for key_tuple, value_tuple in self.get_range(tr, prefix):
+                self._update_views(tr, key_tuple, value_tuple, None)
+        for begin, end in ranges:
+            tr.clear_range(begin, end)
+        self._bump_version(tr)
+        self._log_change(tr, 'clear_range', prefix)
+        cache = read_cache(tr)
+        if cache is not None:
+            # Cached keys are packed without a shard number
+            if self.shards:
+                prefixes = [self._pack_key(prefix)]
+            else:
+                prefixes = self._range_prefixes(prefix)
+            cache.discard_prefixes(tuple(prefixes))
+
+    def _bump_version(self, tr: Any) -> None:
+        if self.watch_version:
+            tr.add(self.version_key, VERSION_INCREMENT)
+
+    def version(self, tr: Any, snapshot: bool = False) -> int:
+        '''
+            Returns the structure's version, the number of writes made through it,
+            or 0 if it has never been written. Requires watch_version.
+        '''
+        if not self.watch_version:
+            raise StructureError(f'{self.__class__.__name__}.version() requires '
+                                 f'watch_version')
+        data = _present(_reader(tr, snapshot).get(self.version_key))
+        return int.from_bytes(data, 'little') if data else 0
+
+    def _log_change(self, tr: Any, op: str, key_tuple: Tuple,
+                    value: Any = None) -> None:
+        '''
+            Appends a change to the change log, if enabled. Key values are stored
+            packed by their fields, incomplete versionstamps as their user version
+            as they are completed with the change's own transaction version.
+        '''
+        if not self.changelog:
+            return
+        key = tuple(v.user_version
+                    if isinstance(v, Versionstamp) and not v.is_complete()
+                    else self.key[i].pack(v) for i, v in enumerate(key_tuple))
+        entry = fdb.tuple.pack((op, key, value if self.changelog_values else None))
+        log_change(tr, self.changelog_prefix, entry)
+
+    def _check_changelog(self, op: str) -> None:
+        if not self.changelog:
+            raise StructureError(f'{self.__class__.__name__}.{op}() requires '
+                                 f'changelog')
+
+    def changes(self, tr: Any, cursor: Optional[bytes] = None, limit: int = 0,
+                snapshot: bool = False) -> List[Change]:
+        '''
+            Returns the changes logged after cursor, or every logged change, in
+            commit order. Each Change's cursor resumes reading after it. Requires
+            changelog.
+        '''
+        self._check_changelog('changes')
+        if not isinstance(limit, int) or limit < 0:
+            raise ValidationError(f'limit must be an int of 0 or more, got: {limit}')
+        begin, end = log_range(self.changelog_prefix, cursor)
+        kvs = _reader(tr, snapshot).get_range(begin, end, limit=limit)
+        return [self._change(kv) for kv in kvs]
+
+    def _change(self, kv: Any) -> Change:
+        cursor = bytes(kv.key)[len(self.changelog_prefix):]
+        op, packed_key, value = fdb.tuple.unpack(bytes(kv.value))
+        key_tuple = tuple(
+            Versionstamp(cursor[:10], v)
+            if isinstance(self.key[i], VersionstampField) and isinstance(v, int)
+            else self.key[i].unpack(v) for i, v in enumerate(packed_key))
+        if value is None:
+            return Change(cursor, op, key_tuple, None)
+        return Change(cursor, op, key_tuple, self._change_value(op, key_tuple, value))
+
+    def _change_value(self, op: str, key_tuple: Tuple, value: Any) -> Any:
+        '''
+            Decodes the value logged with a change.
+        '''
+        if op == 'update':
+            return {self.value[p].name or p: self._unpack_column(p, data)
+                    for p, data in value}
+        value_tuple = self.unpack_value(value)
+        if op not in ('set', 'append'):
+            # The operand of an atomic mutation
+            return value_tuple[0]
+        return value_tuple
+
+    def trim_changes(self, tr: Any, cursor: bytes) -> None:
+        '''
+            Clears the changes logged up to and including cursor. Requires
+            changelog.
+        '''
+        self._check_changelog('trim_changes')
+        if cursor is None:
+            raise ValidationError('trim_changes() requires a cursor')
+        end = log_range(self.changelog_prefix, cursor)[0]
+        tr.clear_range(self.changelog_prefix, end)
+
+    def _watch_keys(self, key_tuple: Tuple) -> List[bytes]:
+        '''
+            Returns every physical key holding a complete key's value, each column
+            with the "columns" value layout.
+        '''
+        if self.columns:
+            key = self.pack_key(key_tuple)
+            return [key + suffix for suffix in self.column_suffixes]
+        return self._physical_keys(key_tuple)
+
+    def _old_value(self, tr: Any, key: bytes) -> Optional[Tuple]:
+        old = _present(tr.get(key))
+        return None if old is None else self.unpack_value(old)
+
+    def _view_key(self, i: int, key_tuple: Tuple) -> bytes:
+        view = self.views[i]
+        group = tuple(self.key[j].pack(v)
+                      for j, v in enumerate(key_tuple[:view.group_by]))
+        return self.views_subspace.pack((view.name,) + group)
+
+    def _update_views(self, tr: Any, key_tuple: Tuple, old: Optional[Tuple],
+                      new: Optional[Tuple]) -> None:
+        '''
+            Adds the change from the old to the new value of a key, either None if
+            the key is not set, to every view with an atomic add.
+        '''
+        for i, view in enumerate(self.views):
+            index = self.view_fields[i]
+            delta = view.contribution(index, new) - view.contribution(index, old)
+            if delta:
+                tr.add(self._view_key(i, key_tuple), VIEW_VALUE.pack(delta))
+
+    def view(self, tr: Any, prefix: Tuple = (),
+             snapshot: bool = False) -> Dict[str, int]:
+        '''
+            Returns a dict of view name to value for every view grouped by as many
+            key fields as the prefix tuple has values. Each view is one key read.
+        '''
+        if not isinstance(prefix, tuple):
+            raise ValidationError(f'view() prefix must be a tuple, got: {type(prefix)}')
+        tr = _reader(tr, snapshot)
+        reads = [(view.name, tr.get(self._view_key(i, prefix)))
+                 for i, view in enumerate(self.views)
+                 if view.group_by == len(prefix)]
+        if not reads:
+            raise ValidationError(f'{self.__class__.__name__} has no view grouped by '
+                                  f'{len(prefix)} key fields')
+        values = {}
+        for name, read in reads:
+            data = _present(read)
+            values[name] = VIEW_VALUE.unpack(data)[0] if data else 0
+        return values
+
+    def rebuild_views(self, db: Any, batch_size: int = 500) -> int:
+        '''
+            Recomputes every view from the stored keys. The views are cleared, then
+            keys are read in transactions of at most batch_size keys and added to
+            the views. Keys written while a rebuild runs may be counted twice, so
+            pause writes to the structure first. Returns the number of records read.
+        '''
+        if not self.views:
+            raise StructureError(f'{self.__class__.__name__} has no views')
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValidationError(f'batch_size must be an int of 1 or more, '
+                                  f'got: {batch_size}')
+        tr = db.create_transaction()
+        while True:
+            try:
+                for view in self.views:
+                    begin = self.views_subspace.pack((view.name,))
+                    tr.clear_range(begin, begin + b'\xff')
+                tr.commit().wait()
+                break
+            except Exception as e:
+                if not hasattr(e, 'code'):
+                    raise
+                tr.on_error(e).wait()
+        read = 0
+        limit = batch_size * self.num_value_fields if self.columns else batch_size
+        begin = self.raw_prefix + b'\x00'
+        end = self.raw_prefix + b'\xff'
+        while True:
+            tr = db.create_transaction()
+            while True:
+                try:
+                    kvs = list(tr.get_range(begin, end, limit=limit))
+                    records = self._records(kvs)
+                    if self.columns and len(kvs) == limit and len(records) > 1:
+                        # The last record's columns may continue in the next batch
+                        records.pop()
+                    deltas: Dict[bytes, int] = {}
+                    for key, value_tuple in records:
+                        key_tuple = self._unpack_stored_key(key)
+                        for i, view in enumerate(self.views):
+                            view_key = self._view_key(i, key_tuple)
+                            deltas[view_key] = deltas.get(view_key, 0) + \
+                                view.contribution(self.view_fields[i], value_tuple)
+                    for view_key, delta in deltas.items():
+                        if delta:
+                            tr.add(view_key, VIEW_VALUE.pack(delta))
+                    tr.commit().wait()
+                    break
+                except Exception as e:
+                    if not hasattr(e, 'code'):
+                        raise
+                    tr.on_error(e).wait()
+            read += len(records)
+            if len(kvs) < limit:
+                return read
+            # Continue after the last key, or after every column of the last record
+            begin = records[-1][0] + (b'\xff' if self.columns else b'\x00')
+
+    def _records(self, kvs: List) -> List[Tuple[bytes, Tuple]]:
+        '''
+            Returns a (packed key, value tuple) pair for each record in a list of
+            key values read in order.
+        '''
+        if self.columns:
+            return [(key, self._unpack_columns(columns))
+                    for key, columns in self._column_records(kvs)]
+        return [(kv.key, self.unpack_value(kv.value)) for kv in kvs]
+
+    def _range_prefixes(self, prefix: Tuple) -> List[bytes]:
+        '''
+            Returns the packed prefixes of every physical range holding keys starting
+            with the prefix tuple, one per shard or HashPrefix bucket if needed.
+        '''
+        if self.shards:
+            return [self._pack(self.key, prefix, (shard,))
+                    for shard in range(self.read_shards)]
+        if self.hash_prefix is not None and len(prefix) <= self.hash_prefix.hash_field:
+            return [self._pack(self.key, prefix, (bucket,))
+                    for bucket in range(self.hash_prefix.buckets)]
+        return [self._pack_key(prefix)]
+
+    def _key_conflicts(self, op: str, key_tuple: Tuple) -> List[Tuple[bytes, bytes]]:
+        self._check_complete_key(op, key_tuple)
+        if self.columns:
+            key = self.pack_key(key_tuple)
+            return [(key + b'\x00', key + b'\xff')]
+        return [(key, key + b'\x00') for key in self._physical_keys(key_tuple)]
+
+    def _prefix_ranges(self, op: str, prefix: Tuple) -> List[Tuple[bytes, bytes]]:
+        self._check_range_args(op, prefix, 0)
+        complete = len(prefix) == self.num_key_fields and not self.columns
+        return [(packed if complete else packed + b'\x00', packed + b'\xff')
+                for packed in self._range_prefixes(prefix)]
+
+    def add_read_conflict_key(self, tr: Any, key_tuple: Tuple) -> None:
+        '''
+            Makes the transaction conflict if a complete key, every shard of it or
+            every column of it, is written by another transaction before it commits,
+            as if it had been read. Use with snapshot reads to choose exactly which
+            keys a transaction depends on.
+        '''
+        for begin, end in self._key_conflicts('add_read_conflict_key', key_tuple):
+            tr.add_read_conflict_range(begin, end)
+
+    def add_read_conflict_range(self, tr: Any, prefix: Tuple = ()) -> None:
+        '''
+            Makes the transaction conflict if any key starting with the prefix tuple
+            is written by another transaction before it commits.
+        '''
+        for begin, end in self._prefix_ranges('add_read_conflict_range', prefix):
+            tr.add_read_conflict_range(begin, end)
+
+    def add_write_conflict_key(self, tr: Any, key_tuple: Tuple) -> None:
+        '''
+            Makes other transactions which read a complete key conflict when this
+            transaction commits, as if it had been written, without writing it.
+        '''
+        for begin, end in self._key_conflicts('add_write_conflict_key', key_tuple):
+            tr.add_write_conflict_range(begin, end)
+
+    def add_write_conflict_range(self, tr: Any, prefix: Tuple = ()) -> None:
+        '''
+            Makes other transactions which read any key starting with the prefix
+            tuple conflict when this transaction commits.
+        '''
+        for begin, end in self._prefix_ranges('add_write_conflict_range', prefix):
+            tr.add_write_conflict_range(begin, end)
+
+    def get_range(self, tr: Any, prefix: Tuple = (), limit: int = 0,
+                  reverse: bool = False,
+                  snapshot: bool = False) -> Iterator[Tuple[Tuple, Tuple]]:
+        '''
+            Iterates (key tuple, value tuple) pairs for every key starting with the
+            prefix tuple in key order. When keys are spread over several ranges, by
+            shards or a HashPrefix, every range is requested at once and merged in
+            order, the shards of each key are combined with combine_shards().
+        '''
+        self._check_range_args('get_range', prefix, limit)
+        yield from self._rows(_reader(tr, snapshot), prefix, limit, reverse)
+
+    def _rows(self, tr: Any, prefix: Tuple, limit: int, reverse: bool,
+              after: Optional[bytes] = None) -> Iterator[Tuple[Tuple, Tuple]]:
+        '''
+            Iterates the (key tuple, value tuple) pairs of get_range(), from after
+            the key suffix after, if set.
+        '''
+        if self.columns:
+            # At most every column of limit records is read
+            merged = self._merged_range(tr, prefix, limit * self.num_value_fields,
+                                        reverse, after)
+            records = self._column_records(kv for _, kv in merged)
+            for count, (key, columns) in enumerate(records, 1):
+                yield self._unpack_stored_key(key), self._unpack_columns(columns)
+                if count == limit:
+                    return
+            return
+        merged = self._merged_range(tr, prefix, limit, reverse, after)
+        count = 0
+        if self.shards:
+            group: List = []
+            for suffix, kv in merged:
+                if group and suffix != group[0][0]:
+                    yield self._combined(group)
+                    count += 1
+                    if count == limit:
+                        return
+                    group = []
+                group.append((suffix, kv))
+            if group:
+                yield self._combined(group)
+            return
+        for _, kv in merged:
+            yield self._unpack_stored_key(kv.key), self.unpack_value(kv.value)
+            count += 1
+            if count == limit:
+                return
+
+    def page(self, tr: Any, prefix: Tuple = (), limit: int = 100,
+             cursor: Optional[str] = None, reverse: bool = False,
+             snapshot: bool = False) -> Page:
+        '''
+            Returns a Page of at most limit (key tuple, value tuple) pairs starting
+            with the prefix tuple, in key order or in reverse, and the cursor of the
+            next page, or None after the last page. Pass the cursor back with the
+            same prefix and direction to read the next page with one bounded range
+            read, however deep it is.
+        '''
+        self._check_range_args('page', prefix, limit)
+        if limit < 1:
+            raise ValidationError(f'page() limit must be 1 or more, got: {limit}')
+        scope = self.raw_prefix + fdb.tuple.pack(self._packed_fields(prefix))
+        after = None
+        if cursor is not None:
+            after = decode_cursor(cursor, scope, reverse)
+            try:
+                remaining = len(fdb.tuple.unpack(after))
+            except Exception:
+                raise ValidationError('cursor is not a valid page cursor')
+            if remaining != self.num_key_fields - len(prefix):
+                raise ValidationError('cursor is not a valid page cursor')
+        # One more row than the page shows whether there is a next page
+        rows = list(self._rows(_reader(tr, snapshot), prefix, limit + 1, reverse,
+                               after))
+        if len(rows) <= limit:
+            return Page(rows, None)
+        rows = rows[:limit]
+        suffix = fdb.tuple.pack(self._packed_fields(rows[-1][0][len(prefix):],
+                                                    len(prefix)))
+        return Page(rows, encode_cursor(scope, reverse, suffix))
+
+    def _packed_fields(self, values: Tuple, start: int = 0) -> Tuple:
+        '''
+            Returns key values packed by their fields, from the key field at start.
+        '''
+        return tuple(self.key[start + i].pack(v) for i, v in enumerate(values))
+
+    def _check_range_args(self, op: str, prefix: Tuple, limit: int) -> None:
+        if not isinstance(prefix, tuple) or len(prefix) > self.num_key_fields:
+            raise ValidationError(f'{op}() prefix must be a tuple of at most '
+                                  f'{self.num_key_fields} values')
+        if not isinstance(limit, int) or limit < 0:
+            raise ValidationError(f'limit must be an int of 0 or more, got: {limit}')
+
+    def _merged_range(self, tr: Any, prefix: Tuple, limit: int, reverse: bool,
+                      after: Optional[bytes] = None) -> Iterator[Tuple[bytes, Any]]:
+        '''
+            Requests every physical range holding keys starting with the prefix tuple
+            and iterates (key suffix, key value) pairs merged in key order. The suffix
+            is the key bytes after the packed prefix. If after is set only keys past
+            the record with that suffix, in the direction read, are requested.
+        '''
+        complete = len(prefix) == self.num_key_fields
+        ranges = []
+        for packed in self._range_prefixes(prefix):
+            # A complete prefix is itself a key, a partial one is not
+            begin = packed if complete else packed + b'\x00'
+            end = packed + b'\xff'
+            if after is not None and reverse:
+                end = packed + after
+            elif after is not None:
+                # Skip every column of the record
+                last = self.column_suffixes[-1] if self.columns else b''
+                begin = packed + after + last + b'\x00'
+            kvs = tr.get_range(begin, end, limit=limit, reverse=reverse)
+            ranges.append(self._suffixed(kvs, len(packed)))
+        if len(ranges) == 1:
+            return ranges[0]
+        return heapq.merge(*ranges, key=itemgetter(0), reverse=reverse)
+
+    def count(self, tr: Any, prefix: Tuple = (), limit: int = 0,
+              snapshot: bool = False) -> int:
+        '''
+            Counts the keys starting with the prefix tuple without decoding them.
+            Counting stops once limit keys, if set, have been counted.
+        '''
+        self._check_range_args('count', prefix, limit)
+        tr = _reader(tr, snapshot)
+        if self.shards:
+            return sum(1 for _ in self.get_range(tr, prefix, limit))
+        count = 0
+        rows: Iterator = self._merged_range(tr, prefix, limit * self.num_value_fields
+                                            if self.columns else limit, False)
+        if self.columns:
+            rows = self._column_records(kv for _, kv in rows)
+        for _ in rows:
+            count += 1
+            if count == limit:
+                break
+        return count
+
+    def exists(self, tr: Any, prefix: Tuple = (), snapshot: bool = False) -> bool:
+        '''
+            Returns True if any key starts with the prefix tuple, reading at most one
+            key from each range.
+        '''
+        return self.count(tr, prefix, limit=1, snapshot=snapshot) > 0
+
+    def aggregate(self, tr: Any, prefix: Tuple = (), group_by: int = 0,
+                  metrics: Optional[Dict[str, Any]] = None, limit: int = 0,
+                  batch_size: int = 1000,
+                  snapshot: bool = False) -> Iterator[Tuple[Tuple, Dict[str, Any]]]:
+        '''
+            Streams the keys starting with the prefix tuple and iterates (group key
+            tuple, metrics dict) pairs in key order, one per distinct value of the
+            first group_by key fields. metrics maps names to "count" or an (op, value
+            field) tuple with an op of "count", "sum", "min", "max" or "avg". Rows are
+            reduced in batches of batch_size, only the value fields used by the
+            metrics are decoded and iteration stops after limit groups, if set.
+        '''
+        self._check_range_args('aggregate', prefix, limit)
+        if not isinstance(group_by, int) or not 0 <= group_by <= self.num_key_fields:
+            raise ValidationError(f'group_by must be an int between 0 and '
+                                  f'{self.num_key_fields}, got: {group_by}')
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValidationError(f'batch_size must be an int of 1 or more, '
+                                  f'got: {batch_size}')
+        parsed = parse_metrics(metrics, self.value_field_index, self.value)
+        positions = tuple(sorted({m.field for m in parsed if m.field is not None}))
+        tr = _reader(tr, snapshot)
+        if self.shards or self.columns:
+            rows = self._record_group_rows(tr, prefix, group_by, positions)
+        else:
+            rows = self._group_rows(tr, prefix, group_by, positions)
+        aggregation: Optional[Aggregation] = None
+        group: Tuple = ()
+        group_token: Any = None
+        batch: List[Tuple] = []
+        count = 0
+        for token, source, values in rows:
+            if aggregation is None or token != group_token:
+                if aggregation is not None:
+                    aggregation.add_batch(batch)
+                    yield group, aggregation.result()
+                    count += 1
+                    if count == limit:
+                        return
+                    batch = []
+                aggregation = Aggregation(parsed, positions)
+                group_token = token
+                group = self._group_key(source, prefix, group_by)
+            if positions:
+                batch.append(values)
+                if len(batch) == batch_size:
+                    aggregation.add_batch(batch)
+                    batch = []
+            else:
+                aggregation.add_rows(1)
+        if aggregation is not None:
+            aggregation.add_batch(batch)
+            yield group, aggregation.result()
+        elif group_by <= len(prefix):
+            # A range aggregated as a single group always has a result
+            yield prefix[:group_by], Aggregation(parsed, positions).result()
+
+    def _group_rows(self, tr: Any, prefix: Tuple, group_by: int,
+                    positions: Tuple[int, ...]) -> Iterator[Tuple[bytes, bytes, Any]]:
+        '''
+            Iterates (group token, key bytes, projected values) for aggregate(). The
+            group token is the packed bytes of the group's key fields after the
+            prefix, found by skipping elements without decoding them.
+        '''
+        group_elements = max(group_by - len(prefix), 0)
+        for suffix, kv in self._merged_range(tr, prefix, 0, False):
+            end = 0
+            for _ in range(group_elements):
+                end = skip_element(suffix, end)
+            values = self.unpack_value(kv.value, positions) if positions else None
+            yield suffix[:end], kv.key, values
+
+    def _record_group_rows(self, tr: Any, prefix: Tuple, group_by: int,
+                           positions: Tuple[int, ...]) -> Iterator[Tuple]:
+        for key_tuple, value_tuple in self.get_range(tr, prefix):
+            values = tuple(value_tuple[p] for p in positions)
+            yield key_tuple[:group_by], key_tuple, values
+
+    def _group_key(self, source: Any, prefix: Tuple, group_by: int) -> Tuple:
+        if isinstance(source, tuple):
+            return source[:group_by]
+        if group_by <= len(prefix):
+            return prefix[:group_by]
+        return self._unpack_stored_key(source, tuple(range(group_by)))
+
+    def _suffixed(self, kvs: Any, prefix_len: int) -> Iterator[Tuple[bytes, Any]]:
+        for kv in kvs:
+            yield kv.key[prefix_len:], kv
+
+    def _combined(self, group: List) -> Tuple[Tuple, Tuple]:
+        values = [self.unpack_value(kv.value)[0] for _, kv in group]
+        return self.unpack_shard_key(group[0][1].key), (self.combine_shards(values),)
+
+    def reshard(self, db: Any, shards: int, batch_size: int = 500) -> int:
+        '''
+            Changes the number of shards written to, online. Growing needs no data
+            to move. Shrinking moves every key in a removed shard into a remaining
+            shard, combining it with the atomic field's mutation, in transactions of
+            at most batch_size keys while reads keep covering the removed shards.
+            Other processes using the structure should be running with the new
+            shards and shard_reads set to the old number of shards first. Returns
+            the number of keys moved.
+        '''
+        me = self.__class__.__name__
+        if not self.shards or self.atomic_field is None:
+            raise StructureError(f'{me} is not sharded')
+        if not isinstance(shards, int) or shards < 1:
+            raise StructureError('shards must be an int of 1 or more')
+        op = self.atomic_field.atomic_ops[0]
+        old_shards = self.read_shards
+        self.shard_reads = max(old_shards, shards)
+        self.shards = shards
+        moved = 0
+        for shard in range(shards, old_shards):
+            begin, end = self.shard_range(shard)
+            target = self.subspace.pack((shard % shards,))
+            while True:
+                tr = db.create_transaction()
+                while True:
+                    try:
+                        kvs = list(tr.get_range(begin, end, limit=batch_size))
+                        for kv in kvs:
+                            getattr(tr, op)(target + kv.key[len(begin):], kv.value)
+                            tr.clear(kv.key)
+                        tr.commit().wait()
+                        break
+                    except Exception as e:
+                        if not hasattr(e, 'code'):
+                            raise
+                        tr.on_error(e).wait()
+                moved += len(kvs)
+                if len(kvs) < batch_size:
+                    break
+        self.shard_reads = 0
+        return moved
+
+    def append(self, tr: Any, key_tuple: Tuple, value_tuple: Tuple,
+               user_version: int = 0) -> Any:
+        '''
+            Writes a key and value where either contains an incomplete versionstamp
+            with set_versionstamped_key() or set_versionstamped_value(), so many
+            writers can append to one keyspace without conflicting. If key_tuple is
+            one value short and the last key field is a VersionstampField an
+            incomplete versionstamp with user_version is added for it, use a
+            different user_version for each append in the same transaction. Returns
+            the transaction's get_versionstamp() future which resolves to the
+            committed 10 byte transaction version.
+        '''
+        if not isinstance(key_tuple, tuple):
+            raise ValidationError(f'append(...) must be passed a key tuple, '
+                                  f'got: {type(key_tuple)}')
+        if (len(key_tuple) == self.num_key_fields - 1 and
+                isinstance(self.key[-1], VersionstampField)):
+            key_tuple = key_tuple + (Versionstamp.incomplete(user_version),)
+        self._check_complete_key('append', key_tuple)
+        key_stamps = _incomplete_versionstamps(key_tuple)
+        value_stamps = _incomplete_versionstamps(value_tuple)
+        if key_stamps and value_stamps:
+            raise ValidationError('append() can only complete one versionstamp, '
+                                  'in either the key or the value')
+        if self.shards:
+            key = self.pack_shard_key(key_tuple, self.choose_shard())
+        else:
+            key = self.pack_key(key_tuple)
+        value = self.pack_value(value_tuple)
+        if key_stamps:
+            if self.views:
+                self._update_views(tr, key_tuple, None, value_tuple)
+            tr.set_versionstamped_key(key, value)
+        elif value_stamps:
+            if self.views:
+                self._update_views(tr, key_tuple, self._old_value(tr, key),
+                                   value_tuple)
+            tr.set_versionstamped_value(key, value)
+            cache = read_cache(tr)
+            if cache is not None:
+                cache.discard(self.pack_key(key_tuple))
+        else:
+            raise ValidationError('append() requires an incomplete versionstamp in '
+                                  'the key or the value')
+        self._bump_version(tr)
+        # A versionstamped value is only known once committed
+        self._log_change(tr, 'append', key_tuple, None if value_stamps else value)
+        return tr.get_versionstamp()
+
+    def add(self, tr: Any, key_tuple: Tuple, delta: int,
+            shard_hint: Any = None) -> None:
+        '''
+            Atomically adds delta, which may be negative, to a CounterField value.
+        '''
+        self._mutate(tr, 'add', key_tuple, delta, shard_hint)
+
+    def min(self, tr: Any, key_tuple: Tuple, v: int,
+            shard_hint: Any = None) -> None:
+        '''
+            Atomically sets a MinField value to the smaller of it and v.
+        '''
+        self._mutate(tr, 'min', key_tuple, v, shard_hint)
+
+    def max(self, tr: Any, key_tuple: Tuple, v: int,
+            shard_hint: Any = None) -> None:
+        '''
+            Atomically sets a MaxField value to the larger of it and v.
+        '''
+        self._mutate(tr, 'max', key_tuple, v, shard_hint)
+
+    def bit_and(self, tr: Any, key_tuple: Tuple, v: int,
+                shard_hint: Any = None) -> None:
+        '''
+            Atomically combines a BitAndField value with v using bitwise and.
+        '''
+        self._mutate(tr, 'bit_and', key_tuple, v, shard_hint)
+
+    def bit_or(self, tr: Any, key_tuple: Tuple, v: int,
+               shard_hint: Any = None) -> None:
+        '''
+            Atomically combines a BitOrField value with v using bitwise or.
+        '''
+        self._mutate(tr, 'bit_or', key_tuple, v, shard_hint)
+
+    def bit_xor(self, tr: Any, key_tuple: Tuple, v: int,
+                shard_hint: Any = None) -> None:
+        '''
+            Atomically combines a BitXorField value with v using bitwise xor.
+        '''
+        self._mutate(tr, 'bit_xor', key_tuple, v, shard_hint)
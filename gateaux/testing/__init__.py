@@ -0,0 +1,10 @@
+'''
+    Helpers for testing and benchmarking code which uses gateaux without a
+    FoundationDB cluster.
+'''
+
+
+from .memory import (MemoryDatabase, MemoryTransaction, MemoryTransactionRead,
+                     MemoryFuture, KeyValue, TransactionConflict, OperationCancelled,
+                     transactional)
+from .generator import DataGenerator
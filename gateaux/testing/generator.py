@@ -0,0 +1,236 @@
+'''
+    Synthetic keys and values for load testing and benchmarking Structures. Each
+    field's type and constraints decide the values generated, so every record is
+    valid for the structure without a hand-written generator.
+'''
+
+
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from bisect import bisect
+from datetime import datetime, timezone
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+from itertools import accumulate
+from uuid import UUID
+import random
+from ..errors import StructureError
+from ..fields.base import BaseField
+from ..fields.array import ArrayField
+from ..fields.atomic import AtomicField
+from ..fields.binary import BinaryField
+from ..fields.boolean import BooleanField
+from ..fields.datetime import DateTimeField
+from ..fields.enum import EnumField
+from ..fields.float import FloatField
+from ..fields.hashprefix import HashPrefix
+from ..fields.integer import IntegerField
+from ..fields.ipv4address import IPv4AddressField
+from ..fields.ipv4network import IPv4NetworkField
+from ..fields.ipv6address import IPv6AddressField
+from ..fields.ipv6network import IPv6NetworkField
+from ..fields.string import StringField
+from ..fields.uuid import UUIDField
+
+
+# How key indexes are chosen: equally likely, with a few hot keys, or in order
+UNIFORM: str = 'uniform'
+ZIPFIAN: str = 'zipfian'
+SEQUENTIAL: str = 'sequential'
+DISTRIBUTIONS: Tuple[str, ...] = (UNIFORM, ZIPFIAN, SEQUENTIAL)
+
+MASK_64: int = 2 ** 64 - 1
+# Defaults for fields without constraints
+DEFAULT_INT_RANGE: Tuple[int, int] = (0, 2 ** 31 - 1)
+DEFAULT_FLOAT_RANGE: Tuple[float, float] = (0.0, 1000.0)
+DEFAULT_STRING_LENGTH: int = 16
+DEFAULT_BINARY_LENGTH: int = 8
+DEFAULT_ARRAY_LENGTH: int = 8
+ATOMIC_RANGE: Tuple[int, int] = (0, 1000)
+# Generated datetimes are whole seconds in the ten years from 2020
+EPOCH: int = 1577836800
+DATETIME_SPAN: int = 10 * 365 * 86400
+
+
+def _mix(x: int) -> int:
+    '''
+        splitmix64, spreads consecutive ints over every 64 bit int.
+    '''
+    x = (x + 0x9e3779b97f4a7c15) & MASK_64
+    x = ((x ^ (x >> 30)) * 0xbf58476d1ce4e5b9) & MASK_64
+    x = ((x ^ (x >> 27)) * 0x94d049bb133111eb) & MASK_64
+    return x ^ (x >> 31)
+
+
+def _int_range(field: Any, default: Tuple[Any, Any]) -> Tuple[Any, Any]:
+    low, high = field.min_value, field.max_value
+    span = default[1] - default[0]
+    if low is None and high is None:
+        return default
+    if high is None:
+        return low, low + span
+    if low is None:
+        return min(default[0], high), high
+    return low, high
+
+
+class DataGenerator:
+    '''
+        Generates valid keys and values for a structure. Keys are drawn from a
+        keyspace of "keys" distinct keys, each key index always mapping to the same
+        key tuple, chosen by distribution: "uniform", "zipfian" where the key with
+        rank r is chosen in proportion to 1 / r ** zipf_exponent, or "sequential"
+        in index order, wrapping after the last key. Values are random. Integer and
+        float fields keep to min_value and max_value, strings and binaries to
+        max_length and enums to their members. Nullable value fields are None at
+        null_rate, from 0 for never to 1 for always. Generation is repeatable with
+        a seed.
+    '''
+
+    def __init__(self, structure: Any, keys: int = 100000,
+                 distribution: str = UNIFORM, zipf_exponent: float = 1.0,
+                 null_rate: float = 0.0, seed: Optional[int] = None) -> None:
+        if not isinstance(keys, int) or keys < 1:
+            raise ValueError('keys must be an int greater than 0')
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f'distribution must be one of {DISTRIBUTIONS}, '
+                             f'got: {distribution}')
+        if zipf_exponent <= 0:
+            raise ValueError('zipf_exponent must be greater than 0')
+        if not 0 <= null_rate <= 1:
+            raise ValueError('null_rate must be between 0 and 1')
+        self.structure = structure
+        self.keys = keys
+        self.distribution = distribution
+        self.null_rate = null_rate
+        self.rng = random.Random(seed)
+        self._seed = self.rng.getrandbits(64)
+        self._next_index = 0
+        self._key_makers = [self._maker(field) for field in structure.key]
+        self._value_makers = [self._maker(field) for field in structure.value]
+        # Fields which are nullable but fail to pack None, such as integers with
+        # limits, are always given a value
+        self._nullable = [bool(null_rate and field.null) and field.check(None) is None
+                          for field in structure.value]
+        # Cumulative weights of each key rank, searched with bisect
+        self._weights: List[float] = []
+        if distribution == ZIPFIAN:
+            self._weights = list(accumulate(1.0 / rank ** zipf_exponent
+                                            for rank in range(1, keys + 1)))
+
+    def _maker(self, field: BaseField) -> Callable[[int], Any]:
+        '''
+            Returns a function mapping a 64 bit int to a valid value of the field.
+            Ints map to values in order where the field's type allows it, so
+            sequential keys are packed in increasing order.
+        '''
+        name = f'{self.structure.__class__.__name__} field {field.__class__.__name__}'
+        if isinstance(field, HashPrefix):
+            return self._maker(field.field)
+        if isinstance(field, AtomicField):
+            low = max(ATOMIC_RANGE[0], field.min_value)
+            high = min(ATOMIC_RANGE[1], field.max_value)
+            return lambda n: low + n % (high - low + 1)
+        if isinstance(field, BooleanField):
+            return lambda n: bool(n & 1)
+        if isinstance(field, IntegerField):
+            low, high = _int_range(field, DEFAULT_INT_RANGE)
+            return lambda n: low + n % (high - low + 1)
+        if isinstance(field, FloatField):
+            low, high = _int_range(field, DEFAULT_FLOAT_RANGE)
+            return lambda n: low + (n % 2 ** 32) / 2 ** 32 * (high - low)
+        if isinstance(field, StringField):
+            length = min(field.max_length or DEFAULT_STRING_LENGTH, 16)
+            return lambda n: f'{n % 16 ** length:0{length}x}'
+        if isinstance(field, BinaryField):
+            length = min(field.max_length or DEFAULT_BINARY_LENGTH, 8)
+            return lambda n: (n % 256 ** length).to_bytes(length, 'big')
+        if isinstance(field, EnumField):
+            members = field.members
+            return lambda n: members[n % len(members)]
+        if isinstance(field, DateTimeField):
+            return lambda n: datetime.fromtimestamp(EPOCH + n % DATETIME_SPAN,
+                                                    timezone.utc)
+        if isinstance(field, IPv4AddressField):
+            return lambda n: IPv4Address(n % 2 ** 32)
+        if isinstance(field, IPv6AddressField):
+            return lambda n: IPv6Address(n)
+        if isinstance(field, IPv4NetworkField):
+            return lambda n: IPv4Network(((n % 2 ** 24) << 8, 24))
+        if isinstance(field, IPv6NetworkField):
+            return lambda n: IPv6Network((n << 64, 64))
+        if isinstance(field, UUIDField):
+            return lambda n: UUID(int=n)
+        if isinstance(field, ArrayField):
+            length = min(field.max_length or DEFAULT_ARRAY_LENGTH,
+                         DEFAULT_ARRAY_LENGTH)
+            if field.dtype.startswith('f'):
+                return lambda n: [(_mix(n + i) % 2 ** 24) / 2 ** 10
+                                  for i in range(length)]
+            return lambda n: [_mix(n + i) % 2 ** 31 for i in range(length)]
+        raise StructureError(f'{name} cannot be generated')
+
+    def index(self) -> int:
+        '''
+            Returns the index of the next key chosen by the distribution.
+        '''
+        if self.distribution == SEQUENTIAL:
+            i = self._next_index
+            self._next_index = (i + 1) % self.keys
+            return i
+        if self.distribution == ZIPFIAN:
+            return bisect(self._weights, self.rng.random() * self._weights[-1])
+        return self.rng.randrange(self.keys)
+
+    def key(self, index: Optional[int] = None) -> Tuple:
+        '''
+            Returns the key tuple with index, or the next key chosen by the
+            distribution. Sequential key indexes are packed in increasing order
+            where the first key field allows it, other keys are spread over the
+            keyspace.
+        '''
+        if index is None:
+            index = self.index()
+        if self.distribution == SEQUENTIAL:
+            return tuple(make(index) for make in self._key_makers)
+        base = index * len(self._key_makers) ^ self._seed
+        return tuple(make(_mix(base + i)) for i, make in enumerate(self._key_makers))
+
+    def value(self) -> Tuple:
+        '''
+            Returns a random value tuple, with nullable fields None at null_rate.
+        '''
+        rng = self.rng
+        return tuple(None if nullable and rng.random() < self.null_rate
+                     else make(rng.getrandbits(64))
+                     for make, nullable in zip(self._value_makers, self._nullable))
+
+    def records(self, count: int) -> Iterator[Tuple[Tuple, Tuple]]:
+        '''
+            Iterates count (key tuple, value tuple) pairs.
+        '''
+        for _ in range(count):
+            yield self.key(), self.value()
+
+    def load(self, db: Any, count: int, batch_size: int = 500) -> int:
+        '''
+            Sets count generated records in db through the structure, batch_size
+            records per transaction, and returns the number of records set. Keys
+            chosen more than once are overwritten.
+        '''
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError('batch_size must be an int greater than 0')
+        written = 0
+        while written < count:
+            batch = list(self.records(min(batch_size, count - written)))
+            tr = db.create_transaction()
+            while True:
+                try:
+                    for key_tuple, value_tuple in batch:
+                        self.structure.set(tr, key_tuple, value_tuple)
+                    tr.commit().wait()
+                    break
+                except Exception as e:
+                    if not hasattr(e, 'code'):
+                        raise
+                    tr.on_error(e).wait()
+            written += len(batch)
+        return written
@@ -0,0 +1,662 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bisect import bisect_left, insort
+import functools
+import inspect
+import threading
+import time
+import weakref
+
+
+class TransactionConflict(Exception):
+    '''
+        Raised on commit when a transaction read data which another transaction
+        modified after it started. Mirrors FoundationDB's "not_committed" error.
+    '''
+
+    code: int = 1020
+
+    def __init__(self, message: str = 'transaction not committed due to conflict '
+                                      'with another transaction') -> None:
+        super().__init__(message)
+
+
+class OperationCancelled(Exception):
+    '''
+        Raised when waiting on a future which was cancelled. Mirrors
+        FoundationDB's "operation_cancelled" error.
+    '''
+
+    code: int = 1101
+
+    def __init__(self, message: str = 'asynchronous operation cancelled') -> None:
+        super().__init__(message)
+
+
+class MemoryFuture:
+    '''
+        A minimal, already-resolved or later-resolved future with the same waiting
+        interface as the fdb futures returned by commit() and get_read_version().
+    '''
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._value: Any = None
+        self._error: Optional[BaseException] = None
+        self._callbacks: List[Callable] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def resolved(cls, value: Any = None) -> 'MemoryFuture':
+        future = cls()
+        future.set(value)
+        return future
+
+    def set(self, value: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._value = value
+            self._error = error
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def is_ready(self) -> bool:
+        return self._event.is_set()
+
+    def block_until_ready(self) -> None:
+        self._event.wait()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        if not self._event.wait(timeout):
+            raise TimeoutError('future was not ready before the timeout')
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def on_ready(self, callback: Callable) -> None:
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def cancel(self) -> None:
+        self.set(error=OperationCancelled())
+
+
+class KeyValue:
+    '''
+        A key and value pair returned from range reads, unpackable like fdb's.
+    '''
+
+    __slots__ = ('key', 'value')
+
+    def __init__(self, key: bytes, value: bytes) -> None:
+        self.key = key
+        self.value = value
+
+    def __iter__(self):
+        return iter((self.key, self.value))
+
+    def __repr__(self) -> str:
+        return f'{self.key!r}: {self.value!r}'
+
+
+def _range_args(begin: Optional[bytes], end: Optional[bytes]) -> Tuple[bytes, bytes]:
+    return (b'' if begin is None else bytes(begin),
+            b'\xff' if end is None else bytes(end))
+
+
+# FoundationDB's maximum value size, used by append_if_fits
+VALUE_SIZE_LIMIT: int = 100000
+
+
+def versionstamp(version: int) -> bytes:
+    '''
+        Returns the 10 byte transaction versionstamp for a commit version, the 8 byte
+        big-endian version followed by a 2 byte batch number which is always 0 here.
+    '''
+    return version.to_bytes(8, 'big') + b'\x00\x00'
+
+
+def apply_versionstamp(param: bytes, stamp: bytes) -> bytes:
+    '''
+        Replaces the 10 bytes at the little-endian 4 byte offset which ends param,
+        as packed by pack_with_versionstamp(), with stamp and removes the offset.
+    '''
+    if len(param) < 4:
+        raise ValueError('versionstamped param is missing its offset')
+    data, offset = param[:-4], int.from_bytes(param[-4:], 'little')
+    if offset + 10 > len(data):
+        raise ValueError(f'versionstamp offset {offset} is out of range')
+    return data[:offset] + stamp + data[offset + 10:]
+
+
+def apply_atomic(op: str, current: Optional[bytes], param: bytes) -> bytes:
+    '''
+        Returns the result of applying FoundationDB's atomic mutation op to the
+        current value (None if the key is not present) with param. Integer mutations
+        treat values as little-endian unsigned integers of the length of param.
+    '''
+    if op == 'append_if_fits':
+        if current is None:
+            return param
+        joined = current + param
+        return joined if len(joined) <= VALUE_SIZE_LIMIT else current
+    if current is None:
+        return param
+    if op == 'byte_min':
+        return min(current, param)
+    if op == 'byte_max':
+        return max(current, param)
+    size = len(param)
+    a = int.from_bytes(current[:size].ljust(size, b'\x00'), 'little')
+    b = int.from_bytes(param, 'little')
+    if op == 'add':
+        result = (a + b) % (1 << (8 * size)) if size else 0
+    elif op == 'bit_and':
+        result = a & b
+    elif op == 'bit_or':
+        result = a | b
+    elif op == 'bit_xor':
+        result = a ^ b
+    elif op == 'min':
+        result = min(a, b)
+    elif op == 'max':
+        result = max(a, b)
+    else:
+        raise ValueError(f'unknown atomic operation: {op}')
+    return result.to_bytes(size, 'little')
+
+
+class MemoryDatabase:
+    '''
+        An in-memory, thread-safe stand-in for an fdb Database with optimistic
+        concurrency control. Every committed key records the version it was last
+        written at; a transaction conflicts if any key in one of its read conflict
+        ranges was written after its read version. An optional latency (seconds) is
+        slept, outside of any lock, on every read round trip and commit to simulate
+        network time and let concurrent transactions interleave. Watches fire in
+        the committing thread once the commit which changed their key completes.
+    '''
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency: float = latency
+        self.version: int = 0
+        self.commits: int = 0
+        self.conflicts: int = 0
+        self._lock = threading.RLock()
+        self._data: Dict[bytes, bytes] = {}
+        self._keys: List[bytes] = []
+        self._written: Dict[bytes, int] = {}
+        self._written_keys: List[bytes] = []
+        # (begin, end, version) of committed write conflict ranges, pruned once no
+        # live transaction has an older read version
+        self._write_conflicts: List[Tuple[bytes, bytes, int]] = []
+        # Transactions which have a read version and have not committed or reset
+        self._readers: weakref.WeakSet = weakref.WeakSet()
+        # The (value when watched, future) pairs of each watched key
+        self._watches: Dict[bytes, List[Tuple[Optional[bytes], MemoryFuture]]] = {}
+        self._watches_touched: set = set()
+
+    def create_transaction(self) -> 'MemoryTransaction':
+        return MemoryTransaction(self)
+
+    def _wait(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        return self._data.get(key)
+
+    def _get_range(self, begin: bytes, end: bytes) -> List[Tuple[bytes, bytes]]:
+        with self._lock:
+            lo = bisect_left(self._keys, begin)
+            hi = bisect_left(self._keys, end)
+            return [(k, self._data[k]) for k in self._keys[lo:hi]]
+
+    def _set(self, key: bytes, value: bytes, version: int) -> None:
+        if key not in self._data:
+            insort(self._keys, key)
+        self._data[key] = value
+        self._touch(key, version)
+
+    def _clear(self, key: bytes, version: int) -> None:
+        if key in self._data:
+            del self._data[key]
+            del self._keys[bisect_left(self._keys, key)]
+            self._touch(key, version)
+
+    def _clear_range(self, begin: bytes, end: bytes, version: int) -> None:
+        # As with FoundationDB the whole range conflicts, not only the keys cleared
+        self._write_conflict(begin, end, version)
+        lo = bisect_left(self._keys, begin)
+        hi = bisect_left(self._keys, end)
+        for key in self._keys[lo:hi]:
+            del self._data[key]
+            self._touch(key, version)
+        del self._keys[lo:hi]
+
+    def _atomic(self, op: str, key: bytes, param: bytes, version: int) -> None:
+        self._set(key, apply_atomic(op, self._data.get(key), param), version)
+
+    def _versionstamped_key(self, key: bytes, value: bytes, version: int) -> None:
+        self._set(apply_versionstamp(key, versionstamp(version)), value, version)
+
+    def _versionstamped_value(self, key: bytes, value: bytes, version: int) -> None:
+        self._set(key, apply_versionstamp(value, versionstamp(version)), version)
+
+    def _write_conflict(self, begin: bytes, end: bytes, version: int) -> None:
+        self._write_conflicts.append((begin, end, version))
+
+    def _touch(self, key: bytes, version: int) -> None:
+        if key not in self._written:
+            insort(self._written_keys, key)
+        self._written[key] = version
+        if key in self._watches:
+            self._watches_touched.add(key)
+
+    def _watch(self, watches: List[Tuple[bytes, Optional[bytes], MemoryFuture]]
+               ) -> List[MemoryFuture]:
+        '''
+            Registers the (key, value when watched, future) watches of a committed
+            transaction and returns the futures of every watch whose key's value
+            now differs from the value when it was watched.
+        '''
+        for key, value, future in watches:
+            self._watches.setdefault(key, []).append((value, future))
+            self._watches_touched.add(key)
+        fired = []
+        for key in self._watches_touched:
+            current = self._data.get(key)
+            waiting = []
+            for value, future in self._watches[key]:
+                if future.is_ready():
+                    continue  # Cancelled
+                if value != current:
+                    fired.append(future)
+                else:
+                    waiting.append((value, future))
+            if waiting:
+                self._watches[key] = waiting
+            else:
+                del self._watches[key]
+        self._watches_touched.clear()
+        return fired
+
+    def _modified_since(self, begin: bytes, end: bytes, version: int) -> bool:
+        lo = bisect_left(self._written_keys, begin)
+        hi = bisect_left(self._written_keys, end)
+        for key in self._written_keys[lo:hi]:
+            if self._written[key] > version:
+                return True
+        for conflict_begin, conflict_end, written in self._write_conflicts:
+            if written > version and conflict_begin < end and begin < conflict_end:
+                return True
+        return False
+
+    def _prune_write_conflicts(self) -> None:
+        '''
+            Drops the write conflict ranges no live transaction can conflict with,
+            those committed at or before the oldest live read version.
+        '''
+        oldest = min((tr._read_version for tr in self._readers
+                      if tr._read_version is not None), default=self.version)
+        self._write_conflicts = [conflict for conflict in self._write_conflicts
+                                 if conflict[2] > oldest]
+
+    def _commit(self, tr: 'MemoryTransaction') -> int:
+        with self._lock:
+            if tr._read_version is not None:
+                for begin, end in tr._read_ranges:
+                    if self._modified_since(begin, end, tr._read_version):
+                        self.conflicts += 1
+                        raise TransactionConflict()
+            self._readers.discard(tr)
+            if self._write_conflicts:
+                self._prune_write_conflicts()
+            if tr._mutations:
+                self.version += 1
+                for mutation in tr._mutations:
+                    op, args = mutation[0], mutation[1:]
+                    getattr(self, f'_{op}')(*args, self.version)
+                self.commits += 1
+            version = self.version
+            fired = self._watch(tr._watches)
+        for future in fired:
+            future.set()
+        return version
+
+    # Autocommitting conveniences matching fdb's Database interface
+
+    def __getitem__(self, key: Any) -> Any:
+        tr = self.create_transaction()
+        return tr[key]
+
+    def __setitem__(self, key: bytes, value: bytes) -> None:
+        tr = self.create_transaction()
+        tr[key] = value
+        tr.commit().wait()
+
+    def __delitem__(self, key: Any) -> None:
+        tr = self.create_transaction()
+        del tr[key]
+        tr.commit().wait()
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        return self[key]
+
+    def get_range(self, begin: Optional[bytes], end: Optional[bytes],
+                  limit: int = 0, reverse: bool = False) -> List[KeyValue]:
+        tr = self.create_transaction()
+        return tr.get_range(begin, end, limit=limit, reverse=reverse)
+
+    def set(self, key: bytes, value: bytes) -> None:
+        self[key] = value
+
+    def clear(self, key: bytes) -> None:
+        del self[key]
+
+    def clear_range(self, begin: Optional[bytes], end: Optional[bytes]) -> None:
+        tr = self.create_transaction()
+        tr.clear_range(begin, end)
+        tr.commit().wait()
+
+
+class MemoryTransactionRead:
+    '''
+        The read interface of a MemoryTransaction. A transaction's .snapshot
+        attribute is a MemoryTransactionRead which does not add read conflict ranges.
+    '''
+
+    def __init__(self, tr: 'MemoryTransaction', snapshot: bool) -> None:
+        self._tr = tr
+        self._snapshot = snapshot
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        return self._tr._read(bytes(key), self._snapshot)
+
+    def get_range(self, begin: Optional[bytes], end: Optional[bytes],
+                  limit: int = 0, reverse: bool = False,
+                  streaming_mode: Any = None) -> List[KeyValue]:
+        begin, end = _range_args(begin, end)
+        return self._tr._read_range(begin, end, limit, reverse, self._snapshot)
+
+    def get_range_startswith(self, prefix: bytes, *args, **kwargs) -> List[KeyValue]:
+        return self.get_range(prefix, prefix + b'\xff', *args, **kwargs)
+
+    def get_read_version(self) -> MemoryFuture:
+        return MemoryFuture.resolved(self._tr._acquire_read_version())
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, slice):
+            return self.get_range(key.start, key.stop, reverse=(key.step == -1))
+        return self.get(key)
+
+
+class MemoryTransaction(MemoryTransactionRead):
+    '''
+        A transaction against a MemoryDatabase. Writes are buffered and applied at
+        commit, reads see the transaction's own writes.
+    '''
+
+    def __init__(self, db: MemoryDatabase) -> None:
+        super().__init__(self, False)
+        self.db: MemoryDatabase = db
+        self.snapshot: MemoryTransactionRead = MemoryTransactionRead(self, True)
+        self._watches: List[Tuple[bytes, Optional[bytes], MemoryFuture]] = []
+        self.reset()
+
+    def reset(self) -> None:
+        self.db._readers.discard(self)
+        self._read_version: Optional[int] = None
+        self._read_ranges: List[Tuple[bytes, bytes]] = []
+        self._mutations: List[Tuple] = []
+        self._writes: Dict[bytes, Optional[bytes]] = {}
+        self._cleared: List[Tuple[bytes, bytes]] = []
+        self._versionstamp: Optional[MemoryFuture] = None
+        # Watches of a transaction which is reset before it commits never start
+        for _, _, future in self._watches:
+            future.cancel()
+        self._watches = []
+
+    def _acquire_read_version(self) -> int:
+        if self._read_version is None:
+            with self.db._lock:
+                self._read_version = self.db.version
+                self.db._readers.add(self)
+        return self._read_version
+
+    def _local(self, key: bytes) -> Tuple[bool, Optional[bytes]]:
+        '''
+            Returns (found, value) for a key written or cleared in this transaction.
+        '''
+        if key in self._writes:
+            return True, self._writes[key]
+        for begin, end in self._cleared:
+            if begin <= key < end:
+                return True, None
+        return False, None
+
+    def _read(self, key: bytes, snapshot: bool) -> Optional[bytes]:
+        self._acquire_read_version()
+        if not snapshot:
+            self._read_ranges.append((key, key + b'\x00'))
+        found, value = self._local(key)
+        if found:
+            return value
+        self.db._wait()
+        return self.db._get(key)
+
+    def _read_range(self, begin: bytes, end: bytes, limit: int, reverse: bool,
+                    snapshot: bool) -> List[KeyValue]:
+        self._acquire_read_version()
+        self.db._wait()
+        merged: Dict[bytes, Optional[bytes]] = {}
+        for k, v in self.db._get_range(begin, end):
+            found, local = self._local(k)
+            merged[k] = local if found else v
+        for k, local in self._writes.items():
+            if begin <= k < end:
+                merged[k] = local
+        keys = sorted((k for k, v in merged.items() if v is not None),
+                      reverse=reverse)
+        if limit and limit > 0:
+            keys = keys[:limit]
+        if not snapshot:
+            if limit and len(keys) == limit:
+                # Only the part of the range actually read conflicts
+                if reverse:
+                    begin = keys[-1]
+                else:
+                    end = keys[-1] + b'\x00'
+            self._read_ranges.append((begin, end))
+        return [KeyValue(k, merged[k]) for k in keys]  # type: ignore
+
+    def set(self, key: bytes, value: bytes) -> None:
+        key, value = bytes(key), bytes(value)
+        self._mutations.append(('set', key, value))
+        self._writes[key] = value
+
+    def clear(self, key: bytes) -> None:
+        key = bytes(key)
+        self._mutations.append(('clear', key))
+        self._writes[key] = None
+
+    def clear_range(self, begin: Optional[bytes], end: Optional[bytes]) -> None:
+        begin, end = _range_args(begin, end)
+        self._mutations.append(('clear_range', begin, end))
+        for k in [k for k in self._writes if begin <= k < end]:
+            del self._writes[k]
+        self._cleared.append((begin, end))
+
+    def clear_range_startswith(self, prefix: bytes) -> None:
+        self.clear_range(prefix, prefix + b'\xff')
+
+    def add_read_conflict_range(self, begin: bytes, end: bytes) -> None:
+        '''
+            Adds a range to the read conflict ranges checked at commit, as if it had
+            been read.
+        '''
+        self._acquire_read_version()
+        self._read_ranges.append((bytes(begin), bytes(end)))
+
+    def add_read_conflict_key(self, key: bytes) -> None:
+        self.add_read_conflict_range(key, bytes(key) + b'\x00')
+
+    def add_write_conflict_range(self, begin: bytes, end: bytes) -> None:
+        '''
+            Adds a range to the write conflict ranges of the commit, as if it had been
+            written, without changing any data.
+        '''
+        self._mutations.append(('write_conflict', bytes(begin), bytes(end)))
+
+    def add_write_conflict_key(self, key: bytes) -> None:
+        self.add_write_conflict_range(key, bytes(key) + b'\x00')
+
+    def _atomic(self, op: str, key: bytes, param: bytes) -> None:
+        '''
+            Buffers an atomic mutation. It is applied to the latest committed value
+            at commit time and, as with FoundationDB, adds no read conflict.
+        '''
+        key, param = bytes(key), bytes(param)
+        self._mutations.append(('atomic', op, key, param))
+        found, current = self._local(key)
+        if not found:
+            current = self.db._get(key)
+        self._writes[key] = apply_atomic(op, current, param)
+
+    def add(self, key: bytes, param: bytes) -> None:
+        self._atomic('add', key, param)
+
+    def bit_and(self, key: bytes, param: bytes) -> None:
+        self._atomic('bit_and', key, param)
+
+    def bit_or(self, key: bytes, param: bytes) -> None:
+        self._atomic('bit_or', key, param)
+
+    def bit_xor(self, key: bytes, param: bytes) -> None:
+        self._atomic('bit_xor', key, param)
+
+    def min(self, key: bytes, param: bytes) -> None:
+        self._atomic('min', key, param)
+
+    def max(self, key: bytes, param: bytes) -> None:
+        self._atomic('max', key, param)
+
+    def byte_min(self, key: bytes, param: bytes) -> None:
+        self._atomic('byte_min', key, param)
+
+    def byte_max(self, key: bytes, param: bytes) -> None:
+        self._atomic('byte_max', key, param)
+
+    def append_if_fits(self, key: bytes, param: bytes) -> None:
+        self._atomic('append_if_fits', key, param)
+
+    def set_versionstamped_key(self, key: bytes, value: bytes) -> None:
+        '''
+            Buffers a set of a key containing an incomplete versionstamp which is
+            filled in at commit. As with FoundationDB the key is not readable in
+            this transaction and adds no read conflict.
+        '''
+        key, value = bytes(key), bytes(value)
+        apply_versionstamp(key, versionstamp(0))
+        self._mutations.append(('versionstamped_key', key, value))
+
+    def set_versionstamped_value(self, key: bytes, value: bytes) -> None:
+        key, value = bytes(key), bytes(value)
+        apply_versionstamp(value, versionstamp(0))
+        self._mutations.append(('versionstamped_value', key, value))
+
+    def watch(self, key: bytes) -> MemoryFuture:
+        '''
+            Returns a future which is set once the key's value differs from its
+            value in this transaction. As with FoundationDB the watch only starts
+            when the transaction commits and it adds no read conflict.
+        '''
+        key = bytes(key)
+        found, value = self._local(key)
+        if not found:
+            value = self.db._get(key)
+        future = MemoryFuture()
+        self._watches.append((key, value, future))
+        return future
+
+    def get_versionstamp(self) -> MemoryFuture:
+        '''
+            Returns a future resolved with the 10 byte versionstamp of the commit.
+        '''
+        if self._versionstamp is None:
+            self._versionstamp = MemoryFuture()
+        return self._versionstamp
+
+    def __setitem__(self, key: bytes, value: bytes) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        if isinstance(key, slice):
+            self.clear_range(key.start, key.stop)
+        else:
+            self.clear(key)
+
+    def commit(self) -> MemoryFuture:
+        '''
+            Commits the transaction. As with fdb, a conflict is raised when the
+            returned future is waited on.
+        '''
+        self.db._wait()
+        future = MemoryFuture()
+        try:
+            version = self.db._commit(self)
+        except TransactionConflict as e:
+            future.set(error=e)
+            if self._versionstamp is not None:
+                self._versionstamp.set(error=e)
+            for _, _, watch in self._watches:
+                watch.set(error=e)
+            return future
+        if self._versionstamp is not None:
+            self._versionstamp.set(versionstamp(version))
+        # Committed watches outlive the transaction
+        self._watches = []
+        future.set(version)
+        return future
+
+    def on_error(self, error: BaseException) -> MemoryFuture:
+        '''
+            Resets the transaction so it can be retried if the error is retryable,
+            otherwise re-raises it.
+        '''
+        if isinstance(error, TransactionConflict):
+            self.reset()
+            return MemoryFuture.resolved()
+        raise error
+
+
+def transactional(func: Callable) -> Callable:
+    '''
+        Decorator equivalent to @fdb.transactional for a MemoryDatabase. If the "tr"
+        argument (or the first argument if there is no "tr") is a MemoryDatabase a
+        transaction is created, passed in, committed and retried on conflict. If it
+        is already a transaction it is passed through and not committed.
+    '''
+    args_spec = inspect.getfullargspec(func).args
+    index = args_spec.index('tr') if 'tr' in args_spec else 0
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not isinstance(args[index], MemoryDatabase):
+            return func(*args, **kwargs)
+        largs = list(args)
+        tr = largs[index] = args[index].create_transaction()
+        while True:
+            try:
+                ret = func(*largs, **kwargs)
+                tr.commit().wait()
+                return ret
+            except TransactionConflict as e:
+                tr.on_error(e).wait()
+
+    return wrapper
@@ -0,0 +1,257 @@
+'''
+    Time series storage. A TimeSeriesStructure groups the samples of each series
+    into fixed time buckets, such as an hour or a day, and stores every sample in a
+    bucket as a fixed size little-endian record in a single value. This stores many
+    samples per key and reads a whole bucket with one key read.
+'''
+
+
+from typing import Any, Dict, Iterable, List, Tuple, Union
+from array import array
+from calendar import timegm
+from datetime import datetime
+from struct import Struct, error as StructError
+import sys
+from .errors import StructureError, ValidationError
+from .fields.integer import IntegerField
+from .readcache import read_cache
+from .structure import Structure, _present, _reader
+
+
+# FoundationDB's maximum value size
+VALUE_SIZE_LIMIT: int = 100000
+
+BUCKET_SECONDS: Dict[str, int] = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+# Each record is a millisecond delta from the start of its bucket and a value of
+# the same width, so the deltas and values are every other item of one array
+DTYPES: Dict[str, Tuple[str, str, str]] = {
+    # dtype: (record struct format, delta array typecode, value array typecode)
+    'i4': ('<ii', 'i', 'i'),
+    'f4': ('<if', 'i', 'f'),
+    'i8': ('<qq', 'q', 'q'),
+    'f8': ('<qd', 'q', 'd'),
+}
+
+Timestamp = Union[int, float, datetime]
+
+
+def to_milliseconds(ts: Timestamp) -> int:
+    '''
+        Converts a UNIX timestamp in seconds or a datetime, naive datetimes are
+        assumed to be UTC, to integer milliseconds.
+    '''
+    if isinstance(ts, datetime):
+        return timegm(ts.utctimetuple()) * 1000 + ts.microsecond // 1000
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        return int(ts * 1000)
+    raise ValidationError(f'timestamp must be an int, float or datetime, '
+                          f'got: {type(ts)}')
+
+
+class TimeSeriesStructure(Structure):
+    '''
+        A Structure storing samples of numeric series. key defines the fields which
+        identify a series, the start of each bucket in UNIX seconds is added as a
+        final "bucket" key field. Set bucket_size to "minute", "hour", "day" or a
+        number of seconds and dtype to the sample type, one of "i4", "f4", "i8" or
+        "f8".
+
+        Set sample_interval to the minimum number of seconds between the samples of
+        a series if there is one. When a bucket can then never exceed FoundationDB's
+        value size limit samples are appended with atomic append_if_fits mutations
+        which never conflict, otherwise appends read the bucket to check it has room.
+        append_if_fits silently drops an append which does not fit, so samples
+        breaking the sample_interval promise can be lost.
+
+        Appends bump watch_version and are logged to the change log as
+        "append_samples" changes, with the appended samples if changelog_values is
+        set. Views are not supported as samples are not value fields.
+    '''
+
+    bucket_size: Union[str, int] = 'hour'
+    dtype: str = 'f8'
+    sample_interval: Union[None, int, float] = None
+
+    def __init__(self, subspace: Any = None, views_subspace: Any = None,
+                 changelog_subspace: Any = None) -> None:
+        self.series_key: Tuple = self.key
+        self.key = self.key + (IntegerField(name='bucket'),)
+        super().__init__(subspace, views_subspace, changelog_subspace)
+        self.bucket_ms: int = self.bucket_seconds * 1000
+        record_format, self.delta_typecode, self.value_typecode = DTYPES[self.dtype]
+        self.record: Struct = Struct(record_format)
+        self.max_samples: int = VALUE_SIZE_LIMIT // self.record.size
+        self.atomic_appends: bool = (
+            self.sample_interval is not None and
+            self.bucket_seconds / self.sample_interval <= self.max_samples
+        )
+
+    @property
+    def bucket_seconds(self) -> int:
+        if isinstance(self.bucket_size, str):
+            return BUCKET_SECONDS[self.bucket_size]
+        return self.bucket_size
+
+    def validate(self) -> bool:
+        me = self.__class__.__name__
+        if not isinstance(self.key, tuple) or len(self.key) < 2:
+            raise StructureError(f'{me}.key must define at least one series field')
+        super().validate()
+        if self.value:
+            raise StructureError(f'{me}.value must be empty, samples are stored as '
+                                 f'dtype')
+        if self.views:
+            raise StructureError(f'{me}.views are not supported, samples are not '
+                                 f'value fields')
+        if isinstance(self.bucket_size, str):
+            if self.bucket_size not in BUCKET_SECONDS:
+                raise StructureError(f'{me}.bucket_size must be one of '
+                                     f'{tuple(BUCKET_SECONDS)} or seconds')
+        elif (not isinstance(self.bucket_size, int) or
+                isinstance(self.bucket_size, bool) or
+                not 0 < self.bucket_size <= 86400 * 24):
+            raise StructureError(f'{me}.bucket_size must be a number of seconds '
+                                 f'between 1 and {86400 * 24}')
+        if self.dtype not in DTYPES:
+            raise StructureError(f'{me}.dtype must be one of {tuple(DTYPES)}')
+        if self.sample_interval is not None and (
+                not isinstance(self.sample_interval, (int, float)) or
+                self.sample_interval <= 0):
+            raise StructureError(f'{me}.sample_interval must be a number of seconds '
+                                 f'greater than 0')
+        return True
+
+    def bucket_start(self, ts: Timestamp) -> int:
+        '''
+            Returns the start of the bucket holding ts in UNIX seconds.
+        '''
+        return to_milliseconds(ts) // self.bucket_ms * self.bucket_seconds
+
+    def pack_samples(self, bucket_start: int,
+                     samples: Iterable[Tuple[Timestamp, Any]]) -> bytes:
+        '''
+            Packs samples, which must all be in the bucket starting at bucket_start,
+            into records.
+        '''
+        start_ms = bucket_start * 1000
+        records: List[bytes] = []
+        integer = self.dtype[0] == 'i'
+        for ts, v in samples:
+            delta = to_milliseconds(ts) - start_ms
+            if not 0 <= delta < self.bucket_ms:
+                raise ValidationError(f'timestamp {ts} is not in the bucket starting '
+                                      f'at {bucket_start}')
+            types = int if integer else (int, float)
+            if isinstance(v, bool) or not isinstance(v, types):
+                raise ValidationError(f'sample value must be an '
+                                      f'{"int" if integer else "int or float"}, '
+                                      f'got: {type(v)}')
+            try:
+                records.append(self.record.pack(delta, v))
+            except (StructError, OverflowError):
+                raise ValidationError(f'sample value {v} is out of range for '
+                                      f'dtype {self.dtype}')
+        return b''.join(records)
+
+    def unpack_samples(self, bucket_start: int, data: bytes) -> Tuple[array, array]:
+        '''
+            Unpacks a bucket's records into an array of timestamps in UNIX
+            milliseconds and an array of values. The values are sliced straight out
+            of the records without creating a Python object per sample.
+        '''
+        if len(data) % self.record.size:
+            raise ValidationError(f'bucket data of {len(data)} bytes is not a whole '
+                                  f'number of {self.record.size} byte samples')
+        items = array(self.delta_typecode, data)
+        values = array(self.value_typecode, data)
+        if sys.byteorder == 'big':
+            items.byteswap()
+            values.byteswap()
+        start_ms = bucket_start * 1000
+        return array('q', map(start_ms.__add__, items[0::2])), values[1::2]
+
+    def append_samples(self, tr: Any, series: Tuple,
+                       samples: Iterable[Tuple[Timestamp, Any]]) -> None:
+        '''
+            Appends (timestamp, value) samples to a series, with one write per
+            bucket. A ValidationError is raised if the samples do not fit in their
+            bucket. Appends are atomic if atomic_appends is set, and the bucket's
+            size is checked with a snapshot read so they never conflict. An atomic
+            append which no longer fits when it commits, after concurrent appends
+            which break the sample_interval promise or a retry of a commit which
+            had in fact succeeded, is dropped by append_if_fits without an error.
+            Otherwise the bucket is read and set.
+        '''
+        if not isinstance(series, tuple) or len(series) != len(self.series_key):
+            raise ValidationError(f'series must be a tuple of '
+                                  f'{len(self.series_key)} values')
+        buckets: Dict[int, List[Tuple[Timestamp, Any]]] = {}
+        for ts, v in samples:
+            buckets.setdefault(self.bucket_start(ts), []).append((ts, v))
+        cache = read_cache(tr)
+        for bucket_start, bucket_samples in buckets.items():
+            key_tuple = series + (bucket_start,)
+            key = self.pack_key(key_tuple)
+            data = self.pack_samples(bucket_start, bucket_samples)
+            # Atomic appends check the bucket with a snapshot read, which adds no
+            # read conflict, as append_if_fits drops a write which does not fit
+            current = _present(_reader(tr, self.atomic_appends).get(key)) or b''
+            if len(current) + len(data) > VALUE_SIZE_LIMIT:
+                raise ValidationError(f'bucket {bucket_start} of series {series} '
+                                      f'is full, it holds at most '
+                                      f'{self.max_samples} samples')
+            if self.atomic_appends:
+                tr.append_if_fits(key, data)
+            else:
+                tr.set(key, current + data)
+            self._bump_version(tr)
+            self._log_change(tr, 'append_samples', key_tuple, data)
+            if cache is not None:
+                cache.discard(key)
+
+    def append_sample(self, tr: Any, series: Tuple, ts: Timestamp, v: Any) -> None:
+        self.append_samples(tr, series, ((ts, v),))
+
+    def _change_value(self, op: str, key_tuple: Tuple, value: Any) -> Any:
+        if op == 'append_samples':
+            return self.unpack_samples(key_tuple[-1], value)
+        return super()._change_value(op, key_tuple, value)
+
+    def query(self, tr: Any, series: Tuple, start: Timestamp, end: Timestamp,
+              snapshot: bool = False) -> Tuple[array, array]:
+        '''
+            Returns the samples of a series from start, inclusive, to end, exclusive,
+            as an array of timestamps in UNIX milliseconds and an array of values.
+            Only the buckets covering the time range are read, samples are in bucket
+            order then in the order they were appended. Snapshot reads add no read
+            conflict ranges.
+        '''
+        if not isinstance(series, tuple) or len(series) != len(self.series_key):
+            raise ValidationError(f'series must be a tuple of '
+                                  f'{len(self.series_key)} values')
+        start_ms, end_ms = to_milliseconds(start), to_milliseconds(end)
+        timestamps = array('q')
+        values = array(self.value_typecode)
+        if end_ms <= start_ms:
+            return timestamps, values
+        first = self.bucket_start(start)
+        last = (end_ms - 1) // self.bucket_ms * self.bucket_seconds
+        begin = self.pack_key(series + (first,))
+        stop = self.pack_key(series + (last + self.bucket_seconds,))
+        for kv in _reader(tr, snapshot).get_range(begin, stop):
+            bucket_start = self.unpack_key(kv.key)[-1]
+            ts, vs = self.unpack_samples(bucket_start, bytes(kv.value))
+            bucket_start_ms = bucket_start * 1000
+            if bucket_start_ms < start_ms or bucket_start_ms + self.bucket_ms > end_ms:
+                # Partly covered buckets are filtered sample by sample
+                keep = [i for i, t in enumerate(ts) if start_ms <= t < end_ms]
+                ts = array('q', (ts[i] for i in keep))
+                vs = array(self.value_typecode, (vs[i] for i in keep))
+            timestamps.extend(ts)
+            values.extend(vs)
+        return timestamps, values
@@ -0,0 +1,73 @@
+'''
+    Materialised aggregate views. A View declared on a Structure keeps a running
+    count of keys, or sum of an integer value field, for every distinct value of the
+    first group_by key fields. Views are stored as 64 bit little-endian integers
+    updated with atomic add mutations by the Structure's write helpers, so reading
+    a view is a single key read however many keys it covers.
+'''
+
+
+from typing import Any, Optional, Tuple, Union
+from struct import Struct
+from .errors import StructureError
+from .fields.base import BaseField
+
+
+VIEW_OPS: Tuple[str, ...] = ('count', 'sum')
+
+# Views are stored in the format of FoundationDB's atomic add
+VIEW_VALUE: Struct = Struct('<q')
+
+
+class View:
+    '''
+        View(name='classes', group_by=1) counts the keys sharing each value of the
+        first key field. View(name='seats', group_by=1, op='sum', field='seats')
+        sums an integer value field instead, None values count as 0. group_by=0
+        keeps a single total for the whole Structure.
+    '''
+
+    def __init__(self, name: str = '', group_by: int = 0, op: str = 'count',
+                 field: Union[None, str, int] = None) -> None:
+        if not isinstance(name, str) or not name:
+            raise StructureError('views must have a name')
+        if not isinstance(group_by, int) or isinstance(group_by, bool) or \
+                group_by < 0:
+            raise StructureError(f'view {name} group_by must be an int of 0 or more')
+        if op not in VIEW_OPS:
+            raise StructureError(f'view {name} op must be one of {VIEW_OPS}')
+        if (op == 'sum') != (field is not None):
+            raise StructureError(f'view {name} must set a field to sum, and only '
+                                 f'when op is "sum"')
+        self.name: str = name
+        self.group_by: int = group_by
+        self.op: str = op
+        self.field: Union[None, str, int] = field
+
+    def field_index(self, value: Tuple[BaseField, ...],
+                    structure: str) -> Optional[int]:
+        '''
+            Returns the index of the summed value field, or None for a count.
+        '''
+        if self.field is None:
+            return None
+        for i, field in enumerate(value):
+            if self.field == i or (field.name and self.field == field.name):
+                if field.data_type is not int:
+                    raise StructureError(f'{structure} view {self.name} can only sum '
+                                         f'an integer value field')
+                return i
+        raise StructureError(f'{structure} view {self.name} has an unknown value '
+                             f'field: {self.field}')
+
+    def contribution(self, index: Optional[int], value_tuple: Optional[Tuple]) -> int:
+        '''
+            Returns how much a key with value_tuple, or no key if None, adds to the
+            view.
+        '''
+        if value_tuple is None:
+            return 0
+        if index is None:
+            return 1
+        v: Any = value_tuple[index]
+        return v or 0
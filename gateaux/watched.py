@@ -0,0 +1,206 @@
+'''
+    Process-wide caches of Structure values invalidated by FoundationDB watches.
+    Values are read without a transaction once cached. Each cached key is watched,
+    or with a structure's watch_version only its version key is watched, and
+    entries are dropped as soon as FoundationDB reports a change.
+'''
+
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import threading
+import time
+from .errors import StructureError
+from .cache import LRUCache
+from .structure import Structure, _present
+
+
+# What is watched to invalidate cached values
+WATCH_KEYS: str = 'key'
+WATCH_VERSION: str = 'version'
+INVALIDATIONS: Tuple[str, ...] = (WATCH_KEYS, WATCH_VERSION)
+
+
+class WatchedCache:
+    '''
+        A bounded, thread-safe cache of the values of a Structure's keys, shared by
+        every thread in a process. get() returns a cached value without a
+        transaction or reads it from db and caches it. Entries are evicted when
+        the cache is full or ttl seconds after they were read, if ttl is set, and
+        invalidated when FoundationDB's watches fire. With invalidate "key" every
+        cached key is watched, costing a watch per key, and only changed keys are
+        invalidated. With invalidate "version" a single watch on the structure's
+        version key clears the whole cache on any write through the structure,
+        which requires watch_version. Writes made directly to the database are
+        only noticed with invalidate "key".
+    '''
+
+    def __init__(self, structure: Structure, db: Any, maxsize: int = 10000,
+                 ttl: Optional[float] = 60.0, invalidate: str = WATCH_KEYS,
+                 timer: Callable[[], float] = time.monotonic) -> None:
+        if invalidate not in INVALIDATIONS:
+            raise ValueError(f'invalidate must be one of {INVALIDATIONS}, '
+                             f'got: {invalidate}')
+        name = structure.__class__.__name__
+        if invalidate == WATCH_VERSION and not structure.watch_version:
+            raise StructureError(f'{name} requires watch_version for a WatchedCache '
+                                 f'invalidated by version')
+        if not structure.shareable_values:
+            raise StructureError(f'{name} values can be modified and cannot be '
+                                 f'shared by a WatchedCache')
+        self.structure = structure
+        self.db = db
+        self.invalidate_by = invalidate
+        # Each entry is the (value tuple, watch futures) of a packed key, the value
+        # is None for keys which are not set
+        self.entries = LRUCache(maxsize, ttl=ttl, on_evict=self._evicted, timer=timer)
+        self.invalidations: int = 0
+        # Re-entrant as cancelling an evicted entry's watch calls back into the cache
+        self._lock = threading.RLock()
+        # Incremented whenever the whole cache is invalidated, so reads which
+        # started before then are not cached
+        self._generation: int = 0
+        self._version_watch: Any = None
+        self._version: Optional[bytes] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key_tuple: Tuple, fields: Optional[Tuple] = None) -> Optional[Tuple]:
+        '''
+            Returns the value of a complete key, None if it is not set, from the
+            cache or read from the database. fields selects value fields as for
+            Structure.get().
+        '''
+        self.structure._check_complete_key('get', key_tuple)
+        key = self.structure.pack_key(key_tuple)
+        entry = self.entries.get(key)
+        if entry is not None:
+            return self.structure._select(entry[0], fields)
+        return self.structure._select(self._load(key_tuple, key), fields)
+
+    def _load(self, key_tuple: Tuple, key: bytes) -> Optional[Tuple]:
+        '''
+            Reads a key and the watches which invalidate it in one transaction,
+            then caches the value unless it may already have changed.
+        '''
+        with self._lock:
+            generation = self._generation
+            arm = self.invalidate_by == WATCH_VERSION and self._version_watch is None
+        tr = self.db.create_transaction()
+        while True:
+            try:
+                version = None
+                if self.invalidate_by == WATCH_VERSION:
+                    version = _present(tr.get(self.structure.version_key))
+                    watches = [tr.watch(self.structure.version_key)] if arm else []
+                else:
+                    watches = [tr.watch(k)
+                               for k in self.structure._watch_keys(key_tuple)]
+                value = self.structure.get(tr, key_tuple)
+                tr.commit().wait()
+                break
+            except Exception as e:
+                if not hasattr(e, 'code'):
+                    raise
+                tr.on_error(e).wait()
+        if self.invalidate_by == WATCH_VERSION:
+            self._cache_versioned(key, value, version, generation, watches)
+        else:
+            self._cache_watched(key, value, generation, watches)
+        return value
+
+    def _cache_versioned(self, key: bytes, value: Optional[Tuple],
+                         version: Optional[bytes], generation: int,
+                         watches: List) -> None:
+        cancel = []
+        with self._lock:
+            armed = None
+            if watches and self._version_watch is None:
+                armed = self._version_watch = watches[0]
+                self._version = version
+            else:
+                cancel = watches
+            if generation == self._generation and version == self._version:
+                self.entries.put(key, (value, ()))
+        self._cancel(cancel)
+        if armed is not None:
+            armed.on_ready(self._version_changed)
+
+    def _cache_watched(self, key: bytes, value: Optional[Tuple], generation: int,
+                       watches: List) -> None:
+        with self._lock:
+            cached = generation == self._generation
+            if cached:
+                replaced = self.entries.pop(key)
+                self.entries.put(key, (value, watches))
+        if not cached:
+            self._cancel(watches)
+            return
+        if replaced is not None:
+            self._cancel(replaced[1])
+        # A watch which has already fired invalidates the entry at once
+        for watch in watches:
+            watch.on_ready(lambda future, key=key: self._key_changed(key, future))
+
+    def _version_changed(self, future: Any) -> None:
+        with self._lock:
+            if future is not self._version_watch:
+                return
+            self._version_watch = None
+            self._version = None
+            self._generation += 1
+            self.invalidations += 1
+            self.entries.clear()
+
+    def _key_changed(self, key: bytes, future: Any) -> None:
+        with self._lock:
+            entry = self.entries.peek(key)
+            if entry is None or not any(watch is future for watch in entry[1]):
+                return
+            self.entries.discard(key)
+            self.invalidations += 1
+        self._cancel(entry[1])
+
+    def _evicted(self, key: Any, entry: Tuple) -> None:
+        self._cancel(entry[1])
+
+    def _cancel(self, watches: Any) -> None:
+        for watch in watches:
+            if not watch.is_ready():
+                watch.cancel()
+
+    def invalidate(self, key_tuple: Optional[Tuple] = None) -> None:
+        '''
+            Drops the cached value of a complete key, or every cached value.
+        '''
+        if key_tuple is not None:
+            self.structure._check_complete_key('invalidate', key_tuple)
+            entry = self.entries.pop(self.structure.pack_key(key_tuple))
+            if entry is not None:
+                self._cancel(entry[1])
+            return
+        with self._lock:
+            self._generation += 1
+            entries = [self.entries.pop(key) for key in self.entries.keys()]
+        for entry in entries:
+            if entry is not None:
+                self._cancel(entry[1])
+
+    def close(self) -> None:
+        '''
+            Drops every cached value and cancels every watch.
+        '''
+        self.invalidate()
+        with self._lock:
+            watch, self._version_watch = self._version_watch, None
+        if watch is not None:
+            self._cancel((watch,))
+
+    def stats(self) -> Dict[str, Any]:
+        '''
+            Returns the size, hits, misses, evictions and hit rate of the cache and
+            the number of invalidations by watches.
+        '''
+        stats = self.entries.stats()
+        stats['invalidations'] = self.invalidations
+        return stats
@@ -0,0 +1,116 @@
+import unittest
+from typing import Any, Dict, Tuple
+import gateaux
+from gateaux.testing import MemoryDatabase
+from test_structure import MockFoundationSubspace
+
+
+class DegreeStructure(gateaux.Structure):
+    key: Tuple[gateaux.BaseField, ...] = (
+        gateaux.IntegerField(name='year'),
+        gateaux.IntegerField(name='day'),
+        gateaux.StringField(name='city'),
+    )
+    value = (
+        gateaux.StringField(name='note'),
+        gateaux.FloatField(name='celsius'),
+        gateaux.IntegerField(name='rain'),
+    )
+
+
+class BucketedDegreeStructure(DegreeStructure):
+    key = (
+        gateaux.HashPrefix(gateaux.IntegerField(name='year'), buckets=4,
+                           hash_field=1),
+        gateaux.IntegerField(name='day'),
+        gateaux.StringField(name='city'),
+    )
+
+
+class CounterStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='page'), gateaux.StringField(name='day'))
+    value = (gateaux.CounterField(name='views'),)
+    shards = 4
+
+
+METRICS = {
+    'days': 'count',
+    'readings': ('count', 'celsius'),
+    'avg': ('avg', 'celsius'),
+    'low': ('min', 'celsius'),
+    'high': ('max', 'celsius'),
+    'rain': ('sum', 'rain'),
+    'first': ('min', 'note'),
+}
+
+
+def load(structure: gateaux.Structure, tr: gateaux.testing.MemoryTransaction) -> None:
+    for year in (2019, 2020):
+        for day in range(1, 6):
+            for city in ('leeds', 'york'):
+                celsius = float(day + year - 2019)
+                structure.set(tr, (year, day, city), (f'{city}{day}', celsius, day))
+
+
+class AggregateTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = MemoryDatabase()
+        self.tr = self.db.create_transaction()
+
+    def check_degrees(self, degrees: gateaux.Structure) -> None:
+        load(degrees, self.tr)
+        years = list(degrees.aggregate(self.tr, group_by=1, metrics=METRICS,
+                                       batch_size=3))
+        self.assertEqual(years, [
+            ((2019,), {'days': 10, 'readings': 10, 'avg': 3.0, 'low': 1.0,
+                       'high': 5.0, 'rain': 30, 'first': 'leeds1'}),
+            ((2020,), {'days': 10, 'readings': 10, 'avg': 4.0, 'low': 2.0,
+                       'high': 6.0, 'rain': 30, 'first': 'leeds1'}),
+        ])
+        days = list(degrees.aggregate(self.tr, (2020,), group_by=2, limit=2))
+        self.assertEqual(days, [((2020, 1), {'count': 2}), ((2020, 2), {'count': 2})])
+        total = list(degrees.aggregate(self.tr, metrics={'rain': ('sum', 2)}))
+        self.assertEqual(total, [((), {'rain': 60})])
+        empty = list(degrees.aggregate(self.tr, (2021,), metrics=METRICS))
+        self.assertEqual(empty, [((), {'days': 0, 'readings': 0, 'avg': None,
+                                       'low': None, 'high': None, 'rain': 0,
+                                       'first': None})])
+        self.assertEqual(list(degrees.aggregate(self.tr, (2021,), group_by=2)), [])
+        self.assertEqual(degrees.count(self.tr), 20)
+        self.assertEqual(degrees.count(self.tr, (2019,), limit=5), 5)
+        self.assertTrue(degrees.exists(self.tr, (2020, 3)))
+        self.assertFalse(degrees.exists(self.tr, (2020, 9)))
+
+    def test_aggregate(self) -> None:
+        self.check_degrees(DegreeStructure(MockFoundationSubspace()))
+
+    def test_hash_prefix(self) -> None:
+        self.check_degrees(BucketedDegreeStructure(MockFoundationSubspace()))
+
+    def test_sharded(self) -> None:
+        views = CounterStructure(MockFoundationSubspace())
+        for page, day, n in (('a', 'mon', 3), ('a', 'tue', 4), ('b', 'mon', 5)):
+            for _ in range(n):
+                views.add(self.tr, (page, day), 1)
+        self.assertEqual(list(views.aggregate(self.tr, group_by=1, metrics={
+            'days': 'count', 'views': ('sum', 'views')})),
+            [(('a',), {'days': 2, 'views': 7}), (('b',), {'days': 1, 'views': 5})])
+        self.assertEqual(views.count(self.tr, ('a',)), 2)
+
+    def test_validation(self) -> None:
+        degrees = DegreeStructure(MockFoundationSubspace())
+        invalid: Tuple[Dict[str, Any], ...] = (
+            {'metrics': {}},
+            {'metrics': {'x': ('sum', 'note')}},
+            {'metrics': {'x': ('median', 'rain')}},
+            {'metrics': {'x': ('sum', 'nope')}},
+            {'metrics': {'x': 'total'}},
+            {'group_by': 4},
+            {'batch_size': 0},
+            {'limit': -1},
+        )
+        for kwargs in invalid:
+            with self.assertRaises(gateaux.errors.ValidationError):
+                list(degrees.aggregate(self.tr, **kwargs)) # type: ignore
+
@@ -0,0 +1,156 @@
+from typing import Callable, Dict, List, Optional
+import unittest
+import warnings
+from fdb.subspace_impl import Subspace
+import gateaux
+from gateaux.budget import Budget, TransactionTracker, UNKNOWN
+from gateaux.testing import MemoryDatabase
+
+
+class Availability(gateaux.Structure):
+    key = (gateaux.StringField(name='class'),)
+    value = (gateaux.IntegerField(name='seats'),)
+
+
+class Attending(gateaux.Structure):
+    key = (gateaux.StringField(name='student'), gateaux.StringField(name='class'))
+    value = ()
+
+
+class BudgetTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = MemoryDatabase()
+        self.availability = Availability(Subspace(('availability',)))
+        self.attending = Attending(Subspace(('attending',)))
+
+    def test_report(self) -> None:
+        reports: List[Dict] = []
+        tracker = TransactionTracker([self.availability, self.attending],
+                                     on_report=reports.append)
+        tr = tracker.track(self.db.create_transaction())
+        key = self.availability.pack_key(('chem',))
+        value = self.availability.pack_value((100,))
+        tr[key] = value
+        self.assertEqual(tr[key], value)
+        attending_key = self.attending.pack_key(('s1', 'chem'))
+        tr[attending_key] = b''
+        begin = self.attending.pack_key(('s1',))
+        self.assertEqual(len(tr[begin + b'\x00':begin + b'\xff']), 1)
+        tr.snapshot[b'elsewhere']
+        del tr[b'elsewhere']
+        report = tr.report()
+        self.assertEqual(report['mutations'], 3)
+        self.assertEqual(report['structures']['Availability'],
+                         {'mutations': 1, 'bytes_written': len(key) + len(value),
+                          'reads': 1, 'bytes_read': len(value)})
+        self.assertEqual(report['structures']['Attending']['reads'], 1)
+        self.assertEqual(report['structures']['Attending']['bytes_read'],
+                         len(attending_key))
+        self.assertEqual(report['structures'][UNKNOWN]['reads'], 1)
+        self.assertEqual(len(report['read_ranges']), 2)
+        self.assertEqual(report['write_ranges'][0], (key, key + b'\x00'))
+        self.assertGreater(report['estimated_size'], 0)
+        self.assertEqual(reports, [])
+        tr.commit().wait()
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(tracker.transactions, 1)
+        self.assertEqual(tracker.totals['Availability']['mutations'], 1)
+
+    def test_future_reads(self) -> None:
+        class Future:
+            def __init__(self, value: Optional[bytes]) -> None:
+                self.value = value
+                self.callbacks: List[Callable] = []
+
+            def on_ready(self, callback: Callable) -> None:
+                self.callbacks.append(callback)
+
+            def present(self) -> bool:
+                return self.value is not None
+
+            def wait(self) -> Optional[bytes]:
+                return self.value
+
+        class FutureTransaction:
+            def __init__(self) -> None:
+                self.futures: List[Future] = []
+                self.snapshot = self
+
+            def get(self, key: bytes) -> Future:
+                future = Future(b'12345' if b'chem' in key else None)
+                self.futures.append(future)
+                return future
+
+        tracker = TransactionTracker([self.availability])
+        inner = FutureTransaction()
+        tr = tracker.track(inner)
+        tr.get(self.availability.pack_key(('chem',)))
+        tr.get(self.availability.pack_key(('bio',)))
+        stats = tr.report()['structures']['Availability']
+        self.assertEqual((stats['reads'], stats.get('bytes_read', 0)), (2, 0))
+        for future in inner.futures:
+            for callback in future.callbacks:
+                callback(future)
+        self.assertEqual(tr.report()['structures']['Availability']['bytes_read'], 5)
+
+    def test_context_manager(self) -> None:
+        tracker = TransactionTracker([self.availability])
+        key = self.availability.pack_key(('chem',))
+        with tracker.track(self.db.create_transaction()) as tr:
+            tr[key] = self.availability.pack_value((1,))
+        with self.assertRaises(RuntimeError):
+            with tracker.track(self.db.create_transaction()) as tr:
+                tr[key] = self.availability.pack_value((1,))
+                raise RuntimeError()
+        self.assertEqual(tracker.transactions, 1)
+        self.assertEqual(tracker.totals['Availability']['mutations'], 1)
+
+    def test_budget(self) -> None:
+        tracker = TransactionTracker(budget=Budget(max_bytes=100, max_mutations=2))
+        tr = tracker.track(self.db.create_transaction())
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            # Each write is 10 + 1 bytes plus a 10 + 11 byte write conflict range
+            tr[b'a' * 10] = b'1'
+            self.assertEqual(caught, [])
+            # Near the mutations budget
+            tr[b'b' * 10] = b'1'
+            self.assertEqual(len(caught), 1)
+            # Near the bytes budget and over the mutations budget
+            tr[b'c' * 10] = b'1'
+            self.assertEqual(len(caught), 3)
+            # Over the bytes budget
+            tr[b'd' * 10] = b'1'
+            self.assertEqual(len(caught), 4)
+            tr[b'e' * 10] = b'1'
+            self.assertEqual(len(caught), 4)
+            self.assertTrue(all(issubclass(w.category, gateaux.errors.BudgetWarning)
+                                for w in caught))
+        strict = TransactionTracker(budget=Budget(max_mutations=1, strict=True))
+        tr = strict.track(self.db.create_transaction())
+        with self.assertWarns(gateaux.errors.BudgetWarning):
+            tr[b'a'] = b'1'
+        with self.assertRaises(gateaux.errors.BudgetExceededError):
+            tr[b'b'] = b'1'
+        with self.assertRaises(ValueError):
+            Budget(warn_ratio=0)
+
+    def test_hot_prefixes(self) -> None:
+        tracker = TransactionTracker([self.attending], prefix_depth=1)
+        for student, count in (('s1', 3), ('s2', 1)):
+            for i in range(count):
+                with tracker.track(self.db.create_transaction()) as tr:
+                    tr[self.attending.pack_key((student, f'c{i}'))] = b''
+        with tracker.track(self.db.create_transaction()) as tr:
+            tr[self.attending.pack_key(('s2', 'c0'))]
+        self.assertEqual(tracker.hot_prefixes(kind='writes'),
+                         [('Attending', ('s1',), 3), ('Attending', ('s2',), 1)])
+        self.assertEqual(tracker.hot_prefixes(1, kind='reads'),
+                         [('Attending', ('s2',), 1)])
+        self.assertEqual(tracker.hot_prefixes(kind='all')[1],
+                         ('Attending', ('s2',), 2))
+        with self.assertRaises(ValueError):
+            tracker.hot_prefixes(kind='unknown')
+        tracker.reset()
+        self.assertEqual(tracker.hot_prefixes(), [])
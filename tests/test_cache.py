@@ -0,0 +1,166 @@
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+import gateaux
+from gateaux.cache import LRUCache
+from test_structure import MockFoundationSubspace
+
+
+class CachedStructure(gateaux.Structure):
+    cache_size = 2
+    key = (gateaux.IntegerField(), gateaux.FloatField(null=True))
+    value = (gateaux.StringField(),)
+
+
+class CachedEventStructure(gateaux.Structure):
+    cache_size = 4
+    key = (gateaux.DateTimeField(),)
+
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_constructor(self) -> None:
+        with self.assertRaises(ValueError):
+            LRUCache(0)
+        with self.assertRaises(ValueError):
+            LRUCache(1, eviction='random')
+
+    def test_lru(self) -> None:
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        # b was least recently used
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats(), {'size': 2, 'maxsize': 2, 'hits': 3,
+                                         'misses': 1, 'evictions': 1,
+                                         'hit_rate': 0.75})
+        # Peeking does not count a lookup or make an entry recently used
+        self.assertEqual(cache.peek('c'), 3)
+        self.assertEqual(cache.peek('b', 0), 0)
+        self.assertEqual(cache.stats()['hits'], 3)
+        cache.discard('a')
+        self.assertEqual(len(cache), 1)
+        cache.put('ab', 4)
+        self.assertEqual(cache.discard_matching(lambda key: str(key).startswith('a')), 1)
+        self.assertEqual(cache.get('c'), 3)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_ttl(self) -> None:
+        now = [0.0]
+        evicted: list = []
+        cache = LRUCache(2, ttl=10, timer=lambda: now[0],
+                         on_evict=lambda key, v: evicted.append((key, v)))
+        cache.put('a', 1)
+        now[0] = 5.0
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 10.0
+        self.assertEqual(cache.peek('a'), None)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(evicted, [('a', 1)])
+        cache.put('c', 3)
+        cache.put('d', 4)
+        self.assertEqual(evicted, [('a', 1), ('b', 2)])
+        self.assertEqual(cache.stats()['evictions'], 2)
+        self.assertEqual(cache.pop('c'), 3)
+        self.assertEqual(cache.keys(), ['d'])
+        with self.assertRaises(ValueError):
+            LRUCache(1, ttl=0)
+
+    def test_fifo(self) -> None:
+        cache = LRUCache(2, eviction='fifo')
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        # a was added first even though it was used most recently
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get('b'), 2)
+
+    def test_threads(self) -> None:
+        cache = LRUCache(10)
+        def worker(n: int) -> None:
+            for i in range(1000):
+                cache.put((n, i % 20), i)
+                cache.get((n, (i + 1) % 20))
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.stats()
+        self.assertEqual(stats['size'], 10)
+        self.assertEqual(stats['hits'] + stats['misses'], 4000)
+
+
+class StructureCacheTestCase(unittest.TestCase):
+
+    def test_validation(self) -> None:
+        mock_ss = MockFoundationSubspace()
+        class InvalidSizeStructure(gateaux.Structure):
+            cache_size = -1
+            key = (gateaux.IntegerField(),)
+        with self.assertRaises(gateaux.errors.StructureError):
+            InvalidSizeStructure(mock_ss)
+        class InvalidEvictionStructure(gateaux.Structure):
+            cache_size = 1
+            cache_eviction = 'random'
+            key = (gateaux.IntegerField(),)
+        with self.assertRaises(gateaux.errors.StructureError):
+            InvalidEvictionStructure(mock_ss)
+        class UncachedStructure(gateaux.Structure):
+            key = (gateaux.IntegerField(),)
+        uncached = UncachedStructure(mock_ss)
+        self.assertIsNone(uncached.key_cache)
+        self.assertEqual(uncached.cache_stats(), {})
+
+    def test_key_cache(self) -> None:
+        test = CachedStructure(MockFoundationSubspace())
+        packed = test.pack_key((1, 1.0))
+        self.assertEqual(test.pack_key((1, 1.0)), packed)
+        self.assertEqual(test.cache_stats()['key']['hits'], 1)
+        # Equal values of other types are not served from the cache, True is
+        # accepted by an IntegerField but packs differently to 1
+        self.assertNotEqual(test.pack_key((True, 1.0)), packed)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            test.pack_key((1, 1))
+        # 0.0 and -0.0 are equal but pack differently
+        self.assertNotEqual(test.pack_key((1, 0.0)), test.pack_key((1, -0.0)))
+        self.assertEqual(test.unpack_key(test.pack_key((1, -0.0))), (1, -0.0))
+        # Failures are not cached
+        with self.assertRaises(gateaux.errors.ValidationError):
+            test.pack_key(('1',))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            test.pack_key(('1',))
+        self.assertEqual(test.cache_stats()['key']['size'], 2)
+        self.assertEqual(test.cache_stats()['key']['evictions'], 2)
+
+    def test_key_cache_datetimes(self) -> None:
+        cached = CachedEventStructure(MockFoundationSubspace())
+        uncached = CachedEventStructure(MockFoundationSubspace())
+        uncached.key_cache = None
+        utc = datetime(2020, 1, 1, 12, tzinfo=timezone.utc)
+        plus_one = datetime(2020, 1, 1, 13, tzinfo=timezone(timedelta(hours=1)))
+        self.assertEqual(utc, plus_one)
+        # Equal datetimes in different timezones pack as they would uncached
+        for dt in (utc, plus_one, utc):
+            self.assertEqual(cached.pack_key((dt,)), uncached.pack_key((dt,)))
+        self.assertEqual(cached.cache_stats()['key']['hits'], 1)
+
+    def test_value_cache(self) -> None:
+        test = CachedStructure(MockFoundationSubspace())
+        packed = test.pack_value(('test',))
+        self.assertEqual(test.unpack_value(packed), ('test',))
+        self.assertEqual(test.unpack_value(packed), ('test',))
+        stats = test.cache_stats()['value']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            test.unpack_value('not bytes') # type: ignore
+        with self.assertRaises(gateaux.errors.ValidationError):
+            test.unpack_value([]) # type: ignore
@@ -0,0 +1,155 @@
+import unittest
+from typing import Tuple
+from fdb.subspace_impl import Subspace
+import gateaux
+from gateaux.testing import MemoryDatabase, TransactionConflict
+
+
+class InventoryStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='store'), gateaux.StringField(name='item'))
+    value: Tuple[gateaux.BaseField, ...] = (
+        gateaux.IntegerField(name='stock'),
+        gateaux.StringField(name='aisle'),
+    )
+    changelog = True
+    changelog_values = True
+
+
+class ColumnInventoryStructure(InventoryStructure):
+    value_layout = 'columns'
+
+
+class KeysOnlyStructure(InventoryStructure):
+    changelog_values = False
+
+
+class CountsStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='page'),)
+    value = (gateaux.CounterField(name='views'),)
+    changelog = True
+    changelog_values = True
+
+
+class ChangeLogTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = MemoryDatabase()
+
+    def structure(self, structure: type) -> gateaux.Structure:
+        return structure(Subspace(('inventory',)),
+                         changelog_subspace=Subspace(('inventory-log',)))
+
+    def test_changes(self) -> None:
+        for structure in (InventoryStructure, ColumnInventoryStructure):
+            self.db = MemoryDatabase()
+            inventory = self.structure(structure)
+            tr = self.db.create_transaction()
+            inventory.set(tr, ('north', 'apple'), (10, 'a1'))
+            inventory.update(tr, ('north', 'apple'), {'stock': 9})
+            inventory.set(tr, ('north', 'pear'), (5, 'a2'))
+            tr.commit().wait()
+            tr = self.db.create_transaction()
+            inventory.clear(tr, ('north', 'pear'))
+            inventory.clear_range(tr, ('south',))
+            tr.commit().wait()
+            tr = self.db.create_transaction()
+            changes = inventory.changes(tr)
+            expected_update = ('update', {'stock': 9}) if inventory.columns else \
+                ('set', (9, 'a1'))
+            self.assertEqual([(c.op, c.key, c.value) for c in changes], [
+                ('set', ('north', 'apple'), (10, 'a1')),
+                (expected_update[0], ('north', 'apple'), expected_update[1]),
+                ('set', ('north', 'pear'), (5, 'a2')),
+                ('clear', ('north', 'pear'), None),
+                ('clear_range', ('south',), None),
+            ])
+            # Changes are in commit order, then in the order they were written
+            cursors = [c.cursor for c in changes]
+            self.assertEqual(cursors, sorted(cursors))
+            self.assertEqual(len(set(cursors)), 5)
+            self.assertEqual(cursors[0][:10], cursors[2][:10])
+            self.assertNotEqual(cursors[2][:10], cursors[3][:10])
+            self.assertEqual(inventory.changes(tr, cursors[2]), changes[3:])
+            self.assertEqual(inventory.changes(tr, cursors[0], limit=1), changes[1:2])
+            self.assertEqual(inventory.changes(tr, cursors[-1]), [])
+            # The structure's own range is unchanged by the log
+            self.assertEqual(list(inventory.get_range(tr)),
+                             [(('north', 'apple'), (9, 'a1'))])
+
+    def test_keys_only_and_atomic(self) -> None:
+        inventory = self.structure(KeysOnlyStructure)
+        counts = CountsStructure(Subspace(('counts',)),
+                                 changelog_subspace=Subspace(('counts-log',)))
+        tr = self.db.create_transaction()
+        inventory.set(tr, ('north', 'apple'), (10, 'a1'))
+        counts.add(tr, ('home',), 3)
+        counts.set(tr, ('about',), (1,))
+        tr.commit().wait()
+        tr = self.db.create_transaction()
+        self.assertEqual([(c.op, c.key, c.value) for c in inventory.changes(tr)],
+                         [('set', ('north', 'apple'), None)])
+        self.assertEqual([(c.op, c.key, c.value) for c in counts.changes(tr)],
+                         [('add', ('home',), 3), ('set', ('about',), (1,))])
+
+    def test_consumer(self) -> None:
+        inventory = self.structure(InventoryStructure)
+        for i in range(7):
+            tr = self.db.create_transaction()
+            inventory.set(tr, ('north', f'item{i}'), (i, 'a1'))
+            tr.commit().wait()
+        consumer = gateaux.ChangeConsumer(inventory, self.db, batch_size=3)
+        self.assertEqual([len(consumer.poll()) for _ in range(4)], [3, 3, 1, 0])
+        cursor = consumer.cursor
+        tr = self.db.create_transaction()
+        inventory.set(tr, ('north', 'item7'), (7, 'a1'))
+        tr.commit().wait()
+        # A consumer resumes from a saved cursor
+        resumed = gateaux.ChangeConsumer(inventory, self.db, cursor=cursor)
+        self.assertEqual([c.key for c in resumed], [('north', 'item7')])
+        self.assertEqual(len(list(gateaux.ChangeConsumer(inventory, self.db))), 8)
+        # Consumed changes can be trimmed from the log
+        tr = self.db.create_transaction()
+        assert cursor is not None
+        inventory.trim_changes(tr, cursor)
+        tr.commit().wait()
+        tr = self.db.create_transaction()
+        self.assertEqual(len(inventory.changes(tr)), 1)
+
+    def test_retried_sequence(self) -> None:
+        inventory = self.structure(InventoryStructure)
+        tr = self.db.create_transaction()
+        # Each retry logs its changes from sequence 0 again, so it never reaches the
+        # limit of changes per transaction
+        for _ in range(2):
+            for i in range(40000):
+                inventory.clear(tr, ('north', str(i)))
+            tr.on_error(TransactionConflict()).wait()
+        inventory.set(tr, ('north', 'apple'), (10, 'a1'))
+        inventory.set(tr, ('north', 'pear'), (5, 'a2'))
+        tr.commit().wait()
+        changes = inventory.changes(self.db.create_transaction())
+        self.assertEqual([c.key for c in changes],
+                         [('north', 'apple'), ('north', 'pear')])
+        self.assertEqual([c.cursor[10:] for c in changes], [b'\x00\x00', b'\x00\x01'])
+
+    def test_validation(self) -> None:
+        class NoLogStructure(InventoryStructure):
+            changelog = False
+            changelog_values = False
+        class ValuesOnlyStructure(InventoryStructure):
+            changelog = False
+        with self.assertRaises(gateaux.errors.StructureError):
+            InventoryStructure(Subspace(('inventory',)))
+        with self.assertRaises(gateaux.errors.StructureError):
+            self.structure(ValuesOnlyStructure)
+        no_log = NoLogStructure(Subspace(('inventory',)))
+        tr = self.db.create_transaction()
+        with self.assertRaises(gateaux.errors.StructureError):
+            no_log.changes(tr)
+        with self.assertRaises(gateaux.errors.StructureError):
+            gateaux.ChangeConsumer(no_log, self.db)
+        inventory = self.structure(InventoryStructure)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            inventory.changes(tr, b'short')
+        with self.assertRaises(gateaux.errors.ValidationError):
+            gateaux.ChangeConsumer(inventory, self.db, batch_size=0)
@@ -0,0 +1,135 @@
+import unittest
+from datetime import datetime
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+from typing import Any, List, Tuple
+from uuid import UUID
+import pytz
+from fdb.subspace_impl import Subspace
+import gateaux
+
+
+SEEN = pytz.utc.localize(datetime(2020, 1, 2, 3, 4, 5))
+FIELDS = (
+    (gateaux.IntegerField(), (1, -5, 2 ** 70, None, 1.5, 'a', True)),
+    (gateaux.IntegerField(min_value=0, max_value=10), (0, 5, 10, -1, 11, None)),
+    (gateaux.IntegerField(min_value=3, null=True), (2, 3, None)),
+    (gateaux.IntegerField(default=4, max_value=5), (None, 6, 5)),
+    (gateaux.FloatField(min_value=-1, max_value=1), (0.5, -1.5, 2.0, 1, None)),
+    (gateaux.FloatField(null=True), (None, 1.0, 'x')),
+    (gateaux.BooleanField(), (True, False, None, 1)),
+    (gateaux.StringField(max_length=3), ('abc', 'abcd', '', None, b'ab')),
+    (gateaux.StringField(null=True), (None, 'x' * 500)),
+    (gateaux.BinaryField(max_length=2), (b'ab', b'abc', None, 'ab')),
+    (gateaux.EnumField(members=(1, 2, 3)), (1, 4, None, '1')),
+    (gateaux.DateTimeField(), (SEEN, None, '2020-01-01')),
+    (gateaux.DateTimeField(null=True), (None, SEEN)),
+    (gateaux.UUIDField(), (UUID(int=1), None, 'abc')),
+    (gateaux.IPv4AddressField(), (IPv4Address('10.0.0.1'), None, '10.0.0.1')),
+    (gateaux.IPv6AddressField(), (IPv6Address('::1'), IPv4Address('10.0.0.1'))),
+    (gateaux.IPv4NetworkField(), (IPv4Network('10.0.0.0/8'), None, 1)),
+    (gateaux.IPv6NetworkField(), (IPv6Network('::/64'), IPv4Network('10.0.0.0/8'))),
+    (gateaux.CounterField(), (1, -1, 2 ** 64, 'a', None)),
+)
+
+
+class UsersStructure(gateaux.Structure):
+    key: Tuple[gateaux.BaseField, ...] = (
+        gateaux.StringField(name='name', max_length=4),
+        gateaux.IntegerField(name='id', min_value=1),
+    )
+    value: Tuple[gateaux.BaseField, ...] = (
+        gateaux.IntegerField(name='age', min_value=18, max_value=65),
+        gateaux.EnumField(name='level', members=(1, 2)),
+        gateaux.IntegerField(name='score', null=True),
+    )
+
+
+class StructUsersStructure(UsersStructure):
+    value_codec = 'struct'
+
+
+class HashedUsersStructure(UsersStructure):
+    key = (gateaux.HashPrefix(gateaux.StringField(name='name', max_length=4),
+                              buckets=4),
+           gateaux.IntegerField(name='id', min_value=1))
+
+
+class CountsStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='page'),)
+    value = (gateaux.CounterField(name='views'),)
+
+
+def rejects(pack: Any, *args: Any) -> bool:
+    try:
+        pack(*args)
+    except Exception:
+        return True
+    return False
+
+
+class CheckTestCase(unittest.TestCase):
+
+    def test_field_parity(self) -> None:
+        for field, values in FIELDS:
+            for v in values:
+                self.assertEqual(field.check(v) is not None, rejects(field.pack, v),
+                                 (field, v))
+
+    def test_constraints(self) -> None:
+        users = UsersStructure(Subspace(('users',)))
+        self.assertEqual(users.check_key(('ann', 1)), [])
+        self.assertEqual(users.check_value((20, 1, None)), [])
+        errors = users.check_key(('annie', 0))
+        self.assertEqual([(e.field_index, e.field, e.constraint, e.value)
+                          for e in errors],
+                         [(0, 'name', 'max_length', 'annie'),
+                          (1, 'id', 'min_value', 0)])
+        self.assertEqual({e.part for e in errors}, {'key'})
+        self.assertIsNone(errors[0].row)
+        errors = users.check_value((None, 3, 'x'))
+        self.assertEqual([e.constraint for e in errors],
+                         ['required', 'members', 'type'])
+        bad_keys: List[Any] = [(), ('a', 1, 2), ['a', 1]]
+        for key_tuple in bad_keys:
+            self.assertEqual([e.constraint for e in users.check_key(key_tuple)],
+                             ['length'] if isinstance(key_tuple, tuple) else ['type'])
+        self.assertEqual(users.check_value((20, 1))[0].constraint, 'length')
+        errors = users.check_value(20) # type: ignore
+        self.assertEqual(errors[0].constraint, 'type')
+
+    def test_batches(self) -> None:
+        users = UsersStructure(Subspace(('users',)))
+        keys = [('ann', 1), ('bob', 0), ('cat', 3), (5, 4)]
+        self.assertEqual([(e.row, e.field) for e in users.check_keys(keys)],
+                         [(1, 'id'), (3, 'name')])
+        values = [(20, 1, None), (70, 1, 3), (30, 2, 4)]
+        self.assertEqual([(e.row, e.part, e.constraint)
+                          for e in users.check_values(iter(values))],
+                         [(1, 'value', 'max_value')])
+        records = [(('ann', 1), (20, 1, None)), (('ann',), (20, 3, None))]
+        self.assertEqual([(e.row, e.part, e.constraint)
+                          for e in users.check_records(records)],
+                         [(1, 'key', 'length'), (1, 'value', 'members')])
+
+    def test_structure_parity(self) -> None:
+        keys: List[Any] = [('ann', 1), ('ann',), ('annie', 1), ('ann', 0), (),
+                           ('a', 1, 1), ('ann', None), (None, 1), ['ann', 1],
+                           ('ann', '1')]
+        values = [(20, 1, None), (20, 1, 5), (17, 1, None), (20, 3, None),
+                  (None, 1, None), (20, 1), (20, 1, 2 ** 63), (20, 1, 'x'),
+                  (20.5, 1, None), (20, 1, -2 ** 63)]
+        for structure in (UsersStructure, StructUsersStructure,
+                          HashedUsersStructure):
+            users = structure(Subspace(('users',)))
+            for key_tuple in keys:
+                self.assertEqual(bool(users.check_key(key_tuple)),
+                                 rejects(users.pack_key, key_tuple),
+                                 (structure, key_tuple))
+            for value_tuple in values:
+                self.assertEqual(bool(users.check_value(value_tuple)),
+                                 rejects(users.pack_value, value_tuple),
+                                 (structure, value_tuple))
+        counts = CountsStructure(Subspace(('counts',)))
+        for value_tuple in ((1,), (2 ** 64,), ('a',), (1, 2)):
+            self.assertEqual(bool(counts.check_value(value_tuple)),
+                             rejects(counts.pack_value, value_tuple))
@@ -0,0 +1,92 @@
+import unittest
+from datetime import datetime
+from ipaddress import IPv4Address, IPv6Network
+from uuid import UUID
+import pytz
+import gateaux
+from gateaux.codec import StructCodec, STRUCT_CODEC_VERSION
+from test_structure import MockFoundationSubspace
+
+
+class FixedStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value = (
+        gateaux.IntegerField(name='bytes'),
+        gateaux.FloatField(name='ratio'),
+        gateaux.BooleanField(name='ok'),
+        gateaux.IntegerField(name='count', null=True),
+        gateaux.UUIDField(name='session', null=True),
+        gateaux.IPv4AddressField(name='ip'),
+        gateaux.IPv6NetworkField(name='net'),
+        gateaux.DateTimeField(name='seen'),
+        gateaux.EnumField(name='kind', members=(1, 2)),
+    )
+    value_codec = 'struct'
+
+
+SEEN = pytz.utc.localize(datetime(2020, 1, 2, 3, 4, 5))
+VALUE = (4096, 0.5, True, None, UUID(int=7), IPv4Address('10.0.0.1'),
+         IPv6Network('2001:db8::/32'), SEEN, 2)
+
+
+class StructCodecTestCase(unittest.TestCase):
+
+    def test_validation(self) -> None:
+        class VariableStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.StringField(),)
+            value_codec = 'struct'
+        with self.assertRaises(gateaux.errors.StructureError):
+            VariableStructure(MockFoundationSubspace())
+        class UnknownCodecStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.IntegerField(),)
+            value_codec = 'msgpack'
+        with self.assertRaises(gateaux.errors.StructureError):
+            UnknownCodecStructure(MockFoundationSubspace())
+
+    def test_layout(self) -> None:
+        codec = StructCodec((gateaux.IntegerField(), gateaux.BooleanField(null=True)))
+        # A version byte, a one byte null bitmap, 8 bytes and 1 byte
+        self.assertEqual(codec.size, 11)
+        packed = codec.pack((-1, None))
+        self.assertEqual(packed, bytes([STRUCT_CODEC_VERSION, 1]) + b'\xff' * 8 +
+                         b'\x00')
+        self.assertEqual(codec.unpack(packed), (-1, None))
+        self.assertEqual(codec.unpack(codec.pack((5, False))), (5, False))
+        plain = StructCodec((gateaux.IntegerField(), gateaux.FloatField()))
+        self.assertEqual(plain.size, 17)
+
+    def test_pack_unpack(self) -> None:
+        fixed = FixedStructure(MockFoundationSubspace())
+        packed = fixed.pack_value(VALUE)
+        self.assertLess(len(packed), len(tuple_packed(VALUE)))
+        self.assertEqual(fixed.unpack_value(packed), VALUE)
+        self.assertEqual(fixed.unpack_value_dict(packed)['count'], None)
+        full = VALUE[:3] + (3,) + VALUE[4:]
+        self.assertEqual(fixed.unpack_value(fixed.pack_value(full)), full)
+
+    def test_errors(self) -> None:
+        fixed = FixedStructure(MockFoundationSubspace())
+        with self.assertRaises(gateaux.errors.ValidationError):
+            fixed.pack_value((2 ** 63,) + VALUE[1:])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            fixed.pack_value(('1',) + VALUE[1:])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            fixed.pack_value((None,) + VALUE[1:])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            fixed.pack_value(VALUE[:-1] + (3,))
+        packed = fixed.pack_value(VALUE)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            fixed.unpack_value(packed[:-1])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            fixed.unpack_value(b'\x02' + packed[1:])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            fixed.unpack_value('not bytes') # type: ignore
+
+
+def tuple_packed(value: tuple) -> bytes:
+    class TupleStructure(FixedStructure):
+        value_codec = 'tuple'
+    # Values with a None field cannot be unpacked by the tuple codec, only packed
+    return TupleStructure(MockFoundationSubspace()).pack_value(value)
@@ -0,0 +1,158 @@
+import unittest
+from typing import Tuple
+import fdb.tuple
+import gateaux
+from gateaux.testing import MemoryDatabase, TransactionConflict
+from test_structure import MockFoundationSubspace
+
+
+class ProfileStructure(gateaux.Structure):
+    key: Tuple[gateaux.BaseField, ...] = (gateaux.StringField(name='user'),)
+    value: Tuple[gateaux.BaseField, ...] = (
+        gateaux.StringField(name='name'),
+        gateaux.IntegerField(name='logins'),
+        gateaux.BinaryField(name='avatar'),
+    )
+    value_layout = 'columns'
+
+
+class BucketedProfileStructure(ProfileStructure):
+    key = (gateaux.HashPrefix(gateaux.StringField(name='user'), buckets=4),)
+    views = (gateaux.View(name='users'),
+             gateaux.View(name='logins', op='sum', field='logins'))
+
+
+class ColumnsTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = MemoryDatabase()
+
+    def test_layout(self) -> None:
+        profiles = ProfileStructure(MockFoundationSubspace())
+        columns = profiles.pack_columns(('ann',), ('Ann', 3, b'\x00'))
+        key = profiles.pack_key(('ann',))
+        self.assertEqual(columns, [
+            (key + fdb.tuple.pack((0,)), fdb.tuple.pack(('Ann',))),
+            (key + fdb.tuple.pack((1,)), fdb.tuple.pack((3,))),
+            (key + fdb.tuple.pack((2,)), fdb.tuple.pack((b'\x00',))),
+        ])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            profiles.pack_columns(('ann',), ('Ann', 3))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            profiles.pack_columns(('ann',), ('Ann', '3', b''))
+
+    def test_read_write(self) -> None:
+        profiles = ProfileStructure(MockFoundationSubspace())
+        tr = self.db.create_transaction()
+        profiles.set(tr, ('ann',), ('Ann', 3, b'\x01'))
+        profiles.set(tr, ('bob',), ('Bob', 1, b''))
+        self.assertEqual(profiles.get(tr, ('ann',)), ('Ann', 3, b'\x01'))
+        self.assertEqual(profiles.get(tr, ('ann',), fields=('logins', 'name')),
+                         (3, 'Ann'))
+        self.assertIsNone(profiles.get(tr, ('cat',)))
+        self.assertIsNone(profiles.get(tr, ('cat',), fields=('name',)))
+        profiles.update(tr, ('ann',), {'logins': 4})
+        self.assertEqual(profiles.get(tr, ('ann',)), ('Ann', 4, b'\x01'))
+        # As with the packed layout, a record which is not set cannot be updated
+        with self.assertRaises(gateaux.errors.ValidationError):
+            profiles.update(tr, ('cat',), {1: 9})
+        self.assertIsNone(profiles.get(tr, ('cat',)))
+        profiles.set(tr, ('cat',), ('Cat', 9, b''))
+        self.assertEqual(list(profiles.get_range(tr)), [
+            (('ann',), ('Ann', 4, b'\x01')),
+            (('bob',), ('Bob', 1, b'')),
+            (('cat',), ('Cat', 9, b'')),
+        ])
+        self.assertEqual(list(profiles.get_range(tr, limit=1, reverse=True)),
+                         [(('cat',), ('Cat', 9, b''))])
+        self.assertEqual(profiles.count(tr), 3)
+        self.assertEqual(profiles.count(tr, limit=2), 2)
+        self.assertEqual(list(profiles.aggregate(tr, metrics={
+            'logins': ('sum', 'logins')})), [((), {'logins': 14})])
+        profiles.clear(tr, ('bob',))
+        self.assertIsNone(profiles.get(tr, ('bob',)))
+        self.assertEqual(profiles.count(tr), 2)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            profiles.update(tr, ('ann',), {'nope': 1})
+        with self.assertRaises(gateaux.errors.ValidationError):
+            profiles.update(tr, ('ann',), {})
+
+    def test_no_conflicts(self) -> None:
+        profiles = ProfileStructure(MockFoundationSubspace())
+        tr = self.db.create_transaction()
+        profiles.set(tr, ('ann',), ('Ann', 3, b''))
+        tr.commit().wait()
+        tr1 = self.db.create_transaction()
+        tr2 = self.db.create_transaction()
+        tr1.get_read_version().wait()
+        tr2.get_read_version().wait()
+        profiles.update(tr1, ('ann',), {'logins': 4})
+        profiles.update(tr2, ('ann',), {'avatar': b'\x02'})
+        tr1.commit().wait()
+        tr2.commit().wait()
+        self.assertEqual(profiles.get(self.db.create_transaction(), ('ann',)),
+                         ('Ann', 4, b'\x02'))
+
+    def test_update_conflicts_with_clear(self) -> None:
+        profiles = ProfileStructure(MockFoundationSubspace())
+        tr = self.db.create_transaction()
+        profiles.set(tr, ('ann',), ('Ann', 3, b''))
+        tr.commit().wait()
+        tr1 = self.db.create_transaction()
+        tr2 = self.db.create_transaction()
+        tr1.get_read_version().wait()
+        tr2.get_read_version().wait()
+        profiles.update(tr1, ('ann',), {'logins': 4})
+        profiles.clear(tr2, ('ann',))
+        tr2.commit().wait()
+        # Committing the update would leave a record of only its logins column
+        with self.assertRaises(TransactionConflict):
+            tr1.commit().wait()
+        self.assertIsNone(profiles.get(self.db.create_transaction(), ('ann',)))
+
+    def test_packed_update(self) -> None:
+        class PackedProfileStructure(ProfileStructure):
+            value_layout = 'packed'
+        profiles = PackedProfileStructure(MockFoundationSubspace())
+        tr = self.db.create_transaction()
+        profiles.set(tr, ('ann',), ('Ann', 3, b''))
+        profiles.update(tr, ('ann',), {'logins': 4})
+        self.assertEqual(profiles.get(tr, ('ann',)), ('Ann', 4, b''))
+        self.assertEqual(profiles.get(tr, ('ann',), fields=('logins',)), (4,))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            profiles.update(tr, ('bob',), {'logins': 1})
+
+    def test_views_and_hash_prefix(self) -> None:
+        profiles = BucketedProfileStructure(MockFoundationSubspace(),
+                                            MockFoundationSubspace())
+        tr = self.db.create_transaction()
+        for i in range(5):
+            profiles.set(tr, (f'user{i}',), (f'User {i}', i, b''))
+        profiles.update(tr, ('user1',), {'logins': 10})
+        with self.assertRaises(gateaux.errors.ValidationError):
+            profiles.update(tr, ('user9',), {'logins': 1})
+        profiles.set(tr, ('user9',), ('User 9', 1, b''))
+        profiles.clear(tr, ('user0',))
+        self.assertEqual(profiles.view(tr, ()), {'users': 5, 'logins': 20})
+        self.assertEqual([k for k, _ in profiles.get_range(tr)],
+                         [('user1',), ('user2',), ('user3',), ('user4',), ('user9',)])
+        tr.commit().wait()
+        self.assertEqual(profiles.rebuild_views(self.db, batch_size=2), 5)
+        self.assertEqual(profiles.view(self.db.create_transaction(), ()),
+                         {'users': 5, 'logins': 20})
+
+    def test_validation(self) -> None:
+        class EmptyStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value_layout = 'columns'
+        class StructColumnsStructure(ProfileStructure):
+            value = (gateaux.IntegerField(),)
+            value_codec = 'struct'
+        class AtomicColumnsStructure(ProfileStructure):
+            value = (gateaux.CounterField(),)
+        class UnknownLayoutStructure(ProfileStructure):
+            value_layout = 'rows'
+        for structure in (EmptyStructure, StructColumnsStructure,
+                          AtomicColumnsStructure, UnknownLayoutStructure):
+            with self.assertRaises(gateaux.errors.StructureError):
+                structure(MockFoundationSubspace())
@@ -0,0 +1,95 @@
+import unittest
+from typing import Callable
+import gateaux
+from gateaux.testing import MemoryDatabase, TransactionConflict
+from test_structure import MockFoundationSubspace
+
+
+class SeatsStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='class'), gateaux.StringField(name='student'))
+    value = (gateaux.IntegerField(name='seat'),)
+
+
+class ConflictTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = MemoryDatabase()
+        self.seats = SeatsStructure(MockFoundationSubspace())
+        tr = self.db.create_transaction()
+        for student in ('ann', 'bob'):
+            self.seats.set(tr, ('chem', student), (1,))
+        self.seats.set(tr, ('bio', 'ann'), (1,))
+        tr.commit().wait()
+
+    def conflicts(self, read: Callable, write: Callable) -> bool:
+        '''
+            Runs read in a transaction, commits write in another, then returns True
+            if the first transaction conflicts when it commits.
+        '''
+        tr = self.db.create_transaction()
+        read(tr)
+        self.seats.set(tr, ('art', 'zed'), (1,))
+        other = self.db.create_transaction()
+        write(other)
+        other.commit().wait()
+        try:
+            tr.commit().wait()
+        except TransactionConflict:
+            return True
+        return False
+
+    def test_snapshot_reads(self) -> None:
+        seats = self.seats
+        def write(tr):
+            seats.set(tr, ('chem', 'bob'), (2,))
+        self.assertTrue(self.conflicts(lambda tr: seats.get(tr, ('chem', 'bob')),
+                                       write))
+        self.assertFalse(self.conflicts(
+            lambda tr: seats.get(tr, ('chem', 'bob'), snapshot=True), write))
+        self.assertFalse(self.conflicts(
+            lambda tr: list(seats.get_range(tr, ('chem',), snapshot=True)), write))
+        self.assertFalse(self.conflicts(
+            lambda tr: seats.count(tr, ('chem',), snapshot=True), write))
+        self.assertFalse(self.conflicts(
+            lambda tr: list(seats.aggregate(tr, ('chem',), snapshot=True)), write))
+        self.assertFalse(self.conflicts(
+            lambda tr: seats.load(tr, ('chem', 'bob'), snapshot=True), write))
+        tr = self.db.create_transaction()
+        self.assertEqual(seats.get(tr, ('chem', 'ann'), snapshot=True), (1,))
+        self.assertEqual(seats.count(tr, ('chem',), snapshot=True), 2)
+
+    def test_read_conflicts(self) -> None:
+        seats = self.seats
+        def read_one(tr):
+            list(seats.get_range(tr, ('chem',), snapshot=True))
+            seats.add_read_conflict_key(tr, ('chem', 'ann'))
+        def write_ann(tr):
+            seats.set(tr, ('chem', 'ann'), (3,))
+        def write_bob(tr):
+            seats.set(tr, ('chem', 'bob'), (3,))
+        self.assertTrue(self.conflicts(read_one, write_ann))
+        self.assertFalse(self.conflicts(read_one, write_bob))
+        def read_chem(tr):
+            seats.add_read_conflict_range(tr, ('chem',))
+        def write_bio(tr):
+            seats.set(tr, ('bio', 'bob'), (3,))
+        def write_new(tr):
+            seats.set(tr, ('chem', 'cat'), (3,))
+        self.assertFalse(self.conflicts(read_chem, write_bio))
+        self.assertTrue(self.conflicts(read_chem, write_new))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            seats.add_read_conflict_key(self.db.create_transaction(), ('chem',))
+
+    def test_write_conflicts(self) -> None:
+        seats = self.seats
+        def read(tr):
+            seats.get(tr, ('chem', 'ann'))
+        self.assertTrue(self.conflicts(
+            read, lambda tr: seats.add_write_conflict_key(tr, ('chem', 'ann'))))
+        self.assertTrue(self.conflicts(
+            read, lambda tr: seats.add_write_conflict_range(tr, ('chem',))))
+        self.assertFalse(self.conflicts(
+            read, lambda tr: seats.add_write_conflict_range(tr, ('bio',))))
+        # Write conflicts do not change any data
+        self.assertEqual(seats.get(self.db.create_transaction(), ('chem', 'ann')),
+                         (1,))
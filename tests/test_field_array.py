@@ -0,0 +1,137 @@
+import unittest
+from array import array
+from typing import Any
+import gateaux
+from gateaux.fields import array as array_field
+from test_structure import MockFoundationSubspace
+
+
+class ArrayFieldTestCase(unittest.TestCase):
+
+    def test_constructor(self) -> None:
+        with self.assertRaises(gateaux.errors.FieldError):
+            gateaux.ArrayField(dtype='u2')
+        with self.assertRaises(gateaux.errors.FieldError):
+            gateaux.ArrayField(max_length=-1)
+        with self.assertRaises(gateaux.errors.FieldError):
+            gateaux.ArrayField(decode='list')
+        field = gateaux.ArrayField()
+        self.assertEqual(field.decode, 'array' if array_field.numpy is None else 'numpy')
+
+    def test_pack(self) -> None:
+        field = gateaux.ArrayField(dtype='i8', max_length=3, decode='array')
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.pack('not an array') # type: ignore
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.pack([1, 2, 3, 4])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.pack([1, 2.5])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.pack([True])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.pack([2 ** 63])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.pack(memoryview(array('i', [1])))
+        expected = b'\x01' + b'\x00' * 7 + b'\xff' * 8
+        self.assertEqual(field.pack([1, -1]), expected)
+        self.assertEqual(field.pack((1, -1)), expected)
+        self.assertEqual(field.pack(array('q', [1, -1])), expected)
+        self.assertEqual(field.pack(array('i', [1, -1])), expected)
+        self.assertEqual(field.pack(memoryview(array('q', [1, -1]))), expected)
+        self.assertEqual(field.pack([]), b'')
+        floats = gateaux.ArrayField(dtype='f4')
+        self.assertEqual(floats.pack([1, 0.5]), b'\x00\x00\x80?\x00\x00\x00?')
+        with self.assertRaises(gateaux.errors.ValidationError):
+            floats.pack([1e40])
+        packed: Any = floats.pack([float('inf')])
+        self.assertEqual(len(packed), 4)
+
+    def test_unpack(self) -> None:
+        field = gateaux.ArrayField(dtype='f8', decode='array')
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.unpack('not bytes') # type: ignore
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.unpack(b'\x00' * 9)
+        packed: Any = field.pack([1.5, -2.0])
+        self.assertEqual(field.unpack(packed), array('d', [1.5, -2.0]))
+        view = gateaux.ArrayField(dtype='f8', decode='memoryview').unpack(packed)
+        self.assertIsInstance(view, memoryview)
+        self.assertTrue(view.readonly)
+        self.assertEqual(view.tolist(), [1.5, -2.0])
+
+    @unittest.skipIf(array_field.numpy is None, 'NumPy is not installed')
+    def test_numpy(self) -> None:
+        numpy = array_field.numpy
+        field = gateaux.ArrayField(dtype='f4', decode='numpy')
+        packed: Any = field.pack(numpy.array([1.0, 2.0], dtype='float64'))
+        self.assertEqual(packed, gateaux.ArrayField(dtype='f4').pack([1.0, 2.0]))
+        unpacked = field.unpack(packed)
+        self.assertEqual(unpacked.tolist(), [1.0, 2.0])
+        self.assertFalse(unpacked.flags.writeable)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            gateaux.ArrayField(dtype='i8').pack(numpy.array([1.5]))
+
+    @unittest.skipIf(array_field.numpy is None, 'NumPy is not installed')
+    def test_numpy_range(self) -> None:
+        numpy = array_field.numpy
+        ints = gateaux.ArrayField(dtype='i4')
+        floats = gateaux.ArrayField(dtype='f4')
+        # Values which fit are cast, values which would wrap or overflow are not
+        self.assertEqual(ints.pack(numpy.array([1, -2 ** 31], dtype='int64')),
+                         ints.pack([1, -2 ** 31]))
+        packed: Any = floats.pack(numpy.array([0.5, numpy.inf, numpy.nan]))
+        self.assertEqual(packed[:8], floats.pack([0.5, float('inf')]))
+        for field, v in ((ints, numpy.array([2 ** 31], dtype='int64')),
+                         (ints, numpy.array([0, -2 ** 40], dtype='int64')),
+                         (floats, numpy.array([1.0, 1e39]))):
+            with self.assertRaises(gateaux.errors.ValidationError):
+                field.pack(v)
+            self.assertEqual(field.check(v), 'range')
+        self.assertEqual(ints.check(numpy.array([[1]], dtype='int32')), 'dtype')
+        self.assertEqual(ints.check(numpy.array([1], dtype='int8')), None)
+
+    def test_null(self) -> None:
+        field = gateaux.ArrayField(null=True)
+        self.assertIsNone(field.pack(None))
+        self.assertIsNone(field.check(None))
+        self.assertEqual(gateaux.ArrayField().check(None), 'required')
+        default = gateaux.ArrayField(dtype='i4', default=[1], decode='array')
+        self.assertEqual(default.pack(None), default.pack([1]))
+
+    def test_check(self) -> None:
+        field = gateaux.ArrayField(dtype='i4', max_length=2, decode='array')
+        cases = (
+            ([1, 2], None),
+            ([1, 2, 3], 'max_length'),
+            ([1.5], 'dtype'),
+            ([True], 'dtype'),
+            ([2 ** 31], 'range'),
+            (array('i', [1]), None),
+            (array('q', [2 ** 40]), 'range'),
+            (memoryview(array('q', [1])), 'dtype'),
+            ('12', 'type'),
+        )
+        for v, constraint in cases:
+            self.assertEqual(field.check(v), constraint, v)
+            try:
+                field.pack(v)
+            except gateaux.errors.ValidationError:
+                rejected = True
+            else:
+                rejected = False
+            self.assertEqual(rejected, constraint is not None, v)
+
+    def test_structure(self) -> None:
+        class EmbeddingStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.ArrayField(dtype='f4', max_length=4, decode='array'),
+                     gateaux.IntegerField())
+            cache_size = 10
+        embeddings = EmbeddingStructure(MockFoundationSubspace())
+        packed = embeddings.pack_value(([0.5, 0.25], 7))
+        v, n = embeddings.unpack_value(packed)
+        self.assertEqual((v, n), (array('f', [0.5, 0.25]), 7))
+        # Mutable arrays are never shared from the value cache
+        v[0] = 9.0
+        self.assertEqual(embeddings.unpack_value(packed)[0], array('f', [0.5, 0.25]))
+        self.assertNotIn('value', embeddings.cache_stats())
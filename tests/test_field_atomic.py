@@ -0,0 +1,132 @@
+import threading
+import unittest
+import gateaux
+from gateaux.testing import MemoryDatabase, transactional
+from gateaux.testing.memory import apply_atomic
+from test_structure import MockFoundationSubspace
+
+
+class SeatsStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='class'),)
+    value = (gateaux.CounterField(name='seats'),)
+
+
+class AtomicFieldTestCase(unittest.TestCase):
+
+    def test_constructor(self) -> None:
+        with self.assertRaises(gateaux.errors.FieldError):
+            gateaux.CounterField(null=True)
+        field = gateaux.CounterField(default=1)
+        self.assertEqual(field.default, 1)
+
+    def test_pack(self) -> None:
+        field = gateaux.CounterField()
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.pack('not int') # type: ignore
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.pack(2 ** 63)
+        self.assertEqual(field.pack(1), b'\x01\x00\x00\x00\x00\x00\x00\x00')
+        self.assertEqual(field.pack(-1), b'\xff' * 8)
+        for cls in (gateaux.MinField, gateaux.MaxField, gateaux.BitAndField,
+                    gateaux.BitOrField, gateaux.BitXorField):
+            unsigned = cls()
+            with self.assertRaises(gateaux.errors.ValidationError):
+                unsigned.pack(-1)
+            self.assertEqual(unsigned.pack(2 ** 64 - 1), b'\xff' * 8)
+
+    def test_unpack(self) -> None:
+        field = gateaux.CounterField()
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.unpack('not bytes') # type: ignore
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.unpack(b'\x01')
+        self.assertEqual(field.unpack(b'\xff' * 8), -1)
+        self.assertEqual(gateaux.MaxField().unpack(b'\xff' * 8), 2 ** 64 - 1)
+
+
+class AtomicStructureTestCase(unittest.TestCase):
+
+    def test_validation(self) -> None:
+        mock_ss = MockFoundationSubspace()
+        class AtomicKeyStructure(gateaux.Structure):
+            key = (gateaux.CounterField(),)
+        with self.assertRaises(gateaux.errors.StructureError):
+            AtomicKeyStructure(mock_ss)
+        class AtomicAndOtherValueStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.CounterField(), gateaux.IntegerField())
+        with self.assertRaises(gateaux.errors.StructureError):
+            AtomicAndOtherValueStructure(mock_ss)
+
+    def test_pack_value(self) -> None:
+        seats = SeatsStructure(MockFoundationSubspace())
+        packed = seats.pack_value((100,))
+        # Atomic values are the raw little-endian bytes, not a tuple
+        self.assertEqual(packed, (100).to_bytes(8, 'little'))
+        self.assertEqual(seats.unpack_value(packed), (100,))
+        self.assertEqual(seats.unpack_value_dict(packed), {'seats': 100})
+
+    def test_mutations(self) -> None:
+        db = MemoryDatabase()
+        seats = SeatsStructure(MockFoundationSubspace())
+        key = seats.pack_key(('chem',))
+        tr = db.create_transaction()
+        tr[key] = seats.pack_value((100,))
+        seats.add(tr, ('chem',), -1)
+        self.assertEqual(seats.unpack_value(tr[key]), (99,))
+        tr.commit().wait()
+        self.assertEqual(seats.unpack_value(db[key]), (99,))
+        with self.assertRaises(gateaux.errors.StructureError):
+            seats.max(db.create_transaction(), ('chem',), 1)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            seats.add(db.create_transaction(), (), 1)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            seats.add(db.create_transaction(), ('chem',), 'one') # type: ignore
+        for field, op, values, expected in (
+                (gateaux.MinField(), 'min', (5, 3, 7), 3),
+                (gateaux.MaxField(), 'max', (5, 3, 7), 7),
+                (gateaux.BitAndField(), 'bit_and', (7, 6, 3), 2),
+                (gateaux.BitOrField(), 'bit_or', (1, 2, 8), 11),
+                (gateaux.BitXorField(), 'bit_xor', (1, 3, 8), 10)):
+            class OpStructure(gateaux.Structure):
+                key = (gateaux.StringField(),)
+                value = (field,)
+            structure = OpStructure(MockFoundationSubspace())
+            tr = db.create_transaction()
+            for v in values:
+                getattr(structure, op)(tr, (op,), v)
+            tr.commit().wait()
+            self.assertEqual(structure.unpack_value(db[structure.pack_key((op,))]),
+                             (expected,), op)
+
+    def test_conflict_free(self) -> None:
+        db = MemoryDatabase(latency=0.0002)
+        seats = SeatsStructure(MockFoundationSubspace())
+        @transactional
+        def take_seat(tr) -> None:
+            seats.add(tr, ('chem',), -1)
+        def worker() -> None:
+            for _ in range(25):
+                take_seat(db)
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(seats.unpack_value(db[seats.pack_key(('chem',))]), (-100,))
+        self.assertEqual(db.conflicts, 0)
+
+
+class ApplyAtomicTestCase(unittest.TestCase):
+
+    def test_apply_atomic(self) -> None:
+        self.assertEqual(apply_atomic('add', None, b'\x01'), b'\x01')
+        self.assertEqual(apply_atomic('add', b'\xff', b'\x01\x00'), b'\x00\x01')
+        self.assertEqual(apply_atomic('add', b'\xff\xff', b'\x01'), b'\x00')
+        self.assertEqual(apply_atomic('byte_min', b'b', b'a'), b'a')
+        self.assertEqual(apply_atomic('byte_max', b'b', b'a'), b'b')
+        self.assertEqual(apply_atomic('append_if_fits', b'a', b'b'), b'ab')
+        self.assertEqual(apply_atomic('append_if_fits', b'a' * 100000, b'b'),
+                         b'a' * 100000)
+        with self.assertRaises(ValueError):
+            apply_atomic('unknown', b'a', b'b')
@@ -0,0 +1,110 @@
+import unittest
+import gateaux
+from gateaux.testing import MemoryDatabase
+from test_structure import MockFoundationSubspace
+
+
+class ReadingStructure(gateaux.Structure):
+    key = (
+        gateaux.HashPrefix(gateaux.IntegerField(name='year'), buckets=8, hash_field=1),
+        gateaux.IntegerField(name='day'),
+    )
+    value = (gateaux.FloatField(name='celsius'),)
+
+
+class HashPrefixTestCase(unittest.TestCase):
+
+    def test_constructor(self) -> None:
+        with self.assertRaises(gateaux.errors.FieldError):
+            gateaux.HashPrefix('not a field') # type: ignore
+        with self.assertRaises(gateaux.errors.FieldError):
+            gateaux.HashPrefix(gateaux.HashPrefix(gateaux.IntegerField()))
+        with self.assertRaises(gateaux.errors.FieldError):
+            gateaux.HashPrefix(gateaux.IntegerField(), buckets=257)
+        with self.assertRaises(ValueError):
+            gateaux.HashPrefix(gateaux.IntegerField(), unknown=True)
+        field = gateaux.HashPrefix(gateaux.IntegerField(name='year'), buckets=4)
+        self.assertEqual(field.name, 'year')
+        self.assertEqual(field.pack(2020), 2020)
+        self.assertEqual(field.description['hash_prefix'],
+                         {'buckets': 4, 'hash_field': 0})
+        self.assertEqual(field.bucket(2020), field.bucket(2020))
+        self.assertTrue(0 <= field.bucket(2020) < 4)
+
+    def test_validation(self) -> None:
+        mock_ss = MockFoundationSubspace()
+        class SecondKeyStructure(gateaux.Structure):
+            key = (gateaux.IntegerField(), gateaux.HashPrefix(gateaux.IntegerField()))
+        with self.assertRaises(gateaux.errors.StructureError):
+            SecondKeyStructure(mock_ss)
+        class BadHashFieldStructure(gateaux.Structure):
+            key = (gateaux.HashPrefix(gateaux.IntegerField(), hash_field=1),)
+        with self.assertRaises(gateaux.errors.StructureError):
+            BadHashFieldStructure(mock_ss)
+        class ValueStructure(gateaux.Structure):
+            key = (gateaux.IntegerField(),)
+            value = (gateaux.HashPrefix(gateaux.IntegerField()),)
+        with self.assertRaises(gateaux.errors.StructureError):
+            ValueStructure(mock_ss)
+
+    def test_pack_key(self) -> None:
+        readings = ReadingStructure(MockFoundationSubspace())
+        bucket = readings.bucket((2020, 5))
+        packed = readings.pack_key((2020, 5))
+        self.assertEqual(packed, MockFoundationSubspace().pack((bucket, 2020, 5)))
+        self.assertEqual(readings.unpack_key(packed), (2020, 5))
+        self.assertEqual(readings.unpack_key_dict(packed), {'year': 2020, 'day': 5})
+        # The bucket comes from the day so a year prefix cannot be packed
+        with self.assertRaises(gateaux.errors.ValidationError):
+            readings.pack_key((2020,))
+        buckets = {readings.bucket((2020, day)) for day in range(1, 366)}
+        self.assertEqual(buckets, set(range(8)))
+
+    def test_get_range(self) -> None:
+        db = MemoryDatabase()
+        readings = ReadingStructure(MockFoundationSubspace())
+        tr = db.create_transaction()
+        for year in (2019, 2020):
+            for day in range(1, 51):
+                readings.set(tr, (year, day), (float(day),))
+        tr.commit().wait()
+        tr = db.create_transaction()
+        rows = list(readings.get_range(tr, (2020,)))
+        self.assertEqual(rows, [((2020, day), (float(day),)) for day in range(1, 51)])
+        rows = list(readings.get_range(tr, (2020,), limit=5, reverse=True))
+        self.assertEqual([k for k, _ in rows], [(2020, day) for day in range(50, 45, -1)])
+        self.assertEqual(len(list(readings.get_range(tr))), 100)
+        self.assertEqual(list(readings.get_range(tr, (2019, 7))), [((2019, 7), (7.0,))])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            list(readings.get_range(tr, (2019, 7, 1)))
+
+
+class GetRangeTestCase(unittest.TestCase):
+
+    def test_plain_and_sharded(self) -> None:
+        db = MemoryDatabase()
+        class PlainStructure(gateaux.Structure):
+            key = (gateaux.StringField(), gateaux.IntegerField())
+            value = (gateaux.IntegerField(),)
+        plain = PlainStructure(MockFoundationSubspace())
+        class CounterStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.CounterField(),)
+            shards = 4
+        counter = CounterStructure(MockFoundationSubspace())
+        tr = db.create_transaction()
+        for i in range(3):
+            plain.set(tr, ('a', i), (i,))
+        plain.set(tr, ('b', 0), (9,))
+        self.assertEqual(list(plain.get_range(tr, ('a',), limit=2)),
+                         [(('a', 0), (0,)), (('a', 1), (1,))])
+        tr.commit().wait()
+        db.clear_range(b'\x00', b'\xff')
+        tr = db.create_transaction()
+        for name in ('x', 'y', 'z'):
+            for shard in range(4):
+                tr.add(counter.pack_shard_key((name,), shard), counter.pack_value((1,)))
+        self.assertEqual(list(counter.get_range(tr)),
+                         [(('x',), (4,)), (('y',), (4,)), (('z',), (4,))])
+        self.assertEqual(list(counter.get_range(tr, limit=2, reverse=True)),
+                         [(('z',), (4,)), (('y',), (4,))])
@@ -0,0 +1,115 @@
+import unittest
+import fdb.tuple
+from fdb.tuple import Versionstamp
+import gateaux
+from gateaux.testing import MemoryDatabase
+from test_structure import MockFoundationSubspace
+
+
+def client_available() -> bool:
+    '''
+        The fdb bindings need the FoundationDB client library loaded with
+        fdb.api_version() to pack versionstamps.
+    '''
+    try:
+        fdb.tuple.pack((Versionstamp(b'\x00' * 10),))
+    except AttributeError:
+        return False
+    return True
+
+
+requires_client = unittest.skipUnless(client_available(),
+                                      'FoundationDB client library not loaded')
+
+
+class ReadingStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='sensor'), gateaux.VersionstampField(name='stamp'))
+    value = (gateaux.FloatField(name='celsius'),)
+
+
+class VersionstampFieldTestCase(unittest.TestCase):
+
+    def test_pack(self) -> None:
+        field = gateaux.VersionstampField()
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.pack(b'\x00' * 12) # type: ignore
+        stamp = Versionstamp.incomplete(3)
+        self.assertIs(field.pack(stamp), stamp)
+
+    def test_unpack(self) -> None:
+        field = gateaux.VersionstampField()
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.unpack(b'\x00' * 12) # type: ignore
+        with self.assertRaises(gateaux.errors.ValidationError):
+            field.unpack(Versionstamp.incomplete())
+        stamp = Versionstamp(b'\x00' * 9 + b'\x01', 2)
+        self.assertEqual(field.unpack(stamp), stamp)
+
+    def test_unpack_key(self) -> None:
+        readings = ReadingStructure(MockFoundationSubspace())
+        tr_version = b'\x00\x00\x00\x00\x00\x00\x00\x07\x00\x00'
+        key = b'\x00\x00' + b'\x02s1\x00' + b'\x33' + tr_version + b'\x00\x01'
+        self.assertEqual(readings.unpack_key(key),
+                         ('s1', Versionstamp(tr_version, 1)))
+
+
+class VersionstampStructureTestCase(unittest.TestCase):
+
+    def test_append_errors(self) -> None:
+        mock_ss = MockFoundationSubspace()
+        db = MemoryDatabase()
+        readings = ReadingStructure(mock_ss)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            readings.append(db.create_transaction(), ['s1'], (1.0,)) # type: ignore
+        with self.assertRaises(gateaux.errors.ValidationError):
+            readings.append(db.create_transaction(), (), (1.0,))
+        class StampedBothStructure(gateaux.Structure):
+            key = (gateaux.VersionstampField(),)
+            value = (gateaux.VersionstampField(),)
+        both = StampedBothStructure(mock_ss)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            both.append(db.create_transaction(), (Versionstamp.incomplete(),),
+                        (Versionstamp.incomplete(),))
+        class PlainStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.FloatField(),)
+        plain = PlainStructure(mock_ss)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            plain.append(db.create_transaction(), ('s1',), (1.0,))
+
+    @requires_client
+    def test_pack_incomplete(self) -> None:
+        readings = ReadingStructure(MockFoundationSubspace())
+        packed = readings.pack_key(('s1', Versionstamp.incomplete(1)))
+        # The offset of the versionstamp, after the prefix, string and type code
+        self.assertEqual(packed[-4:], (2 + 4 + 1).to_bytes(4, 'little'))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            class TwoStampStructure(gateaux.Structure):
+                key = (gateaux.VersionstampField(), gateaux.VersionstampField())
+            TwoStampStructure(MockFoundationSubspace()).pack_key(
+                (Versionstamp.incomplete(), Versionstamp.incomplete()))
+
+    @requires_client
+    def test_append(self) -> None:
+        db = MemoryDatabase()
+        readings = ReadingStructure(MockFoundationSubspace())
+        tr = db.create_transaction()
+        readings.append(tr, ('s1',), (20.5,))
+        future = readings.append(tr, ('s1',), (21.0,), user_version=1)
+        tr.commit().wait()
+        tr_version = future.wait()
+        rows = [(readings.unpack_key(k), readings.unpack_value(v))
+                for k, v in db.get_range(b'\x00', b'\xff')]
+        self.assertEqual(rows, [
+            (('s1', Versionstamp(tr_version, 0)), (20.5,)),
+            (('s1', Versionstamp(tr_version, 1)), (21.0,)),
+        ])
+        class LogStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.VersionstampField(), gateaux.StringField())
+        log = LogStructure(MockFoundationSubspace())
+        tr = db.create_transaction()
+        future = log.append(tr, ('last',), (Versionstamp.incomplete(), 'hello'))
+        tr.commit().wait()
+        self.assertEqual(log.unpack_value(db[log.pack_key(('last',))]),
+                         (Versionstamp(future.wait(), 0), 'hello'))
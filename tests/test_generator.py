@@ -0,0 +1,126 @@
+import unittest
+from collections import Counter
+from typing import Tuple
+from fdb.subspace_impl import Subspace
+import gateaux
+from gateaux.testing import DataGenerator, MemoryDatabase
+
+
+class EverythingStructure(gateaux.Structure):
+    key: Tuple[gateaux.BaseField, ...] = (
+        gateaux.StringField(name='name', max_length=6),
+        gateaux.IPv4NetworkField(name='network'),
+    )
+    value: Tuple[gateaux.BaseField, ...] = (
+        gateaux.IntegerField(name='age', min_value=18, max_value=65),
+        gateaux.FloatField(name='score', min_value=-1, max_value=1),
+        gateaux.BooleanField(name='active'),
+        gateaux.BinaryField(name='token', max_length=4),
+        gateaux.EnumField(name='level', members=(1, 2, 3)),
+        gateaux.DateTimeField(name='joined'),
+        gateaux.IPv4AddressField(name='ipv4'),
+        gateaux.IPv6AddressField(name='ipv6'),
+        gateaux.IPv6NetworkField(name='ipv6_network'),
+        gateaux.UUIDField(name='uuid'),
+        gateaux.ArrayField(name='samples', dtype='f4', decode='array'),
+    )
+
+
+class ReadingsStructure(gateaux.Structure):
+    key = (gateaux.HashPrefix(gateaux.IntegerField(name='sensor'), buckets=4),
+           gateaux.DateTimeField(name='ts'))
+    value = (gateaux.IntegerField(name='degrees', min_value=10, max_value=35),)
+
+
+class CountsStructure(gateaux.Structure):
+    key = (gateaux.IntegerField(name='page'),)
+    value = (gateaux.CounterField(name='views'),)
+
+
+class ProfileStructure(gateaux.Structure):
+    key = (gateaux.IntegerField(name='id'),)
+    value = (gateaux.StringField(name='name'),
+             gateaux.StringField(name='nickname', null=True),
+             gateaux.IntegerField(name='age', null=True),
+             gateaux.IntegerField(name='level', min_value=1, null=True))
+
+
+class DataGeneratorTestCase(unittest.TestCase):
+
+    def test_valid_values(self) -> None:
+        everything = EverythingStructure(Subspace(('everything',)))
+        generator = DataGenerator(everything, keys=50, seed=1)
+        for key_tuple, value_tuple in generator.records(200):
+            # Every record packs and unpacks to the same values
+            self.assertEqual(everything.unpack_key(everything.pack_key(key_tuple)),
+                             key_tuple)
+            unpacked = everything.unpack_value(everything.pack_value(value_tuple))
+            self.assertEqual(unpacked[:10], value_tuple[:10])
+            age, score, _, token, level = value_tuple[:5]
+            self.assertTrue(18 <= age <= 65 and -1 <= score <= 1)
+            self.assertTrue(len(token) <= 4 and level in (1, 2, 3))
+            self.assertLessEqual(len(key_tuple[0]), 6)
+
+    def test_distributions(self) -> None:
+        readings = ReadingsStructure(Subspace(('readings',)))
+        sequential = DataGenerator(readings, keys=100, distribution='sequential')
+        keys = [sequential.key() for _ in range(100)]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), 100)
+        # Sequential keys wrap after the last key
+        self.assertEqual(sequential.key(), keys[0])
+        zipfian = DataGenerator(readings, keys=1000, distribution='zipfian', seed=2)
+        counts = Counter(zipfian.index() for _ in range(5000))
+        self.assertEqual(counts.most_common(1)[0][0], 0)
+        self.assertGreater(counts[0], counts[10] * 5)
+        uniform = DataGenerator(readings, keys=1000, seed=2)
+        self.assertLess(Counter(uniform.index() for _ in range(5000))[0], counts[0])
+        # The same seed generates the same records, an index always the same key
+        self.assertEqual(list(DataGenerator(readings, seed=3).records(10)),
+                         list(DataGenerator(readings, seed=3).records(10)))
+        self.assertEqual(uniform.key(7), uniform.key(7))
+
+    def test_null_rate(self) -> None:
+        profiles = ProfileStructure(Subspace(('profiles',)))
+        values = list(DataGenerator(profiles, seed=4).value() for _ in range(100))
+        self.assertFalse(any(v is None for value in values for v in value))
+        generator = DataGenerator(profiles, null_rate=0.25, seed=4)
+        values = [generator.value() for _ in range(1000)]
+        nulls = Counter(i for value in values for i, v in enumerate(value) if v is None)
+        # Only nullable fields are None, at roughly the null rate
+        self.assertEqual(set(nulls), {1, 2})
+        self.assertTrue(all(150 < nulls[i] < 350 for i in (1, 2)))
+        for value_tuple in values[:50]:
+            self.assertEqual(profiles.check_value(value_tuple), [])
+            profiles.pack_value(value_tuple)
+        always = DataGenerator(profiles, null_rate=1, seed=4).value()
+        self.assertEqual(always[1:3], (None, None))
+        # A limited integer cannot pack None, so is always given a value
+        self.assertIsNotNone(always[0])
+        self.assertIsNotNone(always[3])
+
+    def test_load(self) -> None:
+        db = MemoryDatabase()
+        counts = CountsStructure(Subspace(('counts',)))
+        generator = DataGenerator(counts, keys=30, distribution='sequential')
+        self.assertEqual(generator.load(db, 45, batch_size=10), 45)
+        tr = db.create_transaction()
+        self.assertEqual(counts.count(tr), 30)
+        self.assertTrue(all(0 <= value[0] <= 1000
+                            for _, value in counts.get_range(tr)))
+
+    def test_validation(self) -> None:
+        class StampStructure(gateaux.Structure):
+            key = (gateaux.VersionstampField(),)
+        counts = CountsStructure(Subspace(('counts',)))
+        with self.assertRaises(gateaux.errors.StructureError):
+            DataGenerator(StampStructure(Subspace(('stamps',))))
+        with self.assertRaises(ValueError):
+            DataGenerator(counts, keys=0)
+        with self.assertRaises(ValueError):
+            DataGenerator(counts, distribution='normal')
+        for null_rate in (-0.1, 1.5):
+            with self.assertRaises(ValueError):
+                DataGenerator(counts, null_rate=null_rate)
+        with self.assertRaises(ValueError):
+            DataGenerator(counts).load(MemoryDatabase(), 1, batch_size=0)
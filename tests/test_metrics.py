@@ -0,0 +1,157 @@
+from typing import Dict, List
+import unittest
+import gateaux
+from test_structure import MockFoundationSubspace
+
+
+class MetricsTestStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value = (gateaux.IntegerField(name='seats', max_value=100),)
+
+
+class MetricsStructTestStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value = (gateaux.IntegerField(name='seats', max_value=100),
+             gateaux.BooleanField(name='open'))
+    value_codec = 'struct'
+
+
+class MetricsCounterTestStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value = (gateaux.CounterField(name='views'),)
+
+
+def structure_key(cls: type) -> str:
+    return f'{cls.__module__}.{cls.__qualname__}'
+
+
+class MetricsTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        gateaux.metrics.reset()
+
+    def tearDown(self) -> None:
+        gateaux.metrics.disable()
+        gateaux.metrics.reset()
+
+    def test_disabled(self) -> None:
+        self.assertFalse(gateaux.metrics.is_enabled())
+        test = MetricsTestStructure(MockFoundationSubspace())
+        test.unpack_key(test.pack_key(('test',)))
+        self.assertEqual(gateaux.metrics.snapshot()['structures'], {})
+
+    def test_enabled(self) -> None:
+        gateaux.metrics.enable()
+        self.assertTrue(gateaux.metrics.is_enabled())
+        test = MetricsTestStructure(MockFoundationSubspace())
+        packed_key = test.pack_key(('test',))
+        self.assertEqual(test.unpack_key(packed_key), ('test',))
+        packed_value = test.pack_value((10,))
+        self.assertEqual(test.unpack_value_dict(packed_value), {'seats': 10})
+        with self.assertRaises(gateaux.errors.ValidationError):
+            test.pack_value((101,))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            test.pack_value_dict({'seats': 'not int'})
+        snap = gateaux.metrics.snapshot()
+        structure = snap['structures'][structure_key(MetricsTestStructure)]
+        self.assertEqual(structure['name'], 'MetricsTestStructure')
+        ops = structure['operations']
+        self.assertEqual(ops['pack_key']['calls'], 1)
+        self.assertEqual(ops['pack_key']['bytes'], len(packed_key))
+        self.assertEqual(ops['unpack_key']['calls'], 1)
+        self.assertEqual(ops['unpack_key']['bytes'], len(packed_key))
+        self.assertEqual(ops['pack_value']['calls'], 1)
+        self.assertEqual(ops['pack_value']['errors'], 2)
+        self.assertEqual(ops['unpack_value']['calls'], 1)
+        self.assertEqual(sum(ops['pack_key']['size_histogram']['counts']), 1)
+        self.assertEqual(sum(ops['pack_key']['latency_histogram']['counts']), 1)
+        errors = structure['validation_errors']
+        self.assertEqual(errors, [{'part': 'value', 'index': 0, 'name': 'seats',
+                                   'count': 2}])
+        field_types = structure['field_types']
+        self.assertEqual(field_types['StringField']['calls'], 2)
+        self.assertEqual(field_types['IntegerField']['calls'], 4)
+        self.assertEqual(snap['field_types']['IntegerField']['calls'], 4)
+        gateaux.metrics.reset()
+        self.assertEqual(gateaux.metrics.snapshot()['structures'], {})
+
+    def test_codecs(self) -> None:
+        gateaux.metrics.enable()
+        fixed = MetricsStructTestStructure(MockFoundationSubspace())
+        counter = MetricsCounterTestStructure(MockFoundationSubspace())
+        for structure, value, invalid in ((fixed, (10, True), (101, True)),
+                                          (counter, (5,), ('5',))):
+            packed_value = structure.pack_value(value)
+            self.assertEqual(structure.unpack_value(packed_value), value)
+            self.assertEqual(structure.unpack_value(packed_value, fields=(0,)),
+                             value[:1])
+            with self.assertRaises(gateaux.errors.ValidationError):
+                structure.pack_value(invalid)
+            with self.assertRaises(gateaux.errors.ValidationError):
+                structure.unpack_value(b'\x00')
+            key = structure_key(structure.__class__)
+            metrics = gateaux.metrics.snapshot()['structures'][key]
+            ops = metrics['operations']
+            self.assertEqual(ops['pack_value']['calls'], 1)
+            self.assertEqual(ops['pack_value']['bytes'], len(packed_value))
+            self.assertEqual(ops['pack_value']['errors'], 1)
+            self.assertEqual(ops['unpack_value']['calls'], 2)
+            self.assertEqual(ops['unpack_value']['errors'], 1)
+            self.assertEqual(metrics['validation_errors'],
+                             [{'part': 'value', 'index': 0,
+                               'name': structure.value[0].name, 'count': 1}])
+
+    def test_same_name(self) -> None:
+        gateaux.metrics.enable()
+
+        class MetricsTestStructure(gateaux.Structure):
+            key = (gateaux.StringField(name='name'),)
+
+        outer = globals()['MetricsTestStructure'](MockFoundationSubspace())
+        inner = MetricsTestStructure(MockFoundationSubspace())
+        outer.pack_key(('test',))
+        inner.pack_key(('test',))
+        inner.pack_key(('test',))
+        structures = gateaux.metrics.snapshot()['structures']
+        self.assertEqual(len(structures), 2)
+        outer_metrics = structures[structure_key(outer.__class__)]
+        inner_metrics = structures[structure_key(MetricsTestStructure)]
+        self.assertEqual(outer_metrics['name'], 'MetricsTestStructure')
+        self.assertEqual(inner_metrics['name'], 'MetricsTestStructure')
+        self.assertEqual(outer_metrics['operations']['pack_key']['calls'], 1)
+        self.assertEqual(inner_metrics['operations']['pack_key']['calls'], 2)
+
+    def test_projection(self) -> None:
+        gateaux.metrics.enable()
+        test = MetricsTestStructure(MockFoundationSubspace())
+        packed_key = test.pack_key(('test',))
+        packed_value = test.pack_value((10,))
+        self.assertEqual(test.unpack_key(packed_key, fields=('name',)), ('test',))
+        self.assertEqual(test.unpack_value(packed_value, fields=('seats',)), (10,))
+        snap = gateaux.metrics.snapshot()['structures'][
+            structure_key(MetricsTestStructure)]
+        self.assertEqual(snap['operations']['unpack_key']['calls'], 1)
+        self.assertEqual(snap['operations']['unpack_value']['calls'], 1)
+        self.assertEqual(snap['operations']['unpack_value']['bytes'],
+                         len(packed_value))
+        self.assertEqual(snap['field_types']['StringField']['calls'], 2)
+        self.assertEqual(snap['field_types']['IntegerField']['calls'], 2)
+
+    def test_histogram(self) -> None:
+        histogram = gateaux.metrics.Histogram((10, 100))
+        for v in (1, 10, 11, 100, 1000):
+            histogram.observe(v)
+        self.assertEqual(histogram.counts, [2, 2, 1])
+
+    def test_exporter(self) -> None:
+        exported: List[Dict] = []
+        gateaux.metrics.add_exporter(exported.append)
+        gateaux.metrics.add_exporter(exported.append)
+        gateaux.metrics.enable()
+        test = MetricsTestStructure(MockFoundationSubspace())
+        test.pack_key(('test',))
+        snap = gateaux.metrics.export()
+        self.assertEqual(exported, [snap])
+        gateaux.metrics.remove_exporter(exported.append)
+        gateaux.metrics.export()
+        self.assertEqual(len(exported), 1)
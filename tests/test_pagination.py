@@ -0,0 +1,108 @@
+import unittest
+from typing import List, Optional, Tuple
+from fdb.subspace_impl import Subspace
+import gateaux
+from gateaux.testing import MemoryDatabase
+
+
+class OrdersStructure(gateaux.Structure):
+    key: Tuple[gateaux.BaseField, ...] = (gateaux.StringField(name='customer'),
+                                          gateaux.IntegerField(name='order'))
+    value: Tuple[gateaux.BaseField, ...] = (
+        gateaux.IntegerField(name='total'),
+        gateaux.StringField(name='status'),
+    )
+
+
+class ColumnOrdersStructure(OrdersStructure):
+    value_layout = 'columns'
+
+
+class HashedOrdersStructure(OrdersStructure):
+    key = (gateaux.HashPrefix(gateaux.StringField(name='customer'), buckets=4),
+           gateaux.IntegerField(name='order'))
+
+
+class ShardedCountsStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='page'),)
+    value = (gateaux.CounterField(name='views'),)
+    shards = 4
+
+
+class PaginationTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = MemoryDatabase()
+
+    def pages(self, structure: gateaux.Structure, prefix: tuple, limit: int,
+              reverse: bool = False) -> List[list]:
+        pages = []
+        cursor: Optional[str] = None
+        while True:
+            tr = self.db.create_transaction()
+            page = structure.page(tr, prefix, limit, cursor, reverse)
+            pages.append(page.rows)
+            if page.cursor is None:
+                return pages
+            cursor = page.cursor
+
+    def test_pages(self) -> None:
+        for structure in (OrdersStructure, ColumnOrdersStructure,
+                          HashedOrdersStructure):
+            self.db = MemoryDatabase()
+            orders = structure(Subspace(('orders',)))
+            tr = self.db.create_transaction()
+            for customer in ('ann', 'bob', 'cat'):
+                for order in range(7):
+                    orders.set(tr, (customer, order), (order * 10, 'paid'))
+            tr.commit().wait()
+            tr = self.db.create_transaction()
+            for prefix in ((), ('bob',)):
+                for reverse in (False, True):
+                    pages = self.pages(orders, prefix, 3, reverse)
+                    expected = list(orders.get_range(tr, prefix, reverse=reverse))
+                    self.assertEqual([row for page in pages for row in page],
+                                     expected)
+                    self.assertTrue(all(len(page) == 3 for page in pages[:-1]))
+            # An exactly filled last page has no cursor
+            self.assertEqual([len(page) for page in self.pages(orders, ('ann',), 7)],
+                             [7])
+            self.assertEqual(orders.page(tr, ('dan',)), gateaux.Page([], None))
+
+    def test_sharded(self) -> None:
+        counts = ShardedCountsStructure(Subspace(('counts',)))
+        tr = self.db.create_transaction()
+        for i, name in enumerate(('about', 'blog', 'home', 'shop', 'team')):
+            for _ in range(3):
+                counts.add(tr, (name,), i + 1)
+        tr.commit().wait()
+        pages = self.pages(counts, (), 2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        tr = self.db.create_transaction()
+        self.assertEqual([row for page in pages for row in page],
+                         list(counts.get_range(tr)))
+
+    def test_cursor_validation(self) -> None:
+        orders = OrdersStructure(Subspace(('orders',)))
+        tr = self.db.create_transaction()
+        for order in range(5):
+            orders.set(tr, ('ann', order), (order, 'paid'))
+        page = orders.page(tr, ('ann',), 2)
+        cursor = page.cursor
+        assert cursor is not None
+        self.assertEqual(orders.page(tr, ('ann',), 2, cursor).rows[0][0], ('ann', 2))
+        other = OrdersStructure(Subspace(('other-orders',)))
+        invalid = (
+            (orders, ('bob',), cursor, False),
+            (orders, (), cursor, False),
+            (orders, ('ann',), cursor, True),
+            (other, ('ann',), cursor, False),
+            (orders, ('ann',), 'not a cursor!', False),
+            (orders, ('ann',), cursor[:-3], False),
+            (orders, ('ann',), '', False),
+        )
+        for structure, prefix, bad, reverse in invalid:
+            with self.assertRaises(gateaux.errors.ValidationError):
+                structure.page(tr, prefix, 2, bad, reverse)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            orders.page(tr, ('ann',), 0)
@@ -0,0 +1,117 @@
+import unittest
+from uuid import UUID
+import fdb.tuple
+import gateaux
+from gateaux.projection import skip_element, project
+from test_structure import MockFoundationSubspace
+
+
+class EventStructure(gateaux.Structure):
+    key = (
+        gateaux.StringField(name='venue'),
+        gateaux.IntegerField(name='day'),
+        gateaux.StringField(name='event'),
+    )
+    value = (
+        gateaux.StringField(name='title'),
+        gateaux.BinaryField(name='poster'),
+        gateaux.IntegerField(name='seats'),
+        gateaux.FloatField(name='price'),
+        gateaux.BooleanField(name='sold_out'),
+    )
+
+
+class FixedEventStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='event'),)
+    value = (
+        gateaux.IntegerField(name='seats'),
+        gateaux.FloatField(name='price'),
+    )
+    value_codec = 'struct'
+
+
+class BucketedStructure(gateaux.Structure):
+    key = (
+        gateaux.HashPrefix(gateaux.IntegerField(name='ts'), buckets=8),
+        gateaux.StringField(name='host'),
+    )
+    value = (gateaux.IntegerField(name='status'),)
+
+
+VALUE = ('Gig\x00night', b'\x00\xff\x00', 2 ** 70, 12.5, False)
+
+
+class SkipElementTestCase(unittest.TestCase):
+
+    def test_skip_every_type(self) -> None:
+        values = (None, b'a\x00b', 'x\x00y', 0, 1, -1, 255, -256, 2 ** 70, -2 ** 70,
+                  1.5, fdb.tuple.SingleFloat(2.5), True, False, UUID(int=1),
+                  (1, None, (b'\x00',)), 'end')
+        data = fdb.tuple.pack(values)
+        pos, count = 0, 0
+        while pos < len(data):
+            next_pos = skip_element(data, pos)
+            self.assertEqual(fdb.tuple.unpack(data[pos:next_pos]), (values[count],))
+            pos, count = next_pos, count + 1
+        self.assertEqual(count, len(values))
+        self.assertEqual(project(data, 0, (2, 15, 16)),
+                         {2: values[2], 15: values[15], 16: values[16]})
+        self.assertEqual(skip_element(b'\x33' + b'\x01' * 12, 0), 13)
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(gateaux.errors.ValidationError):
+            skip_element(b'\x02abc', 0)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            skip_element(b'\x21\x00', 0)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            skip_element(b'\xfe', 0)
+
+
+class ProjectionTestCase(unittest.TestCase):
+
+    def test_unpack_value(self) -> None:
+        events = EventStructure(MockFoundationSubspace())
+        packed = events.pack_value(VALUE)
+        self.assertEqual(events.unpack_value(packed, fields=('seats',)), (2 ** 70,))
+        self.assertEqual(events.unpack_value(packed, fields=('sold_out', 'title')),
+                         (False, 'Gig\x00night'))
+        self.assertEqual(events.unpack_value(packed, fields=(1, 'price')),
+                         (b'\x00\xff\x00', 12.5))
+        self.assertEqual(events.unpack_value_dict(packed, fields=('price',)),
+                         {'price': 12.5})
+        for invalid in (('nope',), (5,), (True,), (), ['seats']):
+            with self.assertRaises(gateaux.errors.ValidationError):
+                events.unpack_value(packed, fields=invalid) # type: ignore
+        with self.assertRaises(gateaux.errors.ValidationError):
+            events.unpack_value(b'\x01\x01' + packed[2:], fields=('seats',))
+
+    def test_unpack_key(self) -> None:
+        events = EventStructure(MockFoundationSubspace())
+        packed = events.pack_key(('Hall', 20200101, 'Opening'))
+        self.assertEqual(events.unpack_key(packed, fields=('event', 'venue')),
+                         ('Opening', 'Hall'))
+        self.assertEqual(events.unpack_key_dict(packed, fields=('day',)),
+                         {'day': 20200101})
+        partial = events.pack_key(('Hall',))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            events.unpack_key(partial, fields=('event',))
+
+    def test_bucketed_key(self) -> None:
+        logs = BucketedStructure(MockFoundationSubspace())
+        packed = logs.pack_key((1600000000, 'web1'))
+        self.assertEqual(logs.unpack_key(packed, fields=('host', 'ts')),
+                         ('web1', 1600000000))
+
+    def test_struct_codec(self) -> None:
+        events = FixedEventStructure(MockFoundationSubspace())
+        packed = events.pack_value((100, 9.5))
+        self.assertEqual(events.unpack_value(packed, fields=('price',)), (9.5,))
+
+    def test_cache_bypassed(self) -> None:
+        class CachedEventStructure(EventStructure):
+            cache_size = 10
+        events = CachedEventStructure(MockFoundationSubspace())
+        packed = events.pack_value(VALUE)
+        self.assertEqual(events.unpack_value(packed, fields=('seats',)), (2 ** 70,))
+        self.assertEqual(events.unpack_value(packed), VALUE)
+        self.assertEqual(events.cache_stats()['value']['misses'], 1)
@@ -0,0 +1,181 @@
+import unittest
+from typing import Tuple
+from fdb.subspace_impl import Subspace
+import gateaux
+from gateaux.testing import MemoryDatabase, TransactionConflict
+
+
+class AvailabilityStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='class'),)
+    value: Tuple[gateaux.BaseField, ...] = (
+        gateaux.IntegerField(name='seats'),
+        gateaux.StringField(name='room'),
+    )
+
+
+class ColumnAvailabilityStructure(AvailabilityStructure):
+    value_layout = 'columns'
+
+
+class AttendingStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='student'), gateaux.StringField(name='class'))
+    views = (gateaux.View(name='classes', group_by=1),)
+
+
+class CountsStructure(gateaux.Structure):
+    key = (gateaux.StringField(),)
+    value = (gateaux.CounterField(),)
+
+
+class SamplesStructure(gateaux.Structure):
+    key = (gateaux.StringField(),)
+    value = (gateaux.ArrayField(dtype='i4', decode='array'),)
+
+
+class CountingTransaction:
+    '''
+        Wraps a transaction to count the reads made through it.
+    '''
+
+    def __init__(self, tr: gateaux.testing.MemoryTransaction) -> None:
+        self.tr = tr
+        self.snapshot = tr.snapshot
+        self.reads = 0
+
+    def get(self, key: bytes) -> object:
+        self.reads += 1
+        return self.tr.get(key)
+
+    def get_range(self, *args, **kwargs) -> object:
+        self.reads += 1
+        return self.tr.get_range(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self.tr, name)
+
+
+class ReadCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = MemoryDatabase()
+
+    def test_cached_reads(self) -> None:
+        for structure in (AvailabilityStructure, ColumnAvailabilityStructure):
+            availability = structure(Subspace(('availability',)))
+            tr = CountingTransaction(self.db.create_transaction())
+            availability.set(tr, ('chem',), (10, 'lab'))
+            availability.get(tr, ('chem',))
+            self.assertEqual(tr.reads, 1)
+            cache = gateaux.cache_reads(tr)
+            self.assertIs(gateaux.read_cache(tr), cache)
+            self.assertEqual(availability.get(tr, ('chem',)), (10, 'lab'))
+            self.assertEqual(availability.get(tr, ('chem',)), (10, 'lab'))
+            self.assertEqual(availability.get(tr, ('chem',), fields=('room',)),
+                             ('lab',))
+            loaded = availability.load(tr, ('chem',))
+            assert loaded is not None
+            self.assertEqual(loaded.seats, 10)
+            self.assertIsNone(availability.get(tr, ('bio',)))
+            self.assertIsNone(availability.get(tr, ('bio',)))
+            self.assertEqual(tr.reads, 3)
+            stats = cache.stats()
+            self.assertEqual((stats['hits'], stats['misses'], stats['size']),
+                             (4, 2, 2))
+            gateaux.uncache_reads(tr)
+            self.assertIsNone(gateaux.read_cache(tr))
+            availability.get(tr, ('chem',))
+            self.assertEqual(tr.reads, 4)
+
+    def test_read_your_writes(self) -> None:
+        for structure in (AvailabilityStructure, ColumnAvailabilityStructure):
+            availability = structure(Subspace(('availability',)))
+            tr = CountingTransaction(self.db.create_transaction())
+            gateaux.cache_reads(tr)
+            availability.set(tr, ('chem',), (10, 'lab'))
+            self.assertEqual(availability.get(tr, ('chem',)), (10, 'lab'))
+            availability.update(tr, ('chem',), {'seats': 9})
+            self.assertEqual(availability.get(tr, ('chem',)), (9, 'lab'))
+            availability.clear(tr, ('chem',))
+            self.assertIsNone(availability.get(tr, ('chem',)))
+            # Nothing was read, update() of a packed value read it from the cache
+            self.assertEqual(tr.reads, 0)
+
+    def test_clear_range(self) -> None:
+        availability = AvailabilityStructure(Subspace(('availability',)))
+        tr = self.db.create_transaction()
+        cache = gateaux.cache_reads(tr)
+        for name in ('art', 'bio', 'chem'):
+            availability.set(tr, (name,), (1, 'lab'))
+        availability.clear_range(tr, ('bio',))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(availability.get(tr, ('bio',)))
+        self.assertEqual(availability.get(tr, ('art',)), (1, 'lab'))
+        availability.clear_range(tr)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(availability.count(tr), 0)
+        self.assertIsNone(availability.get(tr, ('art',)))
+        attending = AttendingStructure(Subspace(('attending',)),
+                                       Subspace(('attending-views',)))
+        for student, name in (('ann', 'art'), ('ann', 'bio'), ('bob', 'art')):
+            attending.set(tr, (student, name), ())
+        attending.clear_range(tr, ('ann',))
+        self.assertEqual(attending.view(tr, ('ann',)), {'classes': 0})
+        self.assertEqual(attending.view(tr, ('bob',)), {'classes': 1})
+        self.assertEqual(list(attending.get_range(tr)), [(('bob', 'art'), ())])
+        with self.assertRaises(gateaux.errors.ValidationError):
+            attending.clear_range(tr, ('ann', 'art', 'x'))
+
+    def test_snapshot_conflicts(self) -> None:
+        availability = AvailabilityStructure(Subspace(('availability',)))
+        tr = self.db.create_transaction()
+        availability.set(tr, ('chem',), (10, 'lab'))
+        tr.commit().wait()
+        def conflicts(snapshot_only: bool) -> bool:
+            tr = self.db.create_transaction()
+            gateaux.cache_reads(tr)
+            availability.get(tr, ('chem',), snapshot=True)
+            if not snapshot_only:
+                # Served from the cache but still adds the key's read conflict
+                availability.get(tr, ('chem',))
+            availability.set(tr, ('bio',), (1, 'hall'))
+            other = self.db.create_transaction()
+            availability.set(other, ('chem',), (9, 'lab'))
+            other.commit().wait()
+            try:
+                tr.commit().wait()
+            except TransactionConflict:
+                return True
+            return False
+        self.assertFalse(conflicts(True))
+        self.assertTrue(conflicts(False))
+
+    def test_not_cached(self) -> None:
+        counts = CountsStructure(Subspace(('counts',)))
+        tr = CountingTransaction(self.db.create_transaction())
+        gateaux.cache_reads(tr)
+        counts.set(tr, ('a',), (1,))
+        counts.add(tr, ('a',), 2)
+        self.assertEqual(counts.get(tr, ('a',)), (3,))
+        self.assertEqual(tr.reads, 1)
+        # Values which can be modified are never shared from the cache
+        samples = SamplesStructure(Subspace(('samples',)))
+        samples.set(tr, ('a',), ([1, 2],))
+        first = samples.get(tr, ('a',))
+        assert first is not None
+        first[0].append(3)
+        second = samples.get(tr, ('a',))
+        assert second is not None
+        self.assertEqual(list(second[0]), [1, 2])
+
+    def test_bounded(self) -> None:
+        availability = AvailabilityStructure(Subspace(('availability',)))
+        tr = self.db.create_transaction()
+        cache = gateaux.cache_reads(tr, maxsize=2)
+        for name in ('art', 'bio', 'chem'):
+            availability.set(tr, (name,), (1, 'lab'))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(availability.get(tr, ('art',)), (1, 'lab'))
+        # Every attempt of a transaction starts with a new cache
+        self.assertIsNot(gateaux.cache_reads(tr), cache)
+        self.assertEqual(len(gateaux.read_cache(tr) or ()), 0)
@@ -0,0 +1,162 @@
+import unittest
+from array import array
+from typing import Tuple
+import gateaux
+from gateaux.fields import array as array_field
+from gateaux.testing import MemoryDatabase
+from test_structure import MockFoundationSubspace
+
+
+class ClassStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value: Tuple[gateaux.BaseField, ...] = (
+        gateaux.IntegerField(name='seats', max_value=100),
+        gateaux.StringField(name='room'),
+        gateaux.StringField(name='key', default='none'),
+    )
+
+
+class ColumnClassStructure(ClassStructure):
+    value_layout = 'columns'
+
+
+class ScoresStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value = (gateaux.ArrayField(name='scores', dtype='i4', decode='array'),)
+
+
+class RecordingTransaction:
+    '''
+        Wraps a transaction to record every write made through it.
+    '''
+
+    def __init__(self, tr: gateaux.testing.MemoryTransaction) -> None:
+        self.tr = tr
+        self.snapshot = tr.snapshot
+        self.writes: list = []
+
+    def get(self, key: bytes) -> object:
+        return self.tr.get(key)
+
+    def get_range(self, *args, **kwargs) -> object:
+        return self.tr.get_range(*args, **kwargs)
+
+    def add_read_conflict_key(self, key: bytes) -> None:
+        self.tr.add_read_conflict_key(key)
+
+    def set(self, key: bytes, value: bytes) -> None:
+        self.writes.append(key)
+        self.tr.set(key, value)
+
+    def clear(self, key: bytes) -> None:
+        self.writes.append(key)
+        self.tr.clear(key)
+
+
+class RecordTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = MemoryDatabase()
+
+    def test_record(self) -> None:
+        classes = ClassStructure(MockFoundationSubspace())
+        record = classes.new_record(('chem',), (10, 'lab', 'k1'))
+        self.assertFalse(record.stored)
+        self.assertTrue(record.dirty)
+        self.assertEqual(record.seats, 10)
+        self.assertEqual(record['room'], 'lab')
+        self.assertEqual(record[2], 'k1')
+        self.assertEqual(record.key, ('chem',))
+        record.seats = 9
+        record['key'] = 'k2'
+        self.assertEqual(record.value, (9, 'lab', 'k2'))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            record.seats = 'nine'
+        with self.assertRaises(gateaux.errors.ValidationError):
+            record['seats'] = 101
+        self.assertEqual(record.seats, 9)
+        with self.assertRaises(AttributeError):
+            record.nope = 1
+        with self.assertRaises(AttributeError):
+            record.key = 'k3' # type: ignore
+        with self.assertRaises(KeyError):
+            record['nope']
+        with self.assertRaises(gateaux.errors.ValidationError):
+            classes.new_record(('chem',), (1,))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            classes.new_record(())
+        self.assertEqual(classes.new_record(('bio',)).value, (None, None, 'none'))
+
+    def test_save(self) -> None:
+        classes = ClassStructure(MockFoundationSubspace())
+        tr = RecordingTransaction(self.db.create_transaction())
+        record = classes.new_record(('chem',), (10, 'lab', 'k1'))
+        self.assertTrue(classes.save(tr, record))
+        self.assertFalse(record.dirty)
+        self.assertEqual(len(tr.writes), 1)
+        loaded = classes.load(tr, ('chem',))
+        assert loaded is not None
+        self.assertTrue(loaded.stored)
+        # Assigning the stored value again is not a change
+        loaded.seats = 10
+        self.assertEqual(loaded.changed, ())
+        self.assertFalse(classes.save(tr, loaded))
+        self.assertEqual(len(tr.writes), 1)
+        loaded.seats = 9
+        self.assertEqual(loaded.changed, (0,))
+        self.assertTrue(classes.save(tr, loaded))
+        self.assertEqual(len(tr.writes), 2)
+        self.assertEqual(classes.get(tr, ('chem',)), (9, 'lab', 'k1'))
+        self.assertIsNone(classes.load(tr, ('bio',)))
+        other = ClassStructure(MockFoundationSubspace())
+        with self.assertRaises(gateaux.errors.ValidationError):
+            other.save(tr, loaded)
+
+    def test_save_columns(self) -> None:
+        classes = ColumnClassStructure(MockFoundationSubspace())
+        tr = RecordingTransaction(self.db.create_transaction())
+        classes.set(tr, ('chem',), (10, 'lab', 'k1'))
+        classes.set(tr, ('bio',), (5, 'hall', 'k2'))
+        tr.writes.clear()
+        for record in classes.records(tr):
+            if record.room == 'lab':
+                record.seats -= 1
+            classes.save(tr, record)
+        # Only the changed field of the changed record was written
+        self.assertEqual(tr.writes, [classes.pack_key(('chem',)) +
+                                     classes.column_suffixes[0]])
+        self.assertEqual(classes.get(tr, ('chem',)), (9, 'lab', 'k1'))
+
+    def test_mutable_values(self) -> None:
+        scores = ScoresStructure(MockFoundationSubspace())
+        tr = RecordingTransaction(self.db.create_transaction())
+        scores.set(tr, ('ann',), ([1, 2],))
+        loaded = scores.load(tr, ('ann',))
+        assert loaded is not None
+        self.assertFalse(loaded.dirty)
+        # Changing a loaded array in place is a change
+        loaded.scores.append(3)
+        self.assertEqual(loaded.changed, (0,))
+        self.assertTrue(scores.save(tr, loaded))
+        self.assertEqual(scores.get(tr, ('ann',)), (array('i', [1, 2, 3]),))
+        self.assertFalse(loaded.dirty)
+        loaded.scores[0] = 5
+        self.assertTrue(loaded.dirty)
+
+    @unittest.skipIf(array_field.numpy is None, 'NumPy is not installed')
+    def test_numpy_values(self) -> None:
+        numpy = array_field.numpy
+
+        class NumpyScoresStructure(gateaux.Structure):
+            key = (gateaux.StringField(name='name'),)
+            value = (gateaux.ArrayField(name='scores', dtype='i4', decode='numpy'),)
+
+        scores = NumpyScoresStructure(MockFoundationSubspace())
+        tr = RecordingTransaction(self.db.create_transaction())
+        scores.set(tr, ('ann',), ([1, 2],))
+        loaded = scores.load(tr, ('ann',))
+        assert loaded is not None
+        loaded.scores = numpy.array([1, 2], dtype='int32')
+        self.assertFalse(loaded.dirty)
+        loaded.scores = numpy.array([1, 2, 3], dtype='int32')
+        self.assertEqual(loaded.changed, (0,))
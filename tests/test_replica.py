@@ -0,0 +1,217 @@
+import os
+import tempfile
+import unittest
+from ipaddress import IPv4Network
+from fdb.subspace_impl import Subspace
+import gateaux
+from gateaux.testing import MemoryDatabase
+
+
+class NetworkStructure(gateaux.Structure):
+    key = (gateaux.IPv4NetworkField(name='network'),)
+    value = (gateaux.StringField(name='country'), gateaux.IntegerField(name='asn'))
+    watch_version = True
+
+
+class ColumnNetworkStructure(NetworkStructure):
+    value_layout = 'columns'
+
+
+class LoggedNetworkStructure(NetworkStructure):
+    changelog = True
+
+
+class LoggedColumnNetworkStructure(LoggedNetworkStructure):
+    value_layout = 'columns'
+
+
+class HashedStructure(gateaux.Structure):
+    key = (gateaux.HashPrefix(gateaux.StringField(name='name'), buckets=4),
+           gateaux.IntegerField(name='n'))
+    value = (gateaux.IntegerField(name='size'),)
+
+
+class ReplicaTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = MemoryDatabase()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'replica')
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def networks(self, structure: gateaux.Structure, count: int) -> None:
+        tr = self.db.create_transaction()
+        for i in range(count):
+            structure.set(tr, (IPv4Network(f'10.{i}.0.0/16'),), ('nz', i))
+        tr.commit().wait()
+
+    def test_lookups(self) -> None:
+        for structure in (NetworkStructure, ColumnNetworkStructure):
+            networks = structure(Subspace(('networks', structure.__name__)))
+            self.networks(networks, 25)
+            count = gateaux.write_replica(networks, self.db, self.path, batch_size=7)
+            self.assertEqual(count, 25 * networks.num_value_fields
+                             if networks.columns else 25)
+            replica = gateaux.Replica(networks, self.path)
+            self.assertEqual(len(replica), count)
+            self.assertEqual(replica.version, 25)
+            tr = self.db.create_transaction()
+            for i in (0, 12, 24):
+                key = (IPv4Network(f'10.{i}.0.0/16'),)
+                self.assertEqual(replica.lookup(key), networks.get(tr, key))
+            self.assertEqual(replica.lookup((IPv4Network('10.3.0.0/16'),),
+                                            fields=('asn',)), (3,))
+            self.assertIsNone(replica.lookup((IPv4Network('10.99.0.0/16'),)))
+            self.assertEqual(list(replica.scan()), list(networks.get_range(tr)))
+            self.assertEqual(list(replica.scan(limit=3, reverse=True)),
+                             list(networks.get_range(tr, limit=3, reverse=True)))
+            # Any read helper accepts a replica in place of a transaction
+            self.assertEqual(networks.count(replica), 25)
+            replica.close()
+
+    def test_prefix_scans(self) -> None:
+        hashed = HashedStructure(Subspace(('hashed',)))
+        tr = self.db.create_transaction()
+        for name in ('a', 'b', 'c'):
+            for n in range(5):
+                hashed.set(tr, (name, n), (n * 10,))
+        tr.commit().wait()
+        gateaux.write_replica(hashed, self.db, self.path)
+        replica = gateaux.Replica(hashed, self.path)
+        tr = self.db.create_transaction()
+        self.assertEqual(list(replica.scan(('b',))), list(hashed.get_range(tr, ('b',))))
+        self.assertEqual(list(replica.scan()), list(hashed.get_range(tr)))
+        self.assertEqual(replica.lookup(('c', 4)), (40,))
+        self.assertEqual(list(replica.scan(('z',))), [])
+
+    def test_refresh(self) -> None:
+        networks = NetworkStructure(Subspace(('networks',)))
+        self.networks(networks, 3)
+        gateaux.write_replica(networks, self.db, self.path)
+        replica = gateaux.Replica(networks, self.path)
+        other = gateaux.Replica(networks, self.path)
+        # Nothing has changed since the replica was written
+        self.assertFalse(replica.refresh(self.db))
+        key = (IPv4Network('10.1.0.0/16'),)
+        tr = self.db.create_transaction()
+        networks.set(tr, key, ('au', 7))
+        networks.clear(tr, (IPv4Network('10.2.0.0/16'),))
+        tr.commit().wait()
+        self.assertTrue(replica.refresh(self.db))
+        self.assertEqual(replica.version, 5)
+        self.assertEqual(replica.lookup(key), ('au', 7))
+        self.assertEqual(len(replica), 2)
+        # Other replicas of the file keep reading the old file until reloaded
+        self.assertEqual(other.lookup(key), ('nz', 1))
+        self.assertTrue(other.reload())
+        self.assertFalse(other.reload())
+        self.assertEqual(other.lookup(key), ('au', 7))
+
+    def test_incremental_refresh(self) -> None:
+        for structure in (LoggedNetworkStructure, LoggedColumnNetworkStructure):
+            name = structure.__name__
+            networks = structure(Subspace(('networks', name)),
+                                 changelog_subspace=Subspace(('log', name)))
+            self.networks(networks, 20)
+            gateaux.write_replica(networks, self.db, self.path)
+            replica = gateaux.Replica(networks, self.path)
+            cursor = replica.cursor
+            self.assertIsNotNone(cursor)
+            self.assertFalse(replica.refresh(self.db))
+            # A write which is not logged is only picked up by a full copy, so it
+            # shows which keys a refresh read again
+            unlogged = (IPv4Network('10.0.0.0/16'),)
+            tr = self.db.create_transaction()
+            if networks.columns:
+                raw = networks.pack_columns(unlogged, ('xx', 0))
+            else:
+                raw = [(networks.pack_key(unlogged), networks.pack_value(('xx', 0)))]
+            for key, value in raw:
+                tr.set(key, value)
+            tr.commit().wait()
+            tr = self.db.create_transaction()
+            networks.set(tr, (IPv4Network('10.1.0.0/16'),), ('au', 7))
+            networks.set(tr, (IPv4Network('10.99.0.0/16'),), ('us', 99))
+            networks.clear(tr, (IPv4Network('10.2.0.0/16'),))
+            if networks.columns:
+                networks.update(tr, (IPv4Network('10.3.0.0/16'),), {'asn': 33})
+            tr.commit().wait()
+            self.assertTrue(replica.refresh(self.db, batch_size=2))
+            self.assertNotEqual(replica.cursor, cursor)
+            self.assertEqual(replica.version, networks.version(
+                self.db.create_transaction()))
+            expected = [kv for kv in networks.get_range(self.db.create_transaction())
+                        if kv[0] != unlogged]
+            self.assertEqual([kv for kv in replica.scan() if kv[0] != unlogged],
+                             expected)
+            self.assertEqual(replica.lookup(unlogged), ('nz', 0))
+            self.assertFalse(replica.refresh(self.db))
+            tr = self.db.create_transaction()
+            networks.clear_range(tr)
+            tr.commit().wait()
+            self.assertTrue(replica.refresh(self.db))
+            self.assertEqual(list(replica.scan()), [])
+            replica.close()
+
+    def test_refresh_fallback(self) -> None:
+        networks = LoggedNetworkStructure(Subspace(('networks',)),
+                                          changelog_subspace=Subspace(('log',)))
+        self.networks(networks, 2)
+        gateaux.write_replica(networks, self.db, self.path)
+        replica = gateaux.Replica(networks, self.path)
+        # More keys changed than the replica holds copies every key again
+        self.networks(networks, 5)
+        self.assertTrue(replica.refresh(self.db))
+        self.assertEqual(len(replica), 5)
+        self.assertEqual(list(replica.scan()),
+                         list(networks.get_range(self.db.create_transaction())))
+        # Replicas of structures without a change log have no cursor
+        plain = NetworkStructure(Subspace(('networks',)))
+        gateaux.write_replica(plain, self.db, self.path)
+        self.assertTrue(replica.reload())
+        self.assertIsNone(replica.cursor)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            replica.refresh(self.db, batch_size=0)
+
+    def test_unmapping(self) -> None:
+        networks = NetworkStructure(Subspace(('networks',)))
+        self.networks(networks, 3)
+        gateaux.write_replica(networks, self.db, self.path)
+        replica = gateaux.Replica(networks, self.path)
+        first = replica._file
+        rows = replica.get_range(b'', b'\xff')
+        next(rows)
+        self.networks(networks, 4)
+        gateaux.write_replica(networks, self.db, self.path)
+        self.assertTrue(replica.reload())
+        # The old file stays mapped until the read in progress finishes
+        self.assertFalse(first.data.closed)
+        self.assertEqual(len(list(rows)), 2)
+        self.assertTrue(first.data.closed)
+        second = replica._file
+        self.networks(networks, 5)
+        gateaux.write_replica(networks, self.db, self.path)
+        self.assertTrue(replica.reload())
+        self.assertTrue(second.data.closed)
+        self.assertEqual(len(replica), 5)
+        replica.close()
+        self.assertTrue(replica._file.data.closed)
+        with self.assertRaises(ValueError):
+            replica.lookup((IPv4Network('10.1.0.0/16'),))
+
+    def test_empty_and_invalid(self) -> None:
+        networks = NetworkStructure(Subspace(('networks',)))
+        self.assertEqual(gateaux.write_replica(networks, self.db, self.path), 0)
+        replica = gateaux.Replica(networks, self.path)
+        self.assertEqual(list(replica.scan()), [])
+        self.assertIsNone(replica.lookup((IPv4Network('10.0.0.0/16'),)))
+        with open(self.path, 'wb') as f:
+            f.write(b'not a replica file' * 4)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            gateaux.Replica(networks, self.path)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            gateaux.write_replica(networks, self.db, self.path, batch_size=0)
+        # Failed writes leave no temporary files behind
+        self.assertEqual(os.listdir(self.directory.name), ['replica'])
@@ -0,0 +1,156 @@
+import threading
+import unittest
+import gateaux
+from gateaux.testing import MemoryDatabase, transactional
+from test_structure import MockFoundationSubspace
+
+
+class GlobalCounterStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value = (gateaux.CounterField(name='count'),)
+    shards = 8
+
+
+class HashedMaxStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value = (gateaux.MaxField(name='highest'),)
+    shards = 4
+    shard_by = 'hash'
+
+
+class PageViewsStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='page'), gateaux.IntegerField(name='day'))
+    value = (gateaux.CounterField(name='views'),)
+    shards = 4
+
+
+class HashedPageViewsStructure(gateaux.Structure):
+    key = (gateaux.HashPrefix(gateaux.StringField(name='page'), buckets=4),
+           gateaux.IntegerField(name='day'))
+    value = (gateaux.CounterField(name='views'),)
+
+
+class ShardingTestCase(unittest.TestCase):
+
+    def test_validation(self) -> None:
+        mock_ss = MockFoundationSubspace()
+        class NotAtomicStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.IntegerField(),)
+            shards = 4
+        with self.assertRaises(gateaux.errors.StructureError):
+            NotAtomicStructure(mock_ss)
+        class BadShardByStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.CounterField(),)
+            shards = 4
+            shard_by = 'round robin'
+        with self.assertRaises(gateaux.errors.StructureError):
+            BadShardByStructure(mock_ss)
+        class NegativeShardsStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            shards = -1
+        with self.assertRaises(gateaux.errors.StructureError):
+            NegativeShardsStructure(mock_ss)
+        counter = GlobalCounterStructure(mock_ss)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            counter.pack_shard_key(('c',), -1)
+        with self.assertRaises(gateaux.errors.ValidationError):
+            counter.get(MemoryDatabase().create_transaction(), ())
+
+    def test_keys(self) -> None:
+        counter = GlobalCounterStructure(MockFoundationSubspace())
+        key = counter.pack_shard_key(('c',), 3)
+        self.assertEqual(key, MockFoundationSubspace().pack((3, 'c')))
+        self.assertEqual(counter.unpack_shard_key(key), ('c',))
+        self.assertEqual(counter.unpack_shard_key(key, ('name',)), ('c',))
+        begin, end = counter.shard_range(3)
+        self.assertTrue(begin <= key < end)
+        hashed = HashedMaxStructure(MockFoundationSubspace())
+        self.assertEqual(hashed.choose_shard('writer-1'), hashed.choose_shard('writer-1'))
+        self.assertEqual(len({hashed.choose_shard(i) for i in range(100)}), 4)
+
+    def test_round_trip(self) -> None:
+        mock_ss = MockFoundationSubspace()
+        for structure, key_tuple in (
+                (GlobalCounterStructure(mock_ss), ('c',)),
+                (PageViewsStructure(mock_ss), ('home', 7)),
+                (PageViewsStructure(mock_ss), ('home',)),
+                (HashedPageViewsStructure(mock_ss), ('home', 7)),
+                (HashedPageViewsStructure(mock_ss), ('home',))):
+            packed = structure.pack_key(key_tuple)
+            self.assertEqual(structure.unpack_key(packed), key_tuple)
+            self.assertEqual(structure.unpack_key(packed, (0,)), key_tuple[:1])
+        views = PageViewsStructure(mock_ss)
+        self.assertEqual(views.unpack_shard_key(views.pack_shard_key(('home', 7), 2)),
+                         ('home', 7))
+        with self.assertRaises(gateaux.errors.StructureError):
+            HashedPageViewsStructure(mock_ss).unpack_shard_key(packed)
+        # Stored keys of both structures read back through get_range()
+        db = MemoryDatabase()
+        tr = db.create_transaction()
+        for structure in (views, HashedPageViewsStructure(mock_ss)):
+            structure.add(tr, ('home', 7), 2)
+            structure.add(tr, ('about', 1), 1)
+            self.assertEqual(list(structure.get_range(tr)),
+                             [(('about', 1), (1,)), (('home', 7), (2,))])
+            tr.clear_range(b'', b'\xff')
+
+    def test_counter(self) -> None:
+        db = MemoryDatabase(latency=0.0002)
+        counter = GlobalCounterStructure(MockFoundationSubspace())
+        @transactional
+        def increment(tr) -> None:
+            counter.add(tr, ('c',), 1)
+        def worker() -> None:
+            for _ in range(50):
+                increment(db)
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.get(db.create_transaction(), ('c',)), (200,))
+        self.assertEqual(db.conflicts, 0)
+        # The writes were spread over more than one shard
+        self.assertGreater(len(db.get_range(b'\x00', b'\xff')), 1)
+        self.assertIsNone(counter.get(db.create_transaction(), ('missing',)))
+        tr = db.create_transaction()
+        counter.set(tr, ('c',), (5,))
+        tr.commit().wait()
+        self.assertEqual(len(db.get_range(b'\x00', b'\xff')), 1)
+        self.assertEqual(counter.get(db.create_transaction(), ('c',)), (5,))
+        tr = db.create_transaction()
+        counter.clear(tr, ('c',))
+        tr.commit().wait()
+        self.assertEqual(db.get_range(b'\x00', b'\xff'), [])
+
+    def test_combine(self) -> None:
+        db = MemoryDatabase()
+        highest = HashedMaxStructure(MockFoundationSubspace())
+        tr = db.create_transaction()
+        for i, v in enumerate((3, 9, 4, 1)):
+            highest.max(tr, ('h',), v, shard_hint=f'writer-{i}')
+        self.assertEqual(highest.get(tr, ('h',)), (9,))
+        counter = GlobalCounterStructure(MockFoundationSubspace())
+        self.assertEqual(counter.combine_shards([2 ** 63 - 1, 1]), -2 ** 63)
+
+    def test_reshard(self) -> None:
+        db = MemoryDatabase()
+        counter = GlobalCounterStructure(MockFoundationSubspace())
+        tr = db.create_transaction()
+        for name in ('a', 'b', 'c'):
+            for shard in range(8):
+                tr.add(counter.pack_shard_key((name,), shard),
+                       counter.pack_value((shard + 1,)))
+        tr.commit().wait()
+        with self.assertRaises(gateaux.errors.StructureError):
+            counter.reshard(db, 0)
+        moved = counter.reshard(db, 3, batch_size=2)
+        self.assertEqual(moved, 15)
+        self.assertEqual((counter.shards, counter.read_shards), (3, 3))
+        for name in ('a', 'b', 'c'):
+            self.assertEqual(counter.get(db.create_transaction(), (name,)), (36,))
+        self.assertEqual(len(db.get_range(b'\x00', b'\xff')), 9)
+        self.assertEqual(counter.reshard(db, 6), 0)
+        self.assertEqual(counter.get(db.create_transaction(), ('a',)), (36,))
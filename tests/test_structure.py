@@ -1,4 +1,4 @@
-from typing import Tuple
+from typing import Optional, Tuple
 import unittest
 import fdb.tuple
 import gateaux
@@ -17,7 +17,7 @@ class MockFoundationSubspace:
     def __init__(self, *args, **kwargs) -> None:
         self.data:dict = {}
 
-    def __getitem__(self, key: bytes) -> bytes:
+    def __getitem__(self, key: bytes) -> Optional[bytes]:
         return self.data.get(key)
 
     def __setitem__(self, key: bytes, value: bytes) -> bool:
@@ -38,6 +38,13 @@ class MockFoundationSubspace:
         else:
             return fdb.tuple.pack(v)
 
+    def pack_with_versionstamp(self, v: Tuple, prefix: bool = True) -> bytes:
+        '''
+            Pack a tuple containing an incomplete versionstamp, the offset includes
+            the simulated directory prefix.
+        '''
+        return fdb.tuple.pack_with_versionstamp(v, prefix=b'\x00\x00' if prefix else None)
+
     def unpack(self, v:bytes, prefix: bool = True) -> tuple:
         '''
             Truncate the first two bytes then unpack the tuple.
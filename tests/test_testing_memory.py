@@ -0,0 +1,185 @@
+import threading
+import unittest
+from gateaux.testing import (MemoryDatabase, TransactionConflict, OperationCancelled,
+                             transactional)
+
+
+class MemoryDatabaseTestCase(unittest.TestCase):
+
+    def test_read_write(self) -> None:
+        db = MemoryDatabase()
+        db[b'a'] = b'1'
+        db[b'b'] = b'2'
+        db[b'c'] = b'3'
+        self.assertEqual(db[b'a'], b'1')
+        self.assertEqual(db[b'missing'], None)
+        self.assertEqual([tuple(kv) for kv in db[b'a':b'c']],
+                         [(b'a', b'1'), (b'b', b'2')])
+        self.assertEqual([kv.key for kv in db.get_range(b'a', b'z', reverse=True)],
+                         [b'c', b'b', b'a'])
+        self.assertEqual([kv.key for kv in db.get_range(b'a', b'z', limit=2)],
+                         [b'a', b'b'])
+        del db[b'a']
+        self.assertEqual(db[b'a'], None)
+        del db[b'a':b'z']
+        self.assertEqual(list(db[b'':b'\xff']), [])
+
+    def test_read_your_writes(self) -> None:
+        db = MemoryDatabase()
+        db[b'a'] = b'1'
+        db[b'b'] = b'2'
+        tr = db.create_transaction()
+        tr[b'c'] = b'3'
+        del tr[b'a']
+        self.assertEqual(tr[b'c'], b'3')
+        self.assertEqual(tr[b'a'], None)
+        self.assertEqual([kv.key for kv in tr[b'a':b'z']], [b'b', b'c'])
+        tr.clear_range(b'b', b'z')
+        self.assertEqual(list(tr[b'a':b'z']), [])
+        # Nothing is visible outside the transaction until it commits
+        self.assertEqual(db[b'a'], b'1')
+        tr.commit().wait()
+        self.assertEqual(db[b'a'], None)
+        self.assertEqual(db[b'b'], None)
+        self.assertEqual(db.commits, 3)
+
+    def test_conflict(self) -> None:
+        db = MemoryDatabase()
+        db[b'counter'] = b'0'
+        tr1 = db.create_transaction()
+        tr2 = db.create_transaction()
+        tr1[b'counter'] = tr1[b'counter'] + b'1'
+        tr2[b'counter'] = tr2[b'counter'] + b'2'
+        tr1.commit().wait()
+        with self.assertRaises(TransactionConflict):
+            tr2.commit().wait()
+        self.assertEqual(db.conflicts, 1)
+        tr2.on_error(TransactionConflict()).wait()
+        tr2[b'counter'] = tr2[b'counter'] + b'2'
+        tr2.commit().wait()
+        self.assertEqual(db[b'counter'], b'012')
+        # Snapshot reads and write-only transactions never conflict
+        tr1 = db.create_transaction()
+        tr2 = db.create_transaction()
+        tr1.snapshot[b'counter']
+        tr1[b'other'] = b''
+        tr2[b'counter'] = b''
+        tr2.commit().wait()
+        tr1.commit().wait()
+        # Only the part of a limited range which was read conflicts
+        tr1 = db.create_transaction()
+        self.assertEqual(len(tr1.get_range(b'a', b'z', limit=1)), 1)
+        db[b'zz'] = b''
+        db[b'p'] = b''
+        tr1[b'x'] = b''
+        tr1.commit().wait()
+        with self.assertRaises(ValueError):
+            tr1.on_error(ValueError())
+
+    def test_write_conflict_pruning(self) -> None:
+        db = MemoryDatabase()
+        old = db.create_transaction()
+        old.get(b'a')
+        for _ in range(10):
+            tr = db.create_transaction()
+            tr.add_write_conflict_key(b'a')
+            tr.commit().wait()
+        # Kept while a transaction which could conflict with them is live
+        self.assertEqual(len(db._write_conflicts), 10)
+        with self.assertRaises(TransactionConflict):
+            old.commit().wait()
+        old.on_error(TransactionConflict()).wait()
+        for _ in range(10):
+            tr = db.create_transaction()
+            tr.add_write_conflict_key(b'a')
+            tr.commit().wait()
+        self.assertEqual(len(db._write_conflicts), 1)
+        del old
+        tr = db.create_transaction()
+        tr.clear_range(b'a', b'b')
+        tr.commit().wait()
+        self.assertEqual(len(db._write_conflicts), 1)
+
+    def test_transactional(self) -> None:
+        db = MemoryDatabase(latency=0.0005)
+        db[b'counter'] = (0).to_bytes(8, 'little')
+        @transactional
+        def increment(tr) -> None:
+            v = int.from_bytes(tr[b'counter'], 'little')
+            tr[b'counter'] = (v + 1).to_bytes(8, 'little')
+        def worker() -> None:
+            for _ in range(20):
+                increment(db)
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(int.from_bytes(db[b'counter'], 'little'), 80)
+        # Passing a transaction through does not commit
+        tr = db.create_transaction()
+        increment(tr)
+        self.assertEqual(int.from_bytes(db[b'counter'], 'little'), 80)
+        tr.commit().wait()
+        self.assertEqual(int.from_bytes(db[b'counter'], 'little'), 81)
+
+    def test_versionstamps(self) -> None:
+        db = MemoryDatabase()
+        db[b'other'] = b'1'
+        tr = db.create_transaction()
+        offset = (4).to_bytes(4, 'little')
+        tr.set_versionstamped_key(b'log/' + b'\xff' * 10 + offset, b'entry')
+        tr.set_versionstamped_value(b'last', b'v:' + b'\xff' * 10 + (2).to_bytes(4, 'little'))
+        with self.assertRaises(ValueError):
+            tr.set_versionstamped_key(b'short', b'')
+        # Versionstamped keys are not readable until committed
+        self.assertEqual(tr.get_range(b'log/', b'log0'), [])
+        future = tr.get_versionstamp()
+        tr.commit().wait()
+        stamp = future.wait()
+        self.assertEqual(stamp, db.version.to_bytes(8, 'big') + b'\x00\x00')
+        self.assertEqual([tuple(kv) for kv in db.get_range(b'log/', b'log0')],
+                         [(b'log/' + stamp, b'entry')])
+        self.assertEqual(db[b'last'], b'v:' + stamp)
+
+    def test_watches(self) -> None:
+        db = MemoryDatabase()
+        db[b'a'] = b'1'
+        tr = db.create_transaction()
+        watch = tr.watch(b'a')
+        missing = tr.watch(b'missing')
+        fired: list = []
+        watch.on_ready(fired.append)
+        tr.commit().wait()
+        self.assertFalse(watch.is_ready())
+        # Writing the same value does not change the key
+        db[b'a'] = b'1'
+        self.assertFalse(watch.is_ready())
+        db[b'b'] = b'2'
+        db[b'a'] = b'2'
+        self.assertEqual(fired, [watch])
+        watch.wait()
+        self.assertFalse(missing.is_ready())
+        del db[b'':b'z']
+        self.assertFalse(missing.is_ready())
+        db[b'missing'] = b''
+        missing.wait()
+        # A watch of a key changed before the transaction commits fires at once
+        tr = db.create_transaction()
+        watch = tr.watch(b'a')
+        db[b'a'] = b'3'
+        tr.commit().wait()
+        self.assertTrue(watch.is_ready())
+        # Watches are cancelled if the transaction is reset before committing
+        tr = db.create_transaction()
+        watch = tr.watch(b'a')
+        tr.on_error(TransactionConflict()).wait()
+        with self.assertRaises(OperationCancelled):
+            watch.wait()
+        tr = db.create_transaction()
+        watch = tr.watch(b'a')
+        tr.commit().wait()
+        watch.cancel()
+        db[b'a'] = b'4'
+        with self.assertRaises(OperationCancelled):
+            watch.wait()
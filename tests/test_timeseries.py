@@ -0,0 +1,175 @@
+import threading
+import unittest
+from array import array
+from datetime import datetime, timezone
+from fdb.subspace_impl import Subspace
+import gateaux
+from gateaux.testing import MemoryDatabase, transactional
+from test_structure import MockFoundationSubspace
+
+
+class TemperatureSeries(gateaux.TimeSeriesStructure):
+    key = (gateaux.StringField(name='sensor'),)
+    bucket_size = 'hour'
+    dtype = 'f8'
+    sample_interval = 1
+
+
+class CountSeries(gateaux.TimeSeriesStructure):
+    key = (gateaux.StringField(name='sensor'),)
+    bucket_size = 'day'
+    dtype = 'i4'
+
+
+class LoggedSeries(gateaux.TimeSeriesStructure):
+    key = (gateaux.StringField(name='sensor'),)
+    dtype = 'i4'
+    watch_version = True
+    changelog = True
+    changelog_values = True
+
+
+class AtomicLoggedSeries(LoggedSeries):
+    sample_interval = 1
+
+
+class TimeSeriesStructureTestCase(unittest.TestCase):
+
+    def test_validation(self) -> None:
+        mock_ss = MockFoundationSubspace()
+        class NoSeriesKey(gateaux.TimeSeriesStructure):
+            key = ()
+        with self.assertRaises(gateaux.errors.StructureError):
+            NoSeriesKey(mock_ss)
+        class BadBucket(gateaux.TimeSeriesStructure):
+            key = (gateaux.StringField(),)
+            bucket_size = 'fortnight'
+        with self.assertRaises(gateaux.errors.StructureError):
+            BadBucket(mock_ss)
+        class BadDtype(gateaux.TimeSeriesStructure):
+            key = (gateaux.StringField(),)
+            dtype = 'u2'
+        with self.assertRaises(gateaux.errors.StructureError):
+            BadDtype(mock_ss)
+        class WithValue(gateaux.TimeSeriesStructure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.FloatField(),)
+        with self.assertRaises(gateaux.errors.StructureError):
+            WithValue(mock_ss)
+        # 3600 one second samples of 16 bytes fit in a value, 86400 do not
+        self.assertTrue(TemperatureSeries(mock_ss).atomic_appends)
+        self.assertFalse(CountSeries(mock_ss).atomic_appends)
+
+    def test_pack_samples(self) -> None:
+        series = CountSeries(MockFoundationSubspace())
+        start = series.bucket_start(datetime(2020, 1, 2, 3, tzinfo=timezone.utc))
+        self.assertEqual(start, 1577923200)
+        self.assertEqual(series.bucket_start(1577923200 + 86399.5), start)
+        packed = series.pack_samples(start, ((start + 1, 5), (start + 2.5, -7)))
+        self.assertEqual(len(packed), 16)
+        timestamps, values = series.unpack_samples(start, packed)
+        self.assertEqual(timestamps, array('q', [1577923201000, 1577923202500]))
+        self.assertEqual(values, array('i', [5, -7]))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            series.pack_samples(start, ((start - 1, 5),))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            series.pack_samples(start, ((start, 1.5),))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            series.pack_samples(start, ((start, 2 ** 40),))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            series.pack_samples(start, (('now', 1),)) # type: ignore
+        with self.assertRaises(gateaux.errors.ValidationError):
+            series.unpack_samples(start, packed[:-1])
+
+    def test_append_and_query(self) -> None:
+        db = MemoryDatabase()
+        temps = TemperatureSeries(MockFoundationSubspace())
+        start = 1577923200
+        tr = db.create_transaction()
+        temps.append_samples(tr, ('kitchen',),
+                             ((start + i * 60, float(i)) for i in range(180)))
+        temps.append_sample(tr, ('garden',), start, 1.0)
+        tr.commit().wait()
+        # Three hour buckets for the kitchen and one for the garden
+        self.assertEqual(len(db.get_range(b'\x00', b'\xff')), 4)
+        tr = db.create_transaction()
+        timestamps, values = temps.query(tr, ('kitchen',), start, start + 3 * 3600)
+        self.assertEqual(list(values), [float(i) for i in range(180)])
+        self.assertEqual(timestamps[0], start * 1000)
+        timestamps, values = temps.query(tr, ('kitchen',), start + 3000, start + 3660)
+        self.assertEqual(list(values), [50.0 + i for i in range(11)])
+        self.assertEqual(temps.query(tr, ('kitchen',), start, start), (array('q'),
+                                                                      array('d')))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            temps.query(tr, (), start, start + 1)
+
+    def test_write_hooks(self) -> None:
+        start = 1577923200
+        for structure in (LoggedSeries, AtomicLoggedSeries):
+            db = MemoryDatabase()
+            series = structure(Subspace(('series',)),
+                               changelog_subspace=Subspace(('series-log',)))
+            self.assertEqual(series.atomic_appends, structure is AtomicLoggedSeries)
+            tr = db.create_transaction()
+            series.append_samples(tr, ('kitchen',), ((start, 1), (start + 3600, 2)))
+            tr.commit().wait()
+            tr = db.create_transaction()
+            self.assertEqual(series.version(tr), 2)
+            changes = series.changes(tr)
+            self.assertEqual([(c.op, c.key) for c in changes],
+                             [('append_samples', ('kitchen', start)),
+                              ('append_samples', ('kitchen', start + 3600))])
+            timestamps, values = changes[1].value
+            self.assertEqual((list(timestamps), list(values)),
+                             ([(start + 3600) * 1000], [2]))
+        class ViewSeries(gateaux.TimeSeriesStructure):
+            key = (gateaux.StringField(name='sensor'),)
+            views = (gateaux.View(name='buckets'),)
+        with self.assertRaises(gateaux.errors.StructureError):
+            ViewSeries(Subspace(('series',)), Subspace(('views',)))
+
+    def test_atomic_appends(self) -> None:
+        db = MemoryDatabase(latency=0.0002)
+        temps = TemperatureSeries(MockFoundationSubspace())
+        start = 1577923200
+        @transactional
+        def record(tr, i) -> None:
+            temps.append_sample(tr, ('kitchen',), start + i, float(i))
+        def worker(offset: int) -> None:
+            for i in range(offset, 100, 4):
+                record(db, i)
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(db.conflicts, 0)
+        _, values = temps.query(db.create_transaction(), ('kitchen',), start,
+                                start + 3600)
+        self.assertEqual(sorted(values), [float(i) for i in range(100)])
+
+    def test_full_atomic_bucket(self) -> None:
+        db = MemoryDatabase()
+        temps = TemperatureSeries(MockFoundationSubspace())
+        start = 1577923200
+        tr = db.create_transaction()
+        samples = [(start + i % 3600, 1.0) for i in range(temps.max_samples)]
+        temps.append_samples(tr, ('kitchen',), samples)
+        tr.commit().wait()
+        # Samples closer together than sample_interval overfill the bucket, which
+        # raises rather than append_if_fits dropping the write
+        tr = db.create_transaction()
+        with self.assertRaises(gateaux.errors.ValidationError):
+            temps.append_sample(tr, ('kitchen',), start, 2.0)
+        self.assertEqual(tr._read_ranges, [])
+        _, values = temps.query(tr, ('kitchen',), start, start + 3600, snapshot=True)
+        self.assertEqual(len(values), temps.max_samples)
+        self.assertEqual(tr._read_ranges, [])
+
+    def test_full_bucket(self) -> None:
+        db = MemoryDatabase()
+        counts = CountSeries(MockFoundationSubspace())
+        tr = db.create_transaction()
+        counts.append_samples(tr, ('door',), ((i, 1) for i in range(counts.max_samples)))
+        with self.assertRaises(gateaux.errors.ValidationError):
+            counts.append_sample(tr, ('door',), 1, 1)
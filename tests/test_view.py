@@ -0,0 +1,96 @@
+import unittest
+from fdb.subspace_impl import Subspace
+import gateaux
+from gateaux.testing import MemoryDatabase, transactional
+from test_structure import MockFoundationSubspace
+
+
+class Attending(gateaux.Structure):
+    key = (
+        gateaux.StringField(name='student'),
+        gateaux.StringField(name='class'),
+    )
+    value = (gateaux.IntegerField(name='credits', null=True),)
+    views = (
+        gateaux.View(name='classes', group_by=1),
+        gateaux.View(name='credits', group_by=1, op='sum', field='credits'),
+        gateaux.View(name='total', group_by=0),
+    )
+
+
+class ViewTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = MemoryDatabase()
+        self.attending = Attending(Subspace(('attending',)),
+                                   Subspace(('attending-views',)))
+
+    def test_maintained(self) -> None:
+        attending = self.attending
+        @transactional
+        def write(tr):
+            attending.set(tr, ('ann', 'chem'), (10,))
+            attending.set(tr, ('ann', 'bio'), (5,))
+            attending.set(tr, ('bob', 'chem'), (10,))
+        write(self.db)
+        tr = self.db.create_transaction()
+        self.assertEqual(attending.view(tr, ('ann',)), {'classes': 2, 'credits': 15})
+        self.assertEqual(attending.view(tr, ()), {'total': 3})
+        self.assertEqual(attending.view(tr, ('cat',)), {'classes': 0, 'credits': 0})
+        # Overwriting a key only changes the sum, clearing removes it
+        attending.set(tr, ('ann', 'bio'), (7,))
+        self.assertEqual(attending.view(tr, ('ann',)), {'classes': 2, 'credits': 17})
+        attending.clear(tr, ('ann', 'chem'))
+        attending.clear(tr, ('ann', 'art'))
+        self.assertEqual(attending.view(tr, ('ann',)), {'classes': 1, 'credits': 7})
+        self.assertEqual(attending.view(tr, ()), {'total': 2})
+        tr.commit().wait()
+        with self.assertRaises(gateaux.errors.ValidationError):
+            attending.view(tr, ('ann', 'bio'))
+
+    def test_rebuild(self) -> None:
+        attending = self.attending
+        tr = self.db.create_transaction()
+        for i in range(7):
+            attending.set(tr, (f'student{i % 3}', f'class{i}'), (i,))
+        # Lose the views, as if they were added to existing data
+        views = attending.views_subspace.range(())
+        tr.clear_range(views.start, views.stop)
+        tr.commit().wait()
+        self.assertEqual(attending.rebuild_views(self.db, batch_size=2), 7)
+        tr = self.db.create_transaction()
+        self.assertEqual(attending.view(tr, ('student0',)),
+                         {'classes': 3, 'credits': 9})
+        self.assertEqual(attending.view(tr, ()), {'total': 7})
+        # Rebuilding again replaces the views
+        attending.rebuild_views(self.db)
+        self.assertEqual(attending.view(self.db.create_transaction(), ()),
+                         {'total': 7})
+
+    def test_validation(self) -> None:
+        with self.assertRaises(gateaux.errors.StructureError):
+            gateaux.View(name='x', op='sum')
+        with self.assertRaises(gateaux.errors.StructureError):
+            gateaux.View(name='x', field='credits')
+        with self.assertRaises(gateaux.errors.StructureError):
+            gateaux.View(group_by=1)
+        with self.assertRaises(gateaux.errors.StructureError):
+            Attending(MockFoundationSubspace())
+        class StringSumStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.StringField(name='name'),)
+            views = (gateaux.View(name='names', op='sum', field='name'),)
+        class WideViewStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            views = (gateaux.View(name='wide', group_by=2),)
+        class CounterViewStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.CounterField(),)
+            views = (gateaux.View(name='counters'),)
+        class DuplicateViewStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            views = (gateaux.View(name='a'), gateaux.View(name='a'))
+        for structure in (StringSumStructure, WideViewStructure, CounterViewStructure,
+                          DuplicateViewStructure):
+            with self.assertRaises(gateaux.errors.StructureError):
+                structure(MockFoundationSubspace(), MockFoundationSubspace())
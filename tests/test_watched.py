@@ -0,0 +1,138 @@
+import unittest
+from typing import List
+from fdb.subspace_impl import Subspace
+import gateaux
+from gateaux.testing import MemoryDatabase
+
+
+class SettingStructure(gateaux.Structure):
+    key = (gateaux.StringField(name='name'),)
+    value = (gateaux.StringField(name='value'), gateaux.IntegerField(name='revision'))
+    watch_version = True
+
+
+class ColumnSettingStructure(SettingStructure):
+    value_layout = 'columns'
+
+
+class CountingDatabase(MemoryDatabase):
+    '''
+        A MemoryDatabase which counts the transactions created.
+    '''
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.transactions = 0
+
+    def create_transaction(self) -> gateaux.testing.MemoryTransaction:
+        self.transactions += 1
+        return super().create_transaction()
+
+
+class WatchedCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.db = CountingDatabase()
+
+    def write(self, settings: gateaux.Structure, key: tuple, value: tuple) -> None:
+        tr = self.db.create_transaction()
+        settings.set(tr, key, value)
+        tr.commit().wait()
+
+    def test_key_watches(self) -> None:
+        for structure in (SettingStructure, ColumnSettingStructure):
+            settings = structure(Subspace(('settings', structure.__name__)))
+            self.write(settings, ('theme',), ('dark', 1))
+            cache = gateaux.WatchedCache(settings, self.db)
+            created = self.db.transactions
+            self.assertEqual(cache.get(('theme',)), ('dark', 1))
+            self.assertEqual(cache.get(('theme',)), ('dark', 1))
+            self.assertEqual(cache.get(('theme',), fields=('revision',)), (1,))
+            self.assertIsNone(cache.get(('font',)))
+            self.assertIsNone(cache.get(('font',)))
+            # Only the first read of each key used a transaction
+            self.assertEqual(self.db.transactions - created, 2)
+            self.write(settings, ('theme',), ('light', 2))
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(cache.get(('theme',)), ('light', 2))
+            # Writes made without the structure are watched too
+            tr = self.db.create_transaction()
+            tr.clear_range(b'', b'\xff')
+            tr.commit().wait()
+            self.assertIsNone(cache.get(('theme',)))
+            stats = cache.stats()
+            self.assertEqual((stats['hits'], stats['misses'],
+                              stats['invalidations']), (3, 4, 2))
+            cache.close()
+
+    def test_version_watch(self) -> None:
+        settings = SettingStructure(Subspace(('settings',)))
+        self.write(settings, ('theme',), ('dark', 1))
+        self.write(settings, ('font',), ('mono', 1))
+        cache = gateaux.WatchedCache(settings, self.db, invalidate='version')
+        self.assertEqual(cache.get(('theme',)), ('dark', 1))
+        self.assertEqual(cache.get(('font',)), ('mono', 1))
+        self.assertEqual(len(cache), 2)
+        # Any write through the structure invalidates every key
+        self.write(settings, ('other',), ('x', 1))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get(('theme',)), ('dark', 1))
+        tr = self.db.create_transaction()
+        settings.update(tr, ('theme',), {'value': 'light'})
+        tr.commit().wait()
+        self.assertEqual(cache.get(('theme',)), ('light', 1))
+        self.assertEqual(cache.stats()['invalidations'], 2)
+        tr = self.db.create_transaction()
+        self.assertEqual(settings.version(tr), 4)
+        # The version key is not part of any range
+        self.assertEqual(settings.count(tr), 3)
+        settings.clear_range(tr)
+        self.assertEqual(settings.version(tr), 5)
+        cache.close()
+
+    def test_ttl(self) -> None:
+        now: List[float] = [0.0]
+        settings = SettingStructure(Subspace(('settings',)))
+        self.write(settings, ('theme',), ('dark', 1))
+        cache = gateaux.WatchedCache(settings, self.db, ttl=10, timer=lambda: now[0])
+        cache.get(('theme',))
+        now[0] = 9.0
+        cache.get(('theme',))
+        now[0] = 10.0
+        created = self.db.transactions
+        self.assertEqual(cache.get(('theme',)), ('dark', 1))
+        self.assertEqual(self.db.transactions - created, 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_invalidate(self) -> None:
+        settings = SettingStructure(Subspace(('settings',)))
+        self.write(settings, ('theme',), ('dark', 1))
+        cache = gateaux.WatchedCache(settings, self.db, maxsize=1)
+        cache.get(('theme',))
+        entry = cache.entries.peek(settings.pack_key(('theme',)))
+        cache.get(('font',))
+        # The evicted entry's watch was cancelled
+        self.assertTrue(entry[1][0].is_ready())
+        cache.invalidate(('font',))
+        self.assertEqual(len(cache), 0)
+        cache.get(('theme',))
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_validation(self) -> None:
+        class UnversionedStructure(SettingStructure):
+            watch_version = False
+        class ArrayStructure(gateaux.Structure):
+            key = (gateaux.StringField(),)
+            value = (gateaux.ArrayField(decode='array'),)
+        settings = UnversionedStructure(Subspace(('settings',)))
+        with self.assertRaises(gateaux.errors.StructureError):
+            gateaux.WatchedCache(settings, self.db, invalidate='version')
+        with self.assertRaises(ValueError):
+            gateaux.WatchedCache(settings, self.db, invalidate='never')
+        with self.assertRaises(gateaux.errors.StructureError):
+            gateaux.WatchedCache(ArrayStructure(Subspace(('arrays',))), self.db)
+        with self.assertRaises(gateaux.errors.StructureError):
+            settings.version(self.db.create_transaction())
+        with self.assertRaises(gateaux.errors.ValidationError):
+            gateaux.WatchedCache(settings, self.db).get(('a', 'b'))